@@ -1,17 +1,17 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
-from .models import User, GameInvitation, OTP
+from .models import User, GameInvitation, OTP, LeaderboardSnapshot, Game, GameAnalysis, PositionStat, Notification
 
 @admin.register(User)
 class CustomUserAdmin(UserAdmin):
-    list_display = ['username', 'email', 'is_online', 'last_seen', 'current_room', 'is_staff']
+    list_display = ['username', 'email', 'is_online', 'last_seen', 'current_room', 'rating', 'is_staff']
     list_filter = ['is_online', 'is_staff', 'is_superuser', 'email_verified']
     search_fields = ['username', 'email']
     
     fieldsets = UserAdmin.fieldsets + (
         ('Additional Info', {
             'fields': ('firebase_uid', 'google_id', 'profile_picture', 'email_verified', 
-                      'phone_number', 'is_online', 'last_seen', 'current_room')
+                      'phone_number', 'is_online', 'last_seen', 'current_room', 'rating')
         }),
     )
 
@@ -26,3 +26,37 @@ class OTPAdmin(admin.ModelAdmin):
     list_display = ['user', 'purpose', 'created_at', 'expires_at', 'is_used']
     list_filter = ['purpose', 'is_used', 'created_at']
     search_fields = ['user__email', 'user__username']
+
+
+@admin.register(LeaderboardSnapshot)
+class LeaderboardSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['period', 'period_key', 'rank', 'user', 'score', 'taken_at']
+    list_filter = ['period', 'period_key']
+    search_fields = ['user__username']
+
+@admin.register(Game)
+class GameAdmin(admin.ModelAdmin):
+    list_display = ['id', 'white', 'black', 'result', 'room_id', 'finished_at', 'positions_indexed']
+    list_filter = ['result', 'positions_indexed']
+    search_fields = ['white__username', 'black__username', 'room_id']
+
+
+@admin.register(GameAnalysis)
+class GameAnalysisAdmin(admin.ModelAdmin):
+    list_display = ['game', 'status', 'priority', 'white_accuracy', 'black_accuracy', 'nodes', 'finished_at']
+    list_filter = ['status']
+    readonly_fields = ['evaluations', 'best_moves']
+
+
+@admin.register(PositionStat)
+class PositionStatAdmin(admin.ModelAdmin):
+    list_display = ['zobrist', 'move', 'games', 'white_wins', 'draws', 'black_wins']
+    search_fields = ['=zobrist']
+
+
+@admin.register(Notification)
+class NotificationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'user', 'type', 'created_at', 'published_at']
+    list_filter = ['type']
+    search_fields = ['user__username']
+    raw_id_fields = ['user']
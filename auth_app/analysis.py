@@ -0,0 +1,176 @@
+"""
+Post-game analysis pipeline.
+
+``GameAnalysis`` rows are the work queue: one row per game (so a game is
+never queued twice), ordered by ``priority`` (the game's finish time, so
+recent games go first). A dispatcher claims batches of queued rows with a
+conditional UPDATE, fans them out to a process pool whose workers share one
+transposition table in ``multiprocessing.shared_memory``, and writes results
+back as they complete. A claim is a lease: the dispatcher renews it each time
+a job of the batch completes, and a ``running`` row whose lease is older than
+ANALYSIS_LEASE (its dispatcher crashed or hung) is claimed again like a queued
+one, so the queue survives restarts without one dispatcher taking over jobs
+another is still working on.
+
+The dispatcher runs as a periodic background task in the server and can also
+be run on its own with ``manage.py analyse_games``.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import background, endgame
+from .engine.analysis import init_worker, analyse_game
+from .engine.shared_tt import SharedTranspositionTable
+
+logger = logging.getLogger(__name__)
+
+
+class AnalysisPipeline:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._executor = None
+        self._table = None
+        self.games_done = 0
+        self.games_failed = 0
+        self.positions = 0
+        self.nodes = 0
+        self.busy_seconds = 0.0
+        self.tt_probes = 0
+        self.tt_hits = 0
+
+    @property
+    def workers(self):
+        return settings.ANALYSIS_WORKERS or os.cpu_count() or 1
+
+    def _ensure_pool(self):
+        if self._executor is not None:
+            return
+        self._table = SharedTranspositionTable(entries=settings.ANALYSIS_TT_ENTRIES, create=True)
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=init_worker,
+            initargs=(self._table.name, endgame.bitbase_path()),
+        )
+        atexit.register(self.shutdown)
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        if self._table is not None:
+            self._table.close()
+            self._table.unlink()
+            self._table = None
+
+    def claim(self, limit):
+        """
+        Lease up to ``limit`` of the highest-priority claimable jobs (queued, or running under
+        an expired lease) to this dispatcher in one UPDATE. Returns (token, jobs).
+        """
+        from .models import GameAnalysis
+        token = uuid.uuid4()
+        now = timezone.now()
+        expired = Q(claimed_at__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=settings.ANALYSIS_LEASE))
+        claimable = Q(status='queued') | Q(expired, status='running')
+        ids = GameAnalysis.objects.filter(claimable).order_by('-priority').values('id')[:limit]
+        # The conditions are repeated outside the subquery so another dispatcher's claim is re-checked
+        GameAnalysis.objects.filter(claimable, id__in=ids).update(
+            status='running', claim=token, claimed_at=now, started_at=now, finished_at=None
+        )
+        return token, list(GameAnalysis.objects.filter(claim=token, status='running').select_related('game'))
+
+    def run_once(self):
+        """Drain the queue: claim batches and analyse them until nothing is left."""
+        with self._lock:
+            self._ensure_pool()
+            while True:
+                token, jobs = self.claim(self.workers * 2)
+                if not jobs:
+                    return
+                self._run_batch(token, jobs)
+
+    def _run_batch(self, token, jobs):
+        from .models import GameAnalysis
+
+        started = time.monotonic()
+        futures = {
+            self._executor.submit(
+                analyse_game, job.game.move_list, settings.ANALYSIS_DEPTH, settings.ANALYSIS_MOVE_TIME
+            ): job
+            for job in jobs
+        }
+        for future in as_completed(futures):
+            job = futures[future]
+            # Still ours only while the lease holds; renew it for the jobs still in the pool
+            leased = GameAnalysis.objects.filter(claim=token, status='running')
+            leased.exclude(pk=job.pk).update(claimed_at=timezone.now())
+            try:
+                result = future.result()
+            except Exception as e:
+                self.games_failed += 1
+                leased.filter(pk=job.pk).update(
+                    status='failed', error=f"{type(e).__name__}: {e}", finished_at=timezone.now()
+                )
+                logger.error(f"❌ Analysis of game {job.game_id} failed - {type(e).__name__}: {str(e)}")
+                continue
+
+            summary = result['summary']
+            saved = leased.filter(pk=job.pk).update(
+                status='done',
+                evaluations=result['evaluations'],
+                best_moves=result['best_moves'],
+                white_accuracy=summary['white']['accuracy'],
+                black_accuracy=summary['black']['accuracy'],
+                white_blunders=summary['white']['blunders'],
+                black_blunders=summary['black']['blunders'],
+                white_mistakes=summary['white']['mistakes'],
+                black_mistakes=summary['black']['mistakes'],
+                nodes=result['nodes'],
+                error='',
+                finished_at=timezone.now(),
+            )
+            if not saved:
+                logger.warning(f"⚠️ Analysis of game {job.game_id} outlived its lease; result dropped")
+                continue
+            self.games_done += 1
+            self.positions += result['positions']
+            self.nodes += result['nodes']
+            self.tt_probes += result['tt_probes']
+            self.tt_hits += result['tt_hits']
+        self.busy_seconds += time.monotonic() - started
+        close_old_connections()
+
+    def stats(self):
+        from .models import GameAnalysis
+        busy = self.busy_seconds
+        return {
+            'workers': self.workers,
+            'queued': GameAnalysis.objects.filter(status='queued').count(),
+            'running': GameAnalysis.objects.filter(status='running').count(),
+            'games_done': self.games_done,
+            'games_failed': self.games_failed,
+            'positions': self.positions,
+            'nodes': self.nodes,
+            'games_per_minute': round(self.games_done * 60 / busy, 2) if busy else 0,
+            'positions_per_second': round(self.positions / busy, 1) if busy else 0,
+            'nodes_per_second': int(self.nodes / busy) if busy else 0,
+            'tt_hit_rate': round(self.tt_hits / self.tt_probes, 3) if self.tt_probes else 0,
+        }
+
+
+pipeline = AnalysisPipeline()
+
+background.register('game_analysis', settings.ANALYSIS_POLL_INTERVAL, pipeline.run_once)
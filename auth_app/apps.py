@@ -7,6 +7,8 @@ class AuthAppConfig(AppConfig):
     name = 'auth_app'
 
     def ready(self):
+        from . import user_search, versioning  # noqa: F401 - connect their model signal handlers
+
         # Auto-run migrations on startup, but avoid recursion if already migrating
         if 'migrate' in sys.argv or 'makemigrations' in sys.argv or 'collectstatic' in sys.argv:
             return
@@ -21,3 +23,17 @@ class AuthAppConfig(AppConfig):
             print(f"--- AuthApp: Auto-Migration Failed: {e} ---")
             import traceback
             print(traceback.format_exc())
+
+        self.start_background_tasks()
+
+    def start_background_tasks(self):
+        from django.conf import settings
+        # Only long-running server processes (daphne/gunicorn/runserver) get maintenance threads
+        if not settings.BACKGROUND_TASKS_ENABLED:
+            return
+        if sys.argv[0].endswith('manage.py') and 'runserver' not in sys.argv:
+            return
+
+        from . import background, leaderboard, analysis, explorer, user_search, invitations, notifications, health  # noqa: F401 - modules register their tasks
+        background.start_all()
+        print("--- AuthApp: Background tasks started ---")
@@ -0,0 +1,187 @@
+"""
+Async implementations of the invitation and call endpoints, served when
+ASYNC_GAME_VIEWS is on (the daphne deployment). Each subclasses the sync
+view in game_views, so permissions, swagger docs, responses and the
+transactional write blocks (``send``, ``decide``, ``cancel``) are shared;
+only the request flow differs.
+
+Every query and transaction runs on the ``db`` bulkhead rather than in a
+thread per request (Django's async ORM methods would take one), so the
+number of threads and database connections serving these endpoints stays
+fixed however many requests are in flight, and a flood of slow requests
+elsewhere cannot take them.
+"""
+from rest_framework import status, permissions
+from rest_framework.response import Response
+from django.contrib.auth import get_user_model
+
+from . import bulkheads, game_views
+from .async_views import AsyncAPIView, same_schema
+from .game_serializers import InvitationReadSerializer, CreateInvitationSerializer, CreateChallengeSerializer
+from .models import GameInvitation
+from .notifications import notify
+from .versioning import conditional_get
+
+User = get_user_model()
+
+
+class GameAPIView(AsyncAPIView):
+    bulkhead = bulkheads.db
+
+
+class SendInvitationView(GameAPIView, game_views.SendInvitationView):
+
+    @same_schema(game_views.SendInvitationView.post)
+    async def post(self, request):
+        serializer = CreateInvitationSerializer(data=request.data, context={'request': request})
+        if not await self.run_sync(serializer.is_valid):
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        invitation, invitation_data = await self.run_sync(self.send, serializer)
+        return Response({
+            'success': True,
+            'invitation': invitation_data,
+            'message': f'Invitation sent to {invitation.receiver.username}'
+        })
+
+
+class SendChallengeView(GameAPIView, game_views.SendChallengeView):
+
+    @same_schema(game_views.SendChallengeView.post)
+    async def post(self, request):
+        serializer = CreateChallengeSerializer(data=request.data, context={'request': request})
+        if not await self.run_sync(serializer.is_valid):
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        invitations, invitations_data = await self.run_sync(self.send, serializer, request.user)
+        return Response({
+            'success': True,
+            'challenge_id': str(invitations[0].challenge_id),
+            'invitations': invitations_data,
+            'message': f'Challenge sent to {len(invitations)} users'
+        })
+
+
+class MyInvitationsView(GameAPIView, game_views.MyInvitationsView):
+
+    @same_schema(game_views.MyInvitationsView.get)
+    @conditional_get('invitations:{user_id}')
+    async def get(self, request):
+        invitations = await self.run_sync(list, self.pending(request.user))
+        return Response({
+            'invitations': InvitationReadSerializer(invitations, many=True).data,
+            'count': len(invitations)
+        })
+
+
+class RespondToInvitationView(GameAPIView, game_views.RespondToInvitationView):
+
+    @same_schema(game_views.RespondToInvitationView.post)
+    async def post(self, request, invitation_id):
+        action = request.data.get('action')
+        if action not in ('accept', 'decline'):
+            return Response({
+                'error': 'Invalid action. Use "accept" or "decline"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            invitation = await self.run_sync(
+                GameInvitation.objects.only('id', 'challenge_id', 'sender_id').get,
+                id=invitation_id,
+                receiver=request.user,
+                status='pending'
+            )
+        except GameInvitation.DoesNotExist:
+            return Response({'error': 'Invitation not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        won, invitation, invitation_data = await self.run_sync(self.decide, invitation, action)
+        if not won:
+            return Response({
+                'error': 'Invitation is no longer pending',
+                'status': invitation.status
+            }, status=status.HTTP_409_CONFLICT)
+
+        verb = 'accepted' if action == 'accept' else 'declined'
+        return Response({
+            'success': True,
+            'message': f'Invitation from {invitation.sender.username} {verb}',
+            'invitation': invitation_data
+        })
+
+
+class CancelInvitationView(GameAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    @same_schema(game_views.cancel_invitation)
+    async def post(self, request, invitation_id):
+        try:
+            invitation = await self.run_sync(
+                GameInvitation.objects.select_related('sender', 'receiver').get,
+                id=invitation_id,
+                sender=request.user,
+                status='pending'
+            )
+        except GameInvitation.DoesNotExist:
+            return Response({'error': 'Invitation not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        if not await self.run_sync(game_views.cancel, invitation):
+            return Response({
+                'error': 'Invitation is no longer pending',
+                'status': invitation.status
+            }, status=status.HTTP_409_CONFLICT)
+        return Response({
+            'success': True,
+            'message': 'Invitation cancelled'
+        })
+
+
+cancel_invitation = CancelInvitationView.as_view()
+
+
+class SendCallSignalView(GameAPIView, game_views.SendCallSignalView):
+
+    @same_schema(game_views.SendCallSignalView.post)
+    async def post(self, request):
+        try:
+            receiver = await self.run_sync(User.objects.get, username=request.data.get('receiver_username'))
+        except User.DoesNotExist:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        await self.run_sync(notify, receiver, 'call_invitation', {
+            'caller': request.user.username,
+            'room_id': request.data.get('room_id'),
+            'caller_picture': request.user.profile_picture
+        })
+        return Response({'success': True})
+
+
+class DeclineCallView(GameAPIView, game_views.DeclineCallView):
+
+    @same_schema(game_views.DeclineCallView.post)
+    async def post(self, request):
+        try:
+            caller = await self.run_sync(User.objects.get, username=request.data.get('caller_username'))
+        except User.DoesNotExist:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        await self.run_sync(notify, caller, 'call_declined', {
+            'decliner': request.user.username,
+            'room_id': request.data.get('room_id')
+        })
+        return Response({'success': True})
+
+
+class CancelCallView(GameAPIView, game_views.CancelCallView):
+
+    @same_schema(game_views.CancelCallView.post)
+    async def post(self, request):
+        try:
+            receiver = await self.run_sync(User.objects.get, username=request.data.get('receiver_username'))
+        except User.DoesNotExist:
+            return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        await self.run_sync(notify, receiver, 'call_cancelled', {
+            'caller': request.user.username,
+            'room_id': request.data.get('room_id')
+        })
+        return Response({'success': True})
@@ -0,0 +1,91 @@
+"""
+Async DRF views for the ASGI stack.
+
+DRF's APIView dispatch is synchronous, so under daphne every request to it
+holds a worker thread from authentication to rendering. Two ways out:
+
+- ``AsyncAPIView`` keeps DRF's request/response handling (parsers,
+  authentication, permissions, exception handling, renderers) but
+  dispatches to ``async def`` handlers. Blocking work, starting with the
+  authentication and permission checks, goes through ``run_sync``: on the
+  view's ``bulkhead`` when it has one, otherwise ``sync_to_async`` in the
+  request's own thread. A transaction must sit inside a single
+  ``run_sync`` call; it cannot span an ``await``.
+- ``BulkheadAPIView`` leaves a sync view as it is and runs each whole
+  request on its ``bulkhead``.
+
+Either way a full bulkhead answers 503 with Retry-After (see bulkheads.py).
+``options`` stays DRF's synchronous metadata response.
+"""
+import inspect
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from rest_framework.views import APIView
+
+from .bulkheads import BulkheadFull
+
+
+class RetryAfterMixin:
+    def handle_exception(self, exc):
+        response = super().handle_exception(exc)
+        if isinstance(exc, BulkheadFull):
+            response['Retry-After'] = str(exc.retry_after)
+        return response
+
+
+class AsyncAPIView(RetryAfterMixin, APIView):
+    view_is_async = True  # Django marks the view as a coroutine function and awaits it
+    bulkhead = None
+
+    async def run_sync(self, func, *args, **kwargs):
+        if self.bulkhead is not None:
+            return await self.bulkhead.run(func, *args, **kwargs)
+        return await sync_to_async(func)(*args, **kwargs)
+
+    async def dispatch(self, request, *args, **kwargs):
+        """APIView.dispatch with the authentication step off the event loop and awaited handlers."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.run_sync(self.initial, request, *args, **kwargs)
+
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+
+            response = handler(request, *args, **kwargs)
+            if inspect.isawaitable(response):
+                response = await response
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+
+class BulkheadAPIView(RetryAfterMixin, APIView):
+    """A sync APIView whose requests, authentication included, run on ``bulkhead``."""
+    view_is_async = True
+    bulkhead = None
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            return await self.bulkhead.run(super().dispatch, request, *args, **kwargs)
+        except BulkheadFull as exc:  # refused before DRF saw the request, so no DRF response
+            return JsonResponse(
+                {'detail': str(exc.detail)}, status=exc.status_code, headers={'Retry-After': str(exc.retry_after)}
+            )
+
+
+def same_schema(sync_handler):
+    """Document an async handler with the swagger_auto_schema of the sync handler it replaces."""
+    def decorator(handler):
+        handler._swagger_auto_schema = sync_handler._swagger_auto_schema
+        return handler
+    return decorator
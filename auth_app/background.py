@@ -0,0 +1,91 @@
+"""
+Lightweight in-process periodic tasks.
+
+The project has no task queue, so small maintenance jobs (leaderboard
+snapshots and the like) run on daemon threads that are started once from
+AuthAppConfig.ready() when a server process boots.
+"""
+import logging
+import threading
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_tasks = {}
+_lock = threading.Lock()
+
+
+class PeriodicTask:
+    def __init__(self, name, interval, func):
+        self.name = name
+        self.interval = interval
+        self.func = func
+        self.runs = 0
+        self.failures = 0
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running or self.interval <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name=f"periodic-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def wake(self):
+        """Run as soon as possible instead of waiting for the rest of the interval."""
+        self._wake.set()
+
+    def run_once(self):
+        try:
+            self.func()
+            self.runs += 1
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"❌ Periodic task '{self.name}' failed - {type(e).__name__}: {str(e)}")
+        finally:
+            # Each run happens outside the request cycle, so drop stale connections ourselves
+            close_old_connections()
+
+    def _loop(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            self.run_once()
+
+
+def register(name, interval, func):
+    """Register (or replace) a periodic task. It does not run until start_all()."""
+    with _lock:
+        task = PeriodicTask(name, interval, func)
+        _tasks[name] = task
+        return task
+
+
+def get_task(name):
+    return _tasks.get(name)
+
+
+def start_all():
+    with _lock:
+        for task in _tasks.values():
+            task.start()
+            logger.info(f"⏱️ Periodic task '{task.name}' started (every {task.interval}s)")
+
+
+def stop_all():
+    with _lock:
+        for task in _tasks.values():
+            task.stop()
@@ -0,0 +1,266 @@
+"""
+Computer opponent service.
+
+A bot game is registered by PlayBotView and the bot joins the signaling room
+as a virtual peer when the human connects to ``ws/call/{room_id}/``: it has
+its own channel in the ``call_{room_id}`` group and answers `move` frames in
+the same format the app sends.
+
+Searches run in a ProcessPoolExecutor so the Daphne event loop never blocks.
+An asyncio semaphore with one slot per worker process hands out CPU in FIFO
+order; since a game has at most one search outstanding this is round-robin
+across games. When more games are waiting than there are workers, the
+per-move budget shrinks (down to BOT_MIN_MOVE_TIME) to keep latency bounded.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+from .engine import Board, IllegalMoveError, START_FEN, WHITE, BLACK, search_position
+from .engine.board import PIECE_SYMBOLS, square, square_name, move_from, move_to, move_promotion
+
+logger = logging.getLogger(__name__)
+
+PENDING_ROOM_TTL = 600  # seconds a registered bot room waits for the human to connect
+STALE_SEARCH_RETRIES = 2  # fresh searches after a result that no longer fits the board
+
+
+def frame_to_uci(frame):
+    """Convert an app `move` frame (row 0 = rank 8) to UCI."""
+    from_sq = square(int(frame['fromCol']), 7 - int(frame['fromRow']))
+    to_sq = square(int(frame['toCol']), 7 - int(frame['toRow']))
+    uci = square_name(from_sq) + square_name(to_sq)
+    if frame.get('promotion'):
+        uci += frame['promotion'][-1].lower()
+    return uci
+
+
+def move_to_frame(board, move):
+    """Build the app's `move` frame for a move that is about to be played on ``board``."""
+    from_sq, to_sq, promo = move_from(move), move_to(move), move_promotion(move)
+    color, piece = board.piece_at(from_sq)
+    return {
+        'type': 'move',
+        'fromRow': 7 - (from_sq >> 3),
+        'fromCol': from_sq & 7,
+        'toRow': 7 - (to_sq >> 3),
+        'toCol': to_sq & 7,
+        'movedPiece': 'wb'[color] + PIECE_SYMBOLS[piece],
+        'promotion': PIECE_SYMBOLS[promo] if promo else None,
+    }
+
+
+class BotPeer:
+    def __init__(self, service, room_id, color, move_time):
+        self.service = service
+        self.room_id = room_id
+        self.group_name = f'call_{room_id}'
+        self.color = color
+        self.move_time = move_time
+        self.channel_name = None
+        self._task = None
+        self._thinking = False
+        self.generation = 0
+        self.reset()
+
+    def reset(self):
+        self.board = Board()
+        self.moves = []
+        self.generation += 1
+
+    async def start(self):
+        channel_layer = get_channel_layer()
+        self.channel_name = await channel_layer.new_channel()
+        await channel_layer.group_add(self.group_name, self.channel_name)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        channel_layer = get_channel_layer()
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(
+                        channel_layer.receive(self.channel_name), settings.BOT_IDLE_TIMEOUT
+                    )
+                except asyncio.TimeoutError:
+                    logger.info(f"🤖 Bot game {self.room_id} idle, leaving")
+                    break
+                if event.get('type') != 'signaling_message' or event.get('sender_channel_name') == self.channel_name:
+                    continue
+                message = event.get('message') or {}
+                message_type = message.get('type')
+                if message_type == 'bye':
+                    break
+                if message_type == 'new_game':
+                    self.reset()
+                elif message_type == 'move':
+                    if not self._apply_frame(message):
+                        continue
+                await self._maybe_play()
+        except Exception as e:
+            logger.error(f"❌ Bot game {self.room_id} crashed - {type(e).__name__}: {str(e)}")
+        finally:
+            await channel_layer.group_discard(self.group_name, self.channel_name)
+            self.service.finish(self.room_id)
+
+    def _apply_frame(self, frame):
+        if self.board.side == self.color:
+            # Our move is pending (or being searched): a frame now is a duplicate or out of turn
+            logger.warning(f"⚠️ Bot game {self.room_id}: ignoring move frame on the bot's turn {frame}")
+            return False
+        try:
+            uci = frame_to_uci(frame)
+            self.board.push_uci(uci)
+        except (KeyError, ValueError, TypeError, IllegalMoveError) as e:
+            logger.warning(f"⚠️ Bot game {self.room_id}: ignoring bad move frame {frame} ({e})")
+            return False
+        self.moves.append(uci)
+        return True
+
+    async def _maybe_play(self):
+        if self._thinking or self.board.side != self.color or self.board.outcome() is not None:
+            return
+        self._thinking = True
+        try:
+            for _ in range(STALE_SEARCH_RETRIES + 1):
+                generation = self.generation
+                result = await self.service.search(START_FEN, list(self.moves), self.move_time)
+                if result.move is None or generation != self.generation:
+                    return  # game was reset while we were thinking
+                try:
+                    move = self.board.parse_uci(result.move)
+                    break
+                except IllegalMoveError as e:
+                    # The board moved on under the search; search the current position instead of dying
+                    logger.warning(f"⚠️ Bot game {self.room_id}: discarding stale search result ({e})")
+            else:
+                logger.error(f"❌ Bot game {self.room_id}: no playable search result after {STALE_SEARCH_RETRIES + 1} tries")
+                return
+            frame = move_to_frame(self.board, move)
+            self.board.push(move)
+            self.moves.append(result.move)
+            await get_channel_layer().group_send(self.group_name, {
+                'type': 'signaling_message',
+                'message': frame,
+                'sender_channel_name': self.channel_name,
+            })
+        finally:
+            self._thinking = False
+
+
+class BotService:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}  # room_id -> (color, move_time, registered_at); written from view threads
+        self._executor = None
+        self._slots = None
+        self.games = {}
+        self.waiting = 0
+        self.in_flight = 0
+        self.searches = 0
+        self.nodes = 0
+        self.search_seconds = 0.0
+        self.games_started = 0
+        self.games_finished = 0
+
+    @property
+    def workers(self):
+        return settings.BOT_WORKERS or os.cpu_count() or 1
+
+    def create_game(self, bot_color, move_time):
+        """Register a bot room; the bot joins once the human connects. Thread-safe."""
+        room_id = f"bot{uuid.uuid4().hex}"
+        now = time.monotonic()
+        with self._lock:
+            for stale in [r for r, (_, _, at) in self._pending.items() if now - at > PENDING_ROOM_TTL]:
+                del self._pending[stale]
+            self._pending[room_id] = (bot_color, move_time, now)
+        return room_id
+
+    async def attach(self, room_id):
+        """Called when someone connects to a signaling room; starts the bot if it is one of ours."""
+        with self._lock:
+            pending = self._pending.pop(room_id, None)
+        if pending is None:
+            return None
+        color, move_time, _ = pending
+        peer = BotPeer(self, room_id, color, move_time)
+        self.games[room_id] = peer
+        self.games_started += 1
+        await peer.start()
+        logger.info(f"🤖 Bot joined room {room_id} as {'white' if color == WHITE else 'black'}")
+        return peer
+
+    def finish(self, room_id):
+        if self.games.pop(room_id, None) is not None:
+            self.games_finished += 1
+
+    def _budget(self, move_time):
+        demand = self.waiting + self.in_flight
+        if demand <= self.workers:
+            return move_time
+        return max(move_time * self.workers / demand, settings.BOT_MIN_MOVE_TIME)
+
+    async def search(self, fen, moves, move_time):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            self._slots = asyncio.Semaphore(self.workers)
+
+        self.waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self.waiting -= 1
+        self.in_flight += 1
+        try:
+            budget = self._budget(move_time)
+            result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, search_position, fen, moves, budget, settings.BOT_MAX_DEPTH
+            )
+        finally:
+            self.in_flight -= 1
+            self._slots.release()
+
+        self.searches += 1
+        self.nodes += result.nodes
+        self.search_seconds += result.elapsed
+        return result
+
+    def stats(self):
+        workers = self.workers
+        return {
+            'workers': workers,
+            'active_games': len(self.games),
+            'pending_rooms': len(self._pending),
+            'games_started': self.games_started,
+            'games_finished': self.games_finished,
+            'games_per_core': round(len(self.games) / workers, 2),
+            'games_served_per_core': round(self.games_started / workers, 2),
+            'searches': self.searches,
+            'searches_waiting': self.waiting,
+            'searches_in_flight': self.in_flight,
+            'nodes': self.nodes,
+            'nodes_per_second_per_core': int(self.nodes / self.search_seconds) if self.search_seconds else 0,
+        }
+
+
+def pick_bot_color(human_color):
+    if human_color == 'white':
+        return BLACK
+    if human_color == 'black':
+        return WHITE
+    return random.choice([WHITE, BLACK])
+
+
+bot_service = BotService()
@@ -0,0 +1,130 @@
+"""
+Bounded executors ("bulkheads") for classes of blocking work.
+
+Under daphne every sync view, and every sync_to_async call of an async
+view, runs on a thread of its own, so nothing caps how many requests
+block on one thing at once. A burst of slow calls (connectivity probes,
+SMTP, Google's token API) or of PBKDF2 hashing can pile up hundreds of
+threads and database connections, and gameplay requests queue behind them
+for the GIL and the connection limit.
+
+Each bulkhead is a thread pool with a fixed number of workers and a cap
+on the work waiting for one:
+
+    network   views that wait on third-party services
+    cpu       views that hash passwords or OTPs
+    db        the async gameplay views' queries and transactions
+
+Work beyond the queue cap is refused with BulkheadFull (503 with
+Retry-After) instead of waiting. Database connections belong to the pool
+threads, so the db bulkhead's worker count is also the number of
+connections the gameplay API holds. ``stats()`` reports active and queued
+work, wait times and rejections per bulkhead.
+"""
+import asyncio
+import contextvars
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class BulkheadFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Server busy, retry shortly.'
+    default_code = 'bulkhead_full'
+    retry_after = 1  # seconds, sent as Retry-After
+
+
+class Bulkhead:
+    def __init__(self, name, workers, queue):
+        self.name = name
+        self.workers = workers
+        self.max_queue = queue
+        self.active = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"bulkhead-{name}")
+
+    def submit(self, func, *args, **kwargs):
+        """Queue ``func`` on this bulkhead. Returns a concurrent.futures.Future; raises BulkheadFull."""
+        with self._lock:
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                raise BulkheadFull()
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+        enqueued = time.monotonic()
+        context = contextvars.copy_context()
+
+        def call():
+            waited = time.monotonic() - enqueued
+            with self._lock:
+                self.queued -= 1
+                self.active += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            try:
+                result = context.run(func, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            else:
+                with self._lock:
+                    self.completed += 1
+                return result
+            finally:
+                # Pool threads outlive requests, so retire stale or broken connections ourselves
+                close_old_connections()
+                with self._lock:
+                    self.active -= 1
+
+        future = self._executor.submit(call)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future):
+        if future.cancelled():  # cancelled while queued (the client went away): call() never ran
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, func, *args, **kwargs):
+        """Await ``func(*args, **kwargs)`` run on this bulkhead."""
+        return await asyncio.wrap_future(self.submit(func, *args, **kwargs))
+
+    def stats(self):
+        with self._lock:
+            started = self.completed + self.failed + self.active
+            return {
+                'workers': self.workers,
+                'max_queue': self.max_queue,
+                'active': self.active,
+                'queued': self.queued,
+                'peak_queued': self.peak_queued,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_wait_ms': round(self.wait_total / started * 1000, 2) if started else 0.0,
+                'max_wait_ms': round(self.wait_max * 1000, 2),
+            }
+
+
+network = Bulkhead('network', settings.BULKHEAD_NETWORK_WORKERS, settings.BULKHEAD_NETWORK_QUEUE)
+cpu = Bulkhead('cpu', settings.BULKHEAD_CPU_WORKERS or os.cpu_count() or 2, settings.BULKHEAD_CPU_QUEUE)
+db = Bulkhead('db', settings.BULKHEAD_DB_WORKERS, settings.BULKHEAD_DB_QUEUE)
+
+
+def stats():
+    return {bulkhead.name: bulkhead.stats() for bulkhead in (network, cpu, db)}
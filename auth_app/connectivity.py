@@ -0,0 +1,153 @@
+"""
+Outbound connectivity probes behind the debug/network/ endpoint.
+
+The probes (Google over HTTPS, the three Gmail SMTP ports, the Firebase
+API domain) run concurrently on an asyncio loop under one overall
+deadline (CONNECTIVITY_CHECK_DEADLINE), so a full check takes at most that
+long however many targets hang. A probe still running at the deadline is
+reported as timed out.
+
+The endpoint never probes itself. It returns the last snapshot, and when
+that is older than CONNECTIVITY_CHECK_TTL it starts a refresh on the
+``network`` bulkhead and returns the stale snapshot meanwhile. Only one
+refresh runs at a time, so the endpoint sends at most one round of probes
+per TTL however often it is called. With no snapshot yet (a cold process)
+callers may wait for the first round, which the deadline bounds.
+"""
+import asyncio
+import logging
+import ssl
+import threading
+import time
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import bulkheads
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_refreshed = threading.Condition(_lock)
+_snapshot = None
+_refreshing = False
+
+
+def default_probes():
+    """Probe name -> ('http', url) or ('tcp', (host, port))."""
+    probes = {
+        'google_http': ('http', 'https://google.com'),
+        'smtp_587': ('tcp', ('smtp.gmail.com', 587)),
+        'smtp_465': ('tcp', ('smtp.gmail.com', 465)),
+        'smtp_2525': ('tcp', ('smtp.gmail.com', 2525)),
+    }
+    if getattr(settings, 'FIREBASE_API_KEY', ''):
+        probes['firebase_api_domain'] = ('http', 'https://identitytoolkit.googleapis.com/generateMobileSdkConfig')
+    return probes
+
+
+async def http_status(url):
+    """GET ``url`` and return the response's status code, without reading the body."""
+    parts = urlsplit(url)
+    secure = parts.scheme == 'https'
+    reader, writer = await asyncio.open_connection(
+        parts.hostname, parts.port or (443 if secure else 80), ssl=ssl.create_default_context() if secure else None
+    )
+    try:
+        writer.write(
+            f"GET {parts.path or '/'} HTTP/1.1\r\nHost: {parts.hostname}\r\n"
+            f"User-Agent: chess-backend-connectivity-check\r\nConnection: close\r\n\r\n".encode()
+        )
+        await writer.drain()
+        status_line = await reader.readline()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def tcp_connect(host, port):
+    _, writer = await asyncio.open_connection(host, port)
+    writer.close()
+
+
+async def run_probe(kind, target):
+    try:
+        if kind == 'http':
+            return f"Reachable ({await http_status(target)})"
+        await tcp_connect(*target)
+        return "Reachable"
+    except Exception as e:
+        return f"Unreachable: {type(e).__name__}: {str(e)}"
+
+
+async def check_all(probes, deadline):
+    """Run every probe at once; whatever is still running after ``deadline`` seconds is cancelled."""
+    tasks = {name: asyncio.ensure_future(run_probe(kind, target)) for name, (kind, target) in probes.items()}
+    if not tasks:
+        return {}
+    _, pending = await asyncio.wait(tasks.values(), timeout=deadline)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+    return {
+        name: f"Unreachable: no answer within the {deadline}s deadline" if task in pending else task.result()
+        for name, task in tasks.items()
+    }
+
+
+def refresh(probes=None, deadline=None):
+    """Probe now (blocking, at most ``deadline`` seconds) and store the snapshot."""
+    global _snapshot, _refreshing
+    try:
+        started = time.monotonic()
+        results = asyncio.run(check_all(
+            default_probes() if probes is None else probes,
+            settings.CONNECTIVITY_CHECK_DEADLINE if deadline is None else deadline,
+        ))
+        with _lock:
+            _snapshot = {
+                'results': results,
+                'checked_at': timezone.now(),
+                'duration_ms': round((time.monotonic() - started) * 1000, 1),
+                'monotonic': time.monotonic(),
+            }
+        return _snapshot
+    finally:
+        with _lock:
+            _refreshing = False
+            _refreshed.notify_all()
+
+
+def snapshot(wait=0):
+    """
+    The last probe results, starting a background refresh if they are missing or older than the TTL.
+    With no results yet, blocks up to ``wait`` seconds for the refresh to finish.
+
+    Returns a dict with ``results`` (None until the first refresh completes),
+    ``checked_at``, ``age_seconds``, ``duration_ms`` and ``refreshing``.
+    """
+    global _refreshing
+    with _lock:
+        current = _snapshot
+        stale = current is None or time.monotonic() - current['monotonic'] > settings.CONNECTIVITY_CHECK_TTL
+        if stale and not _refreshing:
+            try:
+                bulkheads.network.submit(refresh)
+                _refreshing = True
+            except bulkheads.BulkheadFull:
+                logger.warning("⚠️ Connectivity check: network bulkhead full, serving the old snapshot")
+        if current is None and _refreshing and wait:
+            _refreshed.wait_for(lambda: not _refreshing, timeout=wait)
+            current = _snapshot
+        refreshing = _refreshing
+
+    if current is None:
+        return {'results': None, 'checked_at': None, 'age_seconds': None, 'duration_ms': None, 'refreshing': refreshing}
+    return {
+        'results': current['results'],
+        'checked_at': current['checked_at'].isoformat(),
+        'age_seconds': round(time.monotonic() - current['monotonic'], 1),
+        'duration_ms': current['duration_ms'],
+        'refreshing': refreshing,
+    }
@@ -1,6 +1,12 @@
 import json
+import random
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from .matchmaking import matchmaker, announce_match, Seek, TIME_CONTROL_RE
+from .lobby import lobby, group_for, ALL_GROUP, COLOR_CHOICES
+from .bot import bot_service
+from .encoding import ENCODINGS, JSON, MSGPACK, encode_message
 
 class SignalingConsumer(AsyncWebsocketConsumer):
     async def connect(self):
@@ -29,6 +35,9 @@ class SignalingConsumer(AsyncWebsocketConsumer):
             'room_id': self.room_id
         }))
 
+        # Bot rooms get their virtual opponent now, so it also hears our join
+        await bot_service.attach(self.room_id)
+
         # Notify others in the room that we've joined
         await self.channel_layer.group_send(
             self.room_group_name,
@@ -86,9 +95,20 @@ class SignalingConsumer(AsyncWebsocketConsumer):
             user.save()
 
 class UserNotificationConsumer(AsyncWebsocketConsumer):
+    """
+    Per-user notification socket. ``?encoding=json|compact|msgpack`` picks the wire
+    format (default: the user's notification_encoding); msgpack arrives as binary frames.
+    """
     async def connect(self):
         # Allow anonymous connections for now (but they won't trigger online status)
         self.user_id = None
+        requested = parse_qs(self.scope.get('query_string', b'').decode()).get('encoding', [None])[0]
+        if requested in ENCODINGS:
+            self.encoding = requested
+        elif self.scope["user"].is_authenticated:
+            self.encoding = self.scope["user"].notification_encoding
+        else:
+            self.encoding = JSON
         if self.scope["user"].is_authenticated:
             self.user_id = self.scope["user"].id
             self.user_group_name = f'user_{self.user_id}'
@@ -131,37 +151,235 @@ class UserNotificationConsumer(AsyncWebsocketConsumer):
             except User.DoesNotExist:
                 pass
 
+    async def send_notification(self, notification_type, data):
+        message = encode_message({'type': notification_type}, 'data', notification_type, data, self.encoding)
+        if self.encoding == MSGPACK:
+            await self.send(bytes_data=message)
+        else:
+            await self.send(text_data=message.decode())
+
     async def game_invitation(self, event):
         """Handle incoming game invitation"""
-        await self.send(text_data=json.dumps({
-            'type': 'game_invitation',
-            'data': event['invitation']
-        }))
+        await self.send_notification('game_invitation', event['invitation'])
 
     async def invitation_response(self, event):
         """Handle invitation response (accept/decline)"""
-        await self.send(text_data=json.dumps({
-            'type': 'invitation_response',
-            'data': {
-                'invitation': event['invitation'],
-                'action': event['action']
-            }
-        }))
+        await self.send_notification('invitation_response', {
+            'invitation': event['invitation'],
+            'action': event['action']
+        })
 
     async def invitation_cancelled(self, event):
         """Handle invitation cancellation"""
-        await self.send(text_data=json.dumps({
-            'type': 'invitation_cancelled',
-            'data': event['invitation']
-        }))
+        await self.send_notification('invitation_cancelled', event['invitation'])
 
     async def call_invitation(self, event):
         """Handle incoming call signal"""
+        await self.send_notification('call_invitation', {
+            'caller': event['caller'],
+            'room_id': event['room_id'],
+            'caller_picture': event.get('caller_picture')
+        })
+
+    async def match_found(self, event):
+        """Handle a matchmaking pairing"""
+        await self.send_notification('match_found', {
+            'room_id': event['room_id'],
+            'time_control': event['time_control'],
+            'color': event['color'],
+            'opponent': event['opponent']
+        })
+
+class MatchmakingConsumer(AsyncWebsocketConsumer):
+    """
+    Seek queue socket. Clients send
+    {"type": "seek", "time_control": "5+0", "min_rating": 1000, "max_rating": 1600}
+    or {"type": "cancel"}; pairings arrive as `match_found` (also on /ws/notifications/).
+    """
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_group_name = f'user_{self.user.id}'
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'user_group_name'):
+            # Another tab of the same user may have posted the seek; leave that one alone
+            matchmaker.cancel(self.user.id, channel_name=self.channel_name)
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            await self.send_error('Invalid JSON')
+            return
+
+        if data.get('type') == 'cancel':
+            cancelled = matchmaker.cancel(self.user.id)
+            await self.send(text_data=json.dumps({'type': 'seek_cancelled', 'cancelled': cancelled}))
+        elif data.get('type') == 'seek':
+            time_control = str(data.get('time_control', ''))
+            if not TIME_CONTROL_RE.match(time_control):
+                await self.send_error('Invalid time_control, expected e.g. "5+0"')
+                return
+            try:
+                min_rating = int(data['min_rating']) if data.get('min_rating') is not None else None
+                max_rating = int(data['max_rating']) if data.get('max_rating') is not None else None
+            except (TypeError, ValueError):
+                await self.send_error('Invalid rating range')
+                return
+            if min_rating is not None and max_rating is not None and min_rating > max_rating:
+                await self.send_error('min_rating must not be above max_rating')
+                return
+
+            seek = Seek(
+                user_id=self.user.id,
+                username=self.user.username,
+                rating=await self.current_rating(),  # the connect-time user goes stale after rated games
+                time_control=time_control,
+                min_rating=min_rating,
+                max_rating=max_rating,
+                channel_name=self.channel_name,
+            )
+            room_id = await matchmaker.enqueue(seek)
+            if room_id is None:
+                await self.send(text_data=json.dumps({'type': 'seek_queued', 'time_control': time_control}))
+        else:
+            await self.send_error('Unknown message type')
+
+    async def send_error(self, message):
+        await self.send(text_data=json.dumps({'type': 'error', 'message': message}))
+
+    @database_sync_to_async
+    def current_rating(self):
+        from django.contrib.auth import get_user_model
+        User = get_user_model()
+        rating = User.objects.filter(id=self.user.id).values_list('rating', flat=True).first()
+        return self.user.rating if rating is None else rating
+
+    async def match_found(self, event):
+        """Forward the pairing to the seeking socket"""
         await self.send(text_data=json.dumps({
-            'type': 'call_invitation',
+            'type': 'match_found',
             'data': {
-                'caller': event['caller'],
                 'room_id': event['room_id'],
-                'caller_picture': event.get('caller_picture')
+                'time_control': event['time_control'],
+                'color': event['color'],
+                'opponent': event['opponent']
             }
         }))
+
+
+class LobbyConsumer(AsyncWebsocketConsumer):
+    """
+    Open-seek lobby. After {"type": "subscribe", "time_controls": ["5+0"]} (omit for all)
+    the socket gets one `lobby_snapshot` and then only `seek_added` / `seek_removed` diffs.
+    Also accepts `post`, `cancel` and `accept` messages; pairings arrive as `match_found`.
+    """
+    async def connect(self):
+        self.user = self.scope["user"]
+        if not self.user.is_authenticated:
+            await self.close()
+            return
+
+        self.user_group_name = f'user_{self.user.id}'
+        self.lobby_groups = set()
+        await self.channel_layer.group_add(self.user_group_name, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, close_code):
+        if hasattr(self, 'user_group_name'):
+            await lobby.remove_for_user(self.user.id, channel_name=self.channel_name)
+            await self.unsubscribe()
+            await self.channel_layer.group_discard(self.user_group_name, self.channel_name)
+
+    async def receive(self, text_data):
+        try:
+            data = json.loads(text_data)
+        except ValueError:
+            await self.send_error('Invalid JSON')
+            return
+
+        message_type = data.get('type')
+        if message_type == 'subscribe':
+            await self.subscribe(data.get('time_controls'))
+        elif message_type == 'unsubscribe':
+            await self.unsubscribe()
+        elif message_type == 'post':
+            time_control = str(data.get('time_control', ''))
+            color = data.get('color', 'random')
+            if not TIME_CONTROL_RE.match(time_control):
+                await self.send_error('Invalid time_control, expected e.g. "5+0"')
+            elif color not in COLOR_CHOICES:
+                await self.send_error(f'Invalid color. Use one of {", ".join(COLOR_CHOICES)}')
+            else:
+                seek = await lobby.post(self.user, time_control, color, self.channel_name)
+                await self.send(text_data=json.dumps({'type': 'seek_posted', 'seek_id': seek.id}))
+        elif message_type == 'cancel':
+            await lobby.remove_for_user(self.user.id)
+        elif message_type == 'accept':
+            await self.accept_seek(data.get('seek_id'))
+        else:
+            await self.send_error('Unknown message type')
+
+    async def subscribe(self, time_controls):
+        if time_controls is not None and (
+            not isinstance(time_controls, list)
+            or not all(isinstance(tc, str) and TIME_CONTROL_RE.match(tc) for tc in time_controls)
+        ):
+            await self.send_error('time_controls must be a list like ["5+0", "10+0"]')
+            return
+
+        await self.unsubscribe()
+        groups = {ALL_GROUP} if time_controls is None else {group_for(tc) for tc in time_controls}
+        # Join before taking the snapshot so no diff can fall between the two
+        for group in groups:
+            await self.channel_layer.group_add(group, self.channel_name)
+        self.lobby_groups = groups
+        await self.send(text_data=json.dumps({'type': 'lobby_snapshot', **lobby.snapshot(time_controls)}))
+
+    async def unsubscribe(self):
+        for group in self.lobby_groups:
+            await self.channel_layer.group_discard(group, self.channel_name)
+        self.lobby_groups = set()
+
+    async def accept_seek(self, seek_id):
+        seek = lobby.get(seek_id)
+        if seek is None:
+            await self.send_error('Seek is no longer available')
+            return
+        if seek.user_id == self.user.id:
+            await self.send_error('Cannot accept your own seek')
+            return
+
+        await lobby.remove(seek_id)
+        poster = (seek.user_id, seek.username, seek.rating)
+        acceptor = (self.user.id, self.user.username, self.user.rating)
+        color = seek.color if seek.color != 'random' else random.choice(['white', 'black'])
+        white, black = (poster, acceptor) if color == 'white' else (acceptor, poster)
+        await lobby.remove_for_user(self.user.id)
+        await announce_match(white, black, seek.time_control)
+
+    async def send_error(self, message):
+        await self.send(text_data=json.dumps({'type': 'error', 'message': message}))
+
+    async def lobby_diff(self, event):
+        """Forward an add/remove diff from a subscribed lobby group"""
+        await self.send(text_data=json.dumps({'version': event['version'], **event['diff']}))
+
+    async def match_found(self, event):
+        """Forward the pairing to the lobby socket"""
+        await self.send(text_data=json.dumps({
+            'type': 'match_found',
+            'data': {
+                'room_id': event['room_id'],
+                'time_control': event['time_control'],
+                'color': event['color'],
+                'opponent': event['opponent']
+            }
+        }))
\ No newline at end of file
@@ -0,0 +1,112 @@
+"""
+Wire encodings for push notifications (MQTT and /ws/notifications/).
+
+- ``json``: the original messages, full serializer output in the payload
+- ``compact``: JSON with a trimmed payload schema; invitations carry ids,
+  room and status plus a small summary of each player instead of two full
+  UserSerializer blocks (no emails, stats or timestamps the app never shows)
+- ``msgpack``: the compact schema packed with MessagePack
+
+Each user picks one (``User.notification_encoding``, set through
+``notifications/encoding/``); WebSocket clients may override it per
+connection with ``?encoding=``.
+
+The same invitation is usually sent to several people (both players, every
+receiver of a challenge, the retained state), so the encoded payload is
+cached per invitation version (id + updated_at) and spliced into each
+recipient's envelope, which only adds the per-recipient fields.
+"""
+import json
+
+import msgpack
+from django.conf import settings
+
+from .lru import LRUCache
+
+JSON, COMPACT, MSGPACK = 'json', 'compact', 'msgpack'
+ENCODINGS = (JSON, COMPACT, MSGPACK)
+
+_payload_cache = LRUCache(settings.NOTIFICATION_ENCODING_CACHE_SIZE, ttl=3600)
+
+
+def _user(user):
+    return {'id': user['id'], 'username': user['username'], 'rating': user.get('rating'),
+            'picture': user.get('profile_picture')}
+
+
+def _invitation(invitation):
+    return {
+        'id': invitation['id'],
+        'room_id': invitation['room_id'],
+        'challenge_id': invitation.get('challenge_id'),
+        'status': invitation['status'],
+        'sender': _user(invitation['sender']),
+        'receiver': _user(invitation['receiver']),
+    }
+
+
+def compact_payload(notification_type, payload):
+    """Trimmed payload schema shared by ``compact`` and ``msgpack``."""
+    if notification_type in ('game_invitation', 'invitation_cancelled'):
+        return _invitation(payload)
+    if notification_type == 'invitation_response':
+        return {'invitation': _invitation(payload['invitation']), 'action': payload['action']}
+    return payload
+
+
+def _version(notification_type, payload):
+    """Cache key for payloads that embed an invitation; None for small ones not worth caching."""
+    if notification_type in ('game_invitation', 'invitation_cancelled'):
+        return (notification_type, payload['id'], payload['updated_at'])
+    if notification_type == 'invitation_response':
+        invitation = payload['invitation']
+        return (notification_type, invitation['id'], invitation['updated_at'], payload['action'])
+    return None
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode()
+
+
+def encoded_payload(notification_type, payload, encoding):
+    version = _version(notification_type, payload)
+    key = version and (encoding,) + version
+    if key:
+        cached = _payload_cache.get(key)
+        if cached is not None:
+            return cached
+    if encoding == JSON:
+        encoded = _dumps(payload)
+    elif encoding == MSGPACK:
+        encoded = msgpack.packb(compact_payload(notification_type, payload))
+    else:
+        encoded = _dumps(compact_payload(notification_type, payload))
+    if key:
+        _payload_cache.put(key, encoded)
+    return encoded
+
+
+def encode_message(fields, payload_field, notification_type, payload, encoding):
+    """
+    ``fields`` (small per-recipient values such as type and id) plus the payload under
+    ``payload_field``, encoded as one JSON object or MessagePack map.
+    """
+    body = encoded_payload(notification_type, payload, encoding)
+    if encoding == MSGPACK:
+        packer = msgpack.Packer()
+        parts = [packer.pack_map_header(len(fields) + 1)]
+        for name, value in fields.items():
+            parts += [packer.pack(name), packer.pack(value)]
+        parts += [packer.pack(payload_field), body]
+        return b''.join(parts)
+    head = _dumps(fields)[:-1]
+    separator = b',' if fields else b''
+    return head + separator + _dumps(payload_field) + b':' + body + b'}'
+
+
+def encode_state(state, encoding):
+    return msgpack.packb(state) if encoding == MSGPACK else _dumps(state)
+
+
+def payload_cache_stats():
+    return {'entries': len(_payload_cache), 'hits': _payload_cache.hits, 'misses': _payload_cache.misses}
@@ -0,0 +1,60 @@
+"""
+Endgame adjudication backed by the memory-mapped bitbase in engine/bitbase.py.
+
+The bitbase file is opened lazily on first use and shared by every request
+in the process; the OS page cache holds the tables, not the Python heap.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+
+from .engine.bitbase import Bitbase, WIN, LOSS
+from .engine import WHITE
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_bitbase = None
+_missing = False
+
+
+def bitbase_path():
+    """Configured bitbase path if the file exists, else None."""
+    path = settings.BITBASE_PATH
+    return path if path and os.path.exists(path) else None
+
+
+def get_bitbase():
+    global _bitbase, _missing
+    if _bitbase is None and not _missing:
+        with _lock:
+            if _bitbase is None and not _missing:
+                path = bitbase_path()
+                if path is None:
+                    _missing = True
+                    logger.warning(f"⚠️ Endgame bitbase not found at {settings.BITBASE_PATH}; run manage.py build_bitbases")
+                else:
+                    _bitbase = Bitbase(path)
+    return _bitbase
+
+
+def adjudicate(board):
+    """
+    Bitbase verdict for a position: ``{'result': 'win'|'draw'|'loss', 'adjudication': '1-0'|...}``
+    from the side to move's point of view, or None if the position is not covered.
+    """
+    bitbase = get_bitbase()
+    if bitbase is None:
+        return None
+    result = bitbase.probe(board)
+    if result is None:
+        return None
+    if result == WIN:
+        adjudication = '1-0' if board.side == WHITE else '0-1'
+    elif result == LOSS:
+        adjudication = '0-1' if board.side == WHITE else '1-0'
+    else:
+        adjudication = '1/2-1/2'
+    return {'result': result, 'adjudication': adjudication}
@@ -0,0 +1,13 @@
+"""
+Pure-Python chess engine: bitboard move generation and alpha-beta search.
+
+Nothing in this package imports Django, so it can run inside worker
+processes without any project setup.
+"""
+from .board import Board, IllegalMoveError, START_FEN, WHITE, BLACK
+from .search import Searcher, SearchResult, TranspositionTable, evaluate, search_position
+
+__all__ = [
+    'Board', 'IllegalMoveError', 'START_FEN', 'WHITE', 'BLACK',
+    'Searcher', 'SearchResult', 'TranspositionTable', 'evaluate', 'search_position',
+]
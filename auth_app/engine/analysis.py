@@ -0,0 +1,117 @@
+"""
+Per-move game analysis, run inside analysis worker processes.
+
+Each position of the game is searched to a fixed depth (capped by time) and
+the evaluations are turned into centipawn losses, blunder/mistake counts and
+an accuracy score per side. Workers call ``init_worker`` once to attach the
+shared transposition table, so positions already searched for another game
+(common openings) come back from the table instead of being searched again.
+Positions covered by the endgame bitbase are scored from the table without
+searching.
+"""
+import math
+
+from .board import Board, WHITE
+from .search import Searcher, MATE_BOUND
+
+EVAL_CLAMP = 1000  # centipawns; mate scores are clamped to this for loss/accuracy maths
+MISTAKE_LOSS = 100
+BLUNDER_LOSS = 300
+
+_searcher = None
+_table = None
+_bitbase = None
+
+_PROBE_SCORES = {'win': EVAL_CLAMP, 'draw': 0, 'loss': -EVAL_CLAMP}
+
+
+def init_worker(table_name=None, bitbase_path=None):
+    """Process-pool initializer: attach to the shared table (or fall back to a private one) and the bitbase."""
+    global _searcher, _table, _bitbase
+    if bitbase_path:
+        from .bitbase import Bitbase
+        _bitbase = Bitbase(bitbase_path)
+    if table_name:
+        from .shared_tt import SharedTranspositionTable
+        _table = SharedTranspositionTable(name=table_name)
+        _searcher = Searcher(tt=_table)
+    else:
+        _searcher = Searcher()
+
+
+def win_percent(cp):
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+
+def move_accuracy(win_before, win_after):
+    """Accuracy of one move from the mover's win% before and after it (0-100)."""
+    accuracy = 103.1668 * math.exp(-0.04354 * max(win_before - win_after, 0)) - 3.1669
+    return min(max(accuracy, 0.0), 100.0)
+
+
+def summarise(evaluations):
+    """
+    Turn white-relative evaluations (one per position, including the final one)
+    into per-side accuracy and mistake/blunder counts.
+    """
+    clamped = [min(max(e, -EVAL_CLAMP), EVAL_CLAMP) for e in evaluations]
+    stats = {
+        'white': {'accuracies': [], 'mistakes': 0, 'blunders': 0},
+        'black': {'accuracies': [], 'mistakes': 0, 'blunders': 0},
+    }
+    for ply in range(len(clamped) - 1):
+        side = 'white' if ply % 2 == 0 else 'black'
+        sign = 1 if side == 'white' else -1
+        before, after = sign * clamped[ply], sign * clamped[ply + 1]
+        loss = before - after
+        if loss >= BLUNDER_LOSS:
+            stats[side]['blunders'] += 1
+        elif loss >= MISTAKE_LOSS:
+            stats[side]['mistakes'] += 1
+        stats[side]['accuracies'].append(move_accuracy(win_percent(before), win_percent(after)))
+
+    summary = {}
+    for side, values in stats.items():
+        accuracies = values['accuracies']
+        summary[side] = {
+            'accuracy': round(sum(accuracies) / len(accuracies), 1) if accuracies else None,
+            'mistakes': values['mistakes'],
+            'blunders': values['blunders'],
+        }
+    return summary
+
+
+def analyse_game(moves, depth=4, time_cap=2.0):
+    """Analyse a game given as UCI moves from the start position. Returns plain data for pickling."""
+    if _searcher is None:
+        init_worker()
+    board = Board()
+    evaluations, best_moves = [], []
+    nodes = 0
+    probes_before = getattr(_table, 'probes', 0)
+    hits_before = getattr(_table, 'hits', 0)
+
+    for ply in range(len(moves) + 1):
+        known = _bitbase.probe(board) if _bitbase is not None else None
+        if known is not None:
+            score, best_move = _PROBE_SCORES[known], None
+        else:
+            result = _searcher.search(board, time_cap, depth)
+            nodes += result.nodes
+            score, best_move = result.score, result.move
+            if abs(score) > MATE_BOUND:
+                score = EVAL_CLAMP if score > 0 else -EVAL_CLAMP
+        evaluations.append(score if board.side == WHITE else -score)
+        best_moves.append(best_move)
+        if ply < len(moves):
+            board.push_uci(moves[ply])
+
+    return {
+        'evaluations': evaluations,
+        'best_moves': best_moves,
+        'summary': summarise(evaluations),
+        'nodes': nodes,
+        'positions': len(evaluations),
+        'tt_probes': getattr(_table, 'probes', 0) - probes_before,
+        'tt_hits': getattr(_table, 'hits', 0) - hits_before,
+    }
@@ -0,0 +1,282 @@
+"""
+Endgame bitbases for king + one piece vs king (KQK, KRK, KPK).
+
+Each table holds one bit per position, set when the side with the extra
+piece wins with best play; clear means draw (the extra piece never loses).
+A position is indexed as
+
+    ((side_to_move * 64 + strong_king) * 64 + weak_king) * 64 + piece
+
+with the strong side normalised to white (black-strong positions are
+mirrored top-to-bottom), so each table is 2 * 64**3 bits = 64 KiB.
+
+Tables are built by retrograde analysis: every black-to-move mate is a win,
+and wins are propagated backwards with a work queue (a white-to-move
+position is won if any move reaches a win; a black-to-move position is won
+once every legal king move has been shown to lose). KPK promotions are
+resolved against the KQK and KRK tables, so those are built first.
+
+The file is read with ``mmap``, so probing is one byte read from the page
+cache and nothing is copied onto the Python heap.
+"""
+import mmap
+import struct
+from collections import deque
+
+from .board import (
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, KING_ATTACKS, ROOK_DIRS, BISHOP_DIRS, _DIRECTIONS,
+    popcount,
+)
+
+MAGIC = b'CHESSBB1'
+TABLES = ('KQK', 'KRK', 'KPK')
+TABLE_PIECES = {'KQK': QUEEN, 'KRK': ROOK, 'KPK': PAWN}
+POSITIONS = 2 * 64 * 64 * 64
+TABLE_BYTES = POSITIONS // 8
+_HEADER = struct.Struct('<8sI')
+_ENTRY = struct.Struct('<4sQ')  # table name, byte offset
+
+WIN, DRAW, LOSS = 'win', 'draw', 'loss'
+
+
+def index(stm, wk, bk, piece_sq):
+    return ((stm * 64 + wk) * 64 + bk) * 64 + piece_sq
+
+
+def _adjacent(a, b):
+    return bool(KING_ATTACKS[a] & (1 << b))
+
+
+def _slides(piece, sq, blockers):
+    """Squares a queen/rook on ``sq`` reaches, stopping at (and including) the first blocker."""
+    directions = ROOK_DIRS + BISHOP_DIRS if piece == QUEEN else ROOK_DIRS
+    targets = []
+    for d in directions:
+        for target in _ray_squares(d, sq):
+            targets.append(target)
+            if (1 << target) & blockers:
+                break
+    return targets
+
+
+def _ray_squares(d, sq):
+    df, dr = _DIRECTIONS[d]
+    f, r = (sq & 7) + df, (sq >> 3) + dr
+    while 0 <= f < 8 and 0 <= r < 8:
+        yield r * 8 + f
+        f, r = f + df, r + dr
+
+
+def _attacks(piece, sq, wk):
+    """Bitboard of squares the white piece attacks; only the white king blocks (the black king is x-rayed)."""
+    if piece == PAWN:
+        bb = 0
+        if sq & 7:
+            bb |= 1 << (sq + 7)
+        if sq & 7 != 7:
+            bb |= 1 << (sq + 9)
+        return bb
+    bb = 0
+    for target in _slides(piece, sq, 1 << wk):
+        bb |= 1 << target
+    return bb
+
+
+class _Generator:
+    def __init__(self, piece, promotions=None):
+        self.piece = piece
+        self.promotions = promotions or {}  # piece -> win flags of that piece's table, for KPK promotions
+        self.win = bytearray(POSITIONS)
+        self.attack_cache = {}
+
+    def attacks(self, sq, wk):
+        key = (sq, wk)
+        bb = self.attack_cache.get(key)
+        if bb is None:
+            bb = self.attack_cache[key] = _attacks(self.piece, sq, wk)
+        return bb
+
+    def valid(self, stm, wk, bk, p):
+        if wk == bk or wk == p or bk == p or _adjacent(wk, bk):
+            return False
+        if self.piece == PAWN and not 8 <= p < 56:
+            return False
+        # With white to move, black must not be in check (black's last move would have been illegal)
+        return not (stm == WHITE and self.attacks(p, wk) & (1 << bk))
+
+    def black_moves(self, wk, bk, p):
+        """Legal black king destinations; a capture of the piece is returned as -1 (drawn KvK)."""
+        attacked = self.attacks(p, wk) | KING_ATTACKS[wk]
+        moves = []
+        for to in _bits(KING_ATTACKS[bk]):
+            if (1 << to) & attacked:
+                continue
+            moves.append(-1 if to == p else to)
+        return moves
+
+    def promotion_wins(self, wk, bk, p):
+        if self.piece != PAWN or p < 48:
+            return False
+        to = p + 8
+        if to in (wk, bk):
+            return False
+        return any(bits[index(BLACK, wk, bk, to)] for bits in self.promotions.values())
+
+    def white_predecessors(self, wk, bk, p):
+        """White-to-move positions with a white move leading to black-to-move (wk, bk, p)."""
+        occupied = (1 << wk) | (1 << bk) | (1 << p)
+        for from_sq in _bits(KING_ATTACKS[wk] & ~occupied):
+            if not _adjacent(from_sq, bk):
+                yield from_sq, bk, p
+        if self.piece == PAWN:
+            if p - 8 >= 8 and not occupied & (1 << (p - 8)):
+                yield wk, bk, p - 8
+                if 24 <= p < 32 and not occupied & (1 << (p - 16)):
+                    yield wk, bk, p - 16
+        else:
+            for from_sq in _slides(self.piece, p, (1 << wk) | (1 << bk)):
+                if from_sq not in (wk, bk):
+                    yield wk, bk, from_sq
+
+    def black_predecessors(self, wk, bk, p):
+        occupied = (1 << wk) | (1 << p)
+        for from_sq in _bits(KING_ATTACKS[bk] & ~occupied):
+            if not _adjacent(from_sq, wk):
+                yield wk, from_sq, p
+
+    def run(self):
+        win = self.win
+        remaining = [0] * (POSITIONS // 2)
+        queue = deque()
+        for wk in range(64):
+            for bk in range(64):
+                for p in range(64):
+                    if self.valid(BLACK, wk, bk, p):
+                        moves = self.black_moves(wk, bk, p)
+                        i = index(BLACK, wk, bk, p)
+                        remaining[i - POSITIONS // 2] = len(moves)
+                        if not moves and self.attacks(p, wk) & (1 << bk):
+                            win[i] = 1
+                            queue.append((BLACK, wk, bk, p))
+                    if self.valid(WHITE, wk, bk, p) and self.promotion_wins(wk, bk, p):
+                        win[index(WHITE, wk, bk, p)] = 1
+                        queue.append((WHITE, wk, bk, p))
+
+        while queue:
+            stm, wk, bk, p = queue.popleft()
+            if stm == BLACK:
+                for pos in self.white_predecessors(wk, bk, p):
+                    i = index(WHITE, *pos)
+                    if not win[i] and self.valid(WHITE, *pos):
+                        win[i] = 1
+                        queue.append((WHITE,) + pos)
+            else:
+                for pos in self.black_predecessors(wk, bk, p):
+                    if not self.valid(BLACK, *pos):
+                        continue
+                    i = index(BLACK, *pos)
+                    if win[i]:
+                        continue
+                    remaining[i - POSITIONS // 2] -= 1
+                    if remaining[i - POSITIONS // 2] == 0:
+                        win[i] = 1
+                        queue.append((BLACK,) + pos)
+        return win
+
+
+def _bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def _pack(flags):
+    packed = bytearray(TABLE_BYTES)
+    for i, flag in enumerate(flags):
+        if flag:
+            packed[i >> 3] |= 1 << (i & 7)
+    return bytes(packed)
+
+
+def generate(tables=TABLES, progress=None):
+    """Build the requested tables (plus any they depend on). Returns {name: packed bytes}."""
+    built = {}
+    for name in TABLES:
+        needed = name in tables or (name in ('KQK', 'KRK') and 'KPK' in tables)
+        if not needed:
+            continue
+        promotions = {}
+        if name == 'KPK':
+            promotions = {QUEEN: built['KQK'][1], ROOK: built['KRK'][1]}
+        if progress:
+            progress(name)
+        flags = _Generator(TABLE_PIECES[name], promotions).run()
+        built[name] = (_pack(flags), flags)
+    return {name: packed for name, (packed, _) in built.items() if name in tables}
+
+
+def write(path, tables):
+    """Write packed tables to ``path`` in the bitbase file format."""
+    names = sorted(tables)
+    offset = _HEADER.size + _ENTRY.size * len(names)
+    with open(path, 'wb') as handle:
+        handle.write(_HEADER.pack(MAGIC, len(names)))
+        for name in names:
+            handle.write(_ENTRY.pack(name.encode('ascii').ljust(4), offset))
+            offset += len(tables[name])
+        for name in names:
+            handle.write(tables[name])
+
+
+class Bitbase:
+    """Read-only, memory-mapped view of a bitbase file."""
+
+    def __init__(self, path):
+        with open(path, 'rb') as handle:
+            self._mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a bitbase file")
+        self.offsets = {}
+        for n in range(count):
+            name, offset = _ENTRY.unpack_from(self._mm, _HEADER.size + n * _ENTRY.size)
+            self.offsets[name.decode('ascii').strip()] = offset
+        self.probes = 0
+
+    def close(self):
+        self._mm.close()
+
+    def probe(self, board):
+        """
+        'win', 'draw' or 'loss' for the side to move, or None when the position
+        is not covered. Bare kings and king + minor vs king are draws without a table.
+        """
+        if any(popcount(board.pieces[color][KING]) != 1 for color in (WHITE, BLACK)):
+            return None
+        material = [(color, piece, bb) for color in (WHITE, BLACK)
+                    for piece, bb in enumerate(board.pieces[color][:KING]) if bb]
+        if not material:
+            return DRAW
+        if len(material) != 1:
+            return None
+        strong, piece, bb = material[0]
+        if bb & (bb - 1):
+            return None
+        if piece in (KNIGHT, BISHOP):
+            return DRAW
+        name = {QUEEN: 'KQK', ROOK: 'KRK', PAWN: 'KPK'}[piece]
+        offset = self.offsets.get(name)
+        if offset is None:
+            return None
+
+        flip = 56 if strong == BLACK else 0
+        wk = board.king_square(strong) ^ flip
+        bk = board.king_square(strong ^ 1) ^ flip
+        p = (bb.bit_length() - 1) ^ flip
+        stm = WHITE if board.side == strong else BLACK
+        i = index(stm, wk, bk, p)
+        self.probes += 1
+        if not self._mm[offset + (i >> 3)] & (1 << (i & 7)):
+            return DRAW
+        return WIN if stm == WHITE else LOSS
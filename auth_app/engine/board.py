@@ -0,0 +1,627 @@
+"""
+Bitboard chess position with legal move generation and Zobrist hashing.
+
+Squares are numbered 0 (a1) .. 63 (h8). Each (colour, piece) pair has a
+64-bit bitboard; a 64-entry mailbox mirrors them for O(1) "what is on this
+square" lookups. Moves are plain ints so they pickle cheaply across the
+engine's process pool:
+
+    move = from_sq | (to_sq << 6) | (promotion_piece << 12)
+
+Zobrist keys are generated from a fixed seed, so hashes are stable across
+processes and restarts (they are persisted by the position index).
+"""
+import random
+
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+PIECE_SYMBOLS = 'pnbrqk'
+PROMOTION_SYMBOLS = {KNIGHT: 'n', BISHOP: 'b', ROOK: 'r', QUEEN: 'q'}
+EMPTY = -1
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ = 1, 2, 4, 8
+FULL_MASK = (1 << 64) - 1
+
+
+def square(file, rank):
+    return rank * 8 + file
+
+
+def square_name(sq):
+    return 'abcdefgh'[sq & 7] + str((sq >> 3) + 1)
+
+
+def parse_square(name):
+    """Square index of a name like ``e4``. Raises ValueError for anything else."""
+    if len(name) != 2 or name[0] not in 'abcdefgh' or name[1] not in '12345678':
+        raise ValueError(f"Invalid square: {name!r}")
+    return square('abcdefgh'.index(name[0]), int(name[1]) - 1)
+
+
+def move_from(move):
+    return move & 63
+
+
+def move_to(move):
+    return (move >> 6) & 63
+
+
+def move_promotion(move):
+    return move >> 12
+
+
+def make_move(from_sq, to_sq, promotion=0):
+    return from_sq | (to_sq << 6) | (promotion << 12)
+
+
+def move_to_uci(move):
+    uci = square_name(move & 63) + square_name((move >> 6) & 63)
+    if move >> 12:
+        uci += PROMOTION_SYMBOLS[move >> 12]
+    return uci
+
+
+def iter_bits(bb):
+    while bb:
+        lsb = bb & -bb
+        yield lsb.bit_length() - 1
+        bb ^= lsb
+
+
+def popcount(bb):
+    return bin(bb).count('1')
+
+
+# ---------------------------------------------------------------------------
+# Attack tables
+# ---------------------------------------------------------------------------
+
+def _leaper_attacks(offsets):
+    table = []
+    for sq in range(64):
+        f, r = sq & 7, sq >> 3
+        bb = 0
+        for df, dr in offsets:
+            nf, nr = f + df, r + dr
+            if 0 <= nf < 8 and 0 <= nr < 8:
+                bb |= 1 << square(nf, nr)
+        table.append(bb)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_attacks([(1, 2), (2, 1), (2, -1), (1, -2), (-1, -2), (-2, -1), (-2, 1), (-1, 2)])
+KING_ATTACKS = _leaper_attacks([(1, 0), (1, 1), (0, 1), (-1, 1), (-1, 0), (-1, -1), (0, -1), (1, -1)])
+PAWN_ATTACKS = (
+    _leaper_attacks([(-1, 1), (1, 1)]),  # squares attacked by a white pawn
+    _leaper_attacks([(-1, -1), (1, -1)]),  # squares attacked by a black pawn
+)
+
+# Rays in 8 directions; the first four increase the square index, the rest decrease it
+_DIRECTIONS = [(0, 1), (1, 1), (1, 0), (-1, 1), (0, -1), (-1, -1), (-1, 0), (1, -1)]
+ROOK_DIRS = (0, 2, 4, 6)
+BISHOP_DIRS = (1, 3, 5, 7)
+
+
+def _rays():
+    rays = [[0] * 64 for _ in _DIRECTIONS]
+    for d, (df, dr) in enumerate(_DIRECTIONS):
+        for sq in range(64):
+            f, r = (sq & 7) + df, (sq >> 3) + dr
+            bb = 0
+            while 0 <= f < 8 and 0 <= r < 8:
+                bb |= 1 << square(f, r)
+                f, r = f + df, r + dr
+            rays[d][sq] = bb
+    return rays
+
+
+RAYS = _rays()
+_POSITIVE = {0, 1, 2, 3}
+
+
+def _slider_attacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            if d in _POSITIVE:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, ROOK_DIRS)
+
+
+def bishop_attacks(sq, occupied):
+    return _slider_attacks(sq, occupied, BISHOP_DIRS)
+
+
+# ---------------------------------------------------------------------------
+# Zobrist keys
+# ---------------------------------------------------------------------------
+
+_rng = random.Random(0x2630)
+ZOBRIST_PIECES = [[_rng.getrandbits(64) for _ in range(64)] for _ in range(12)]
+ZOBRIST_SIDE = _rng.getrandbits(64)
+ZOBRIST_CASTLING = [_rng.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP_FILE = [_rng.getrandbits(64) for _ in range(8)]
+
+# Castling rights cleared when a move touches these squares
+_CASTLING_MASK = [15] * 64
+_CASTLING_MASK[square(4, 0)] &= ~(CASTLE_WK | CASTLE_WQ)
+_CASTLING_MASK[square(0, 0)] &= ~CASTLE_WQ
+_CASTLING_MASK[square(7, 0)] &= ~CASTLE_WK
+_CASTLING_MASK[square(4, 7)] &= ~(CASTLE_BK | CASTLE_BQ)
+_CASTLING_MASK[square(0, 7)] &= ~CASTLE_BQ
+_CASTLING_MASK[square(7, 7)] &= ~CASTLE_BK
+
+RANK_1, RANK_8 = 0xFF, 0xFF << 56
+
+
+class IllegalMoveError(ValueError):
+    pass
+
+
+class Board:
+    def __init__(self, fen=START_FEN):
+        self.set_fen(fen)
+
+    # -- setup -------------------------------------------------------------
+
+    def set_fen(self, fen):
+        parts = fen.split()
+        if len(parts) < 4:
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        self.pieces = [[0] * 6 for _ in range(2)]
+        self.occupancy = [0, 0]
+        self.mailbox = [EMPTY] * 64
+
+        rows = parts[0].split('/')
+        if len(rows) != 8:
+            raise ValueError(f"Invalid FEN board: {parts[0]!r}")
+        for i, row in enumerate(rows):
+            rank, file = 7 - i, 0
+            for ch in row:
+                if ch.isdigit():
+                    file += int(ch)
+                    continue
+                if ch.lower() not in PIECE_SYMBOLS or file > 7:
+                    raise ValueError(f"Invalid FEN board: {parts[0]!r}")
+                color = WHITE if ch.isupper() else BLACK
+                self._put(color, PIECE_SYMBOLS.index(ch.lower()), square(file, rank))
+                file += 1
+            if file != 8:
+                raise ValueError(f"Invalid FEN board: {parts[0]!r}")
+
+        if parts[1] not in ('w', 'b'):
+            raise ValueError(f"Invalid FEN side to move: {parts[1]!r}")
+        self.side = WHITE if parts[1] == 'w' else BLACK
+        self.castling = 0
+        for ch, right in (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ)):
+            if ch in parts[2]:
+                self.castling |= right
+        self.ep = EMPTY if parts[3] == '-' else parse_square(parts[3])
+        if self.ep != EMPTY and not self._ep_capturable(self.ep, self.side):
+            self.ep = EMPTY
+        self.halfmove = int(parts[4]) if len(parts) > 4 else 0
+        self.fullmove = int(parts[5]) if len(parts) > 5 else 1
+        self.history = []
+        self.hash = self._compute_hash()
+
+    def copy(self):
+        other = Board.__new__(Board)
+        other.pieces = [list(self.pieces[WHITE]), list(self.pieces[BLACK])]
+        other.occupancy = list(self.occupancy)
+        other.mailbox = list(self.mailbox)
+        other.side = self.side
+        other.castling = self.castling
+        other.ep = self.ep
+        other.halfmove = self.halfmove
+        other.fullmove = self.fullmove
+        other.history = list(self.history)
+        other.hash = self.hash
+        return other
+
+    def _compute_hash(self):
+        h = 0
+        for sq, code in enumerate(self.mailbox):
+            if code != EMPTY:
+                h ^= ZOBRIST_PIECES[code][sq]
+        if self.side == BLACK:
+            h ^= ZOBRIST_SIDE
+        h ^= ZOBRIST_CASTLING[self.castling]
+        if self.ep != EMPTY:
+            h ^= ZOBRIST_EP_FILE[self.ep & 7]
+        return h
+
+    def fen(self):
+        rows = []
+        for rank in range(7, -1, -1):
+            row, empty = '', 0
+            for file in range(8):
+                code = self.mailbox[square(file, rank)]
+                if code == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                symbol = PIECE_SYMBOLS[code % 6]
+                row += symbol.upper() if code < 6 else symbol
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        castling = ''.join(ch for ch, right in (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ))
+                           if self.castling & right) or '-'
+        ep = square_name(self.ep) if self.ep != EMPTY else '-'
+        return f"{'/'.join(rows)} {'wb'[self.side]} {castling} {ep} {self.halfmove} {self.fullmove}"
+
+    # -- low level piece placement ---------------------------------------------
+
+    def _put(self, color, piece, sq):
+        bit = 1 << sq
+        self.pieces[color][piece] |= bit
+        self.occupancy[color] |= bit
+        self.mailbox[sq] = color * 6 + piece
+
+    def _remove(self, color, piece, sq):
+        bit = ~(1 << sq)
+        self.pieces[color][piece] &= bit
+        self.occupancy[color] &= bit
+        self.mailbox[sq] = EMPTY
+
+    def piece_at(self, sq):
+        """(color, piece) on a square, or None."""
+        code = self.mailbox[sq]
+        return None if code == EMPTY else divmod(code, 6)
+
+    def king_square(self, color):
+        return self.pieces[color][KING].bit_length() - 1
+
+    # -- attacks -----------------------------------------------------------
+
+    def is_attacked(self, sq, by_color):
+        pieces = self.pieces[by_color]
+        if KNIGHT_ATTACKS[sq] & pieces[KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & pieces[KING]:
+            return True
+        if PAWN_ATTACKS[by_color ^ 1][sq] & pieces[PAWN]:
+            return True
+        occupied = self.occupancy[WHITE] | self.occupancy[BLACK]
+        if bishop_attacks(sq, occupied) & (pieces[BISHOP] | pieces[QUEEN]):
+            return True
+        if rook_attacks(sq, occupied) & (pieces[ROOK] | pieces[QUEEN]):
+            return True
+        return False
+
+    def in_check(self, color=None):
+        color = self.side if color is None else color
+        return self.is_attacked(self.king_square(color), color ^ 1)
+
+    def _ep_capturable(self, ep, side):
+        """Whether ``side`` has a pawn that could capture onto the en-passant square."""
+        return bool(PAWN_ATTACKS[side ^ 1][ep] & self.pieces[side][PAWN])
+
+    # -- move generation ---------------------------------------------------
+
+    def pseudo_legal_moves(self, captures_only=False):
+        us, them = self.side, self.side ^ 1
+        own = self.occupancy[us]
+        enemy = self.occupancy[them]
+        occupied = own | enemy
+        targets = enemy if captures_only else ~own & FULL_MASK
+        pieces = self.pieces[us]
+        moves = []
+        append = moves.append
+
+        # Pawns
+        promo_rank = RANK_8 if us == WHITE else RANK_1
+        step = 8 if us == WHITE else -8
+        start_rank = 1 if us == WHITE else 6
+        for sq in iter_bits(pieces[PAWN]):
+            attacks = PAWN_ATTACKS[us][sq]
+            caps = attacks & enemy
+            if self.ep != EMPTY and attacks & (1 << self.ep):
+                append(make_move(sq, self.ep))
+            to = sq + step
+            pushes = []
+            if not captures_only or (1 << to) & promo_rank:
+                if not occupied & (1 << to):
+                    pushes.append(to)
+                    if not captures_only and sq >> 3 == start_rank and not occupied & (1 << (to + step)):
+                        pushes.append(to + step)
+            for dest in pushes + list(iter_bits(caps)):
+                if (1 << dest) & promo_rank:
+                    for promo in (QUEEN, KNIGHT, ROOK, BISHOP):
+                        append(make_move(sq, dest, promo))
+                else:
+                    append(make_move(sq, dest))
+
+        for sq in iter_bits(pieces[KNIGHT]):
+            for dest in iter_bits(KNIGHT_ATTACKS[sq] & targets):
+                append(sq | (dest << 6))
+        for sq in iter_bits(pieces[BISHOP]):
+            for dest in iter_bits(bishop_attacks(sq, occupied) & targets):
+                append(sq | (dest << 6))
+        for sq in iter_bits(pieces[ROOK]):
+            for dest in iter_bits(rook_attacks(sq, occupied) & targets):
+                append(sq | (dest << 6))
+        for sq in iter_bits(pieces[QUEEN]):
+            for dest in iter_bits((rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)) & targets):
+                append(sq | (dest << 6))
+        king = self.king_square(us)
+        for dest in iter_bits(KING_ATTACKS[king] & targets):
+            append(king | (dest << 6))
+
+        # Castling (path empty and king does not pass through check)
+        if not captures_only and self.castling:
+            if us == WHITE:
+                if self.castling & CASTLE_WK and not occupied & 0x60 and not self._any_attacked((4, 5, 6), them):
+                    append(make_move(4, 6))
+                if self.castling & CASTLE_WQ and not occupied & 0x0E and not self._any_attacked((4, 3, 2), them):
+                    append(make_move(4, 2))
+            else:
+                if self.castling & CASTLE_BK and not occupied & (0x60 << 56) and not self._any_attacked((60, 61, 62), them):
+                    append(make_move(60, 62))
+                if self.castling & CASTLE_BQ and not occupied & (0x0E << 56) and not self._any_attacked((60, 59, 58), them):
+                    append(make_move(60, 58))
+        return moves
+
+    def _any_attacked(self, squares, by_color):
+        return any(self.is_attacked(sq, by_color) for sq in squares)
+
+    def legal_moves(self):
+        return [move for move in self.pseudo_legal_moves() if self._is_legal_pseudo(move)]
+
+    def _is_legal_pseudo(self, move):
+        """Whether a pseudo-legal move leaves our king safe."""
+        self.push(move)
+        legal = not self.in_check(self.side ^ 1)
+        self.pop()
+        return legal
+
+    def is_legal(self, move):
+        return move in self.legal_moves()
+
+    # -- make / unmake -----------------------------------------------------
+
+    def push(self, move):
+        us, them = self.side, self.side ^ 1
+        from_sq, to_sq, promo = move & 63, (move >> 6) & 63, move >> 12
+        piece = self.mailbox[from_sq] - us * 6
+        captured = self.mailbox[to_sq]
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove, self.hash))
+
+        h = self.hash ^ ZOBRIST_CASTLING[self.castling]
+        if self.ep != EMPTY:
+            h ^= ZOBRIST_EP_FILE[self.ep & 7]
+
+        if captured != EMPTY:
+            self._remove(them, captured - them * 6, to_sq)
+            h ^= ZOBRIST_PIECES[captured][to_sq]
+        self._remove(us, piece, from_sq)
+        h ^= ZOBRIST_PIECES[us * 6 + piece][from_sq]
+        placed = promo if promo else piece
+        self._put(us, placed, to_sq)
+        h ^= ZOBRIST_PIECES[us * 6 + placed][to_sq]
+
+        new_ep = EMPTY
+        if piece == PAWN:
+            if to_sq == self.ep:
+                victim = to_sq - 8 if us == WHITE else to_sq + 8
+                self._remove(them, PAWN, victim)
+                h ^= ZOBRIST_PIECES[them * 6 + PAWN][victim]
+            elif abs(to_sq - from_sq) == 16:
+                candidate = (from_sq + to_sq) // 2
+                if self._ep_capturable(candidate, them):
+                    new_ep = candidate
+        elif piece == KING and abs(to_sq - from_sq) == 2:
+            rook_from, rook_to = (to_sq + 1, to_sq - 1) if to_sq > from_sq else (to_sq - 2, to_sq + 1)
+            self._remove(us, ROOK, rook_from)
+            self._put(us, ROOK, rook_to)
+            h ^= ZOBRIST_PIECES[us * 6 + ROOK][rook_from] ^ ZOBRIST_PIECES[us * 6 + ROOK][rook_to]
+
+        self.castling &= _CASTLING_MASK[from_sq] & _CASTLING_MASK[to_sq]
+        self.ep = new_ep
+        h ^= ZOBRIST_CASTLING[self.castling]
+        if new_ep != EMPTY:
+            h ^= ZOBRIST_EP_FILE[new_ep & 7]
+        self.halfmove = 0 if piece == PAWN or captured != EMPTY else self.halfmove + 1
+        if us == BLACK:
+            self.fullmove += 1
+        self.side = them
+        self.hash = h ^ ZOBRIST_SIDE
+
+    def pop(self):
+        move, captured, castling, ep, halfmove, h = self.history.pop()
+        them = self.side
+        us = them ^ 1
+        from_sq, to_sq, promo = move & 63, (move >> 6) & 63, move >> 12
+        piece = PAWN if promo else self.mailbox[to_sq] - us * 6
+
+        self._remove(us, promo if promo else piece, to_sq)
+        self._put(us, piece, from_sq)
+        if captured != EMPTY:
+            self._put(them, captured - them * 6, to_sq)
+        if piece == PAWN and to_sq == ep:
+            self._put(them, PAWN, to_sq - 8 if us == WHITE else to_sq + 8)
+        elif piece == KING and abs(to_sq - from_sq) == 2:
+            rook_from, rook_to = (to_sq + 1, to_sq - 1) if to_sq > from_sq else (to_sq - 2, to_sq + 1)
+            self._remove(us, ROOK, rook_to)
+            self._put(us, ROOK, rook_from)
+
+        self.castling = castling
+        self.ep = ep
+        self.halfmove = halfmove
+        if us == BLACK:
+            self.fullmove -= 1
+        self.side = us
+        self.hash = h
+        return move
+
+    def push_null(self):
+        self.history.append((0, EMPTY, self.castling, self.ep, self.halfmove, self.hash))
+        h = self.hash ^ ZOBRIST_SIDE
+        if self.ep != EMPTY:
+            h ^= ZOBRIST_EP_FILE[self.ep & 7]
+        self.ep = EMPTY
+        self.side ^= 1
+        self.hash = h
+
+    def pop_null(self):
+        _, _, self.castling, self.ep, self.halfmove, self.hash = self.history.pop()
+        self.side ^= 1
+
+    def push_uci(self, uci):
+        move = self.parse_uci(uci)
+        self.push(move)
+        return move
+
+    def parse_uci(self, uci):
+        try:
+            from_sq, to_sq = parse_square(uci[0:2]), parse_square(uci[2:4])
+            promo = PIECE_SYMBOLS.index(uci[4]) if len(uci) > 4 else 0
+        except (ValueError, IndexError):
+            raise IllegalMoveError(f"Invalid UCI move: {uci!r}")
+        move = make_move(from_sq, to_sq, promo)
+        if move not in self.legal_moves():
+            raise IllegalMoveError(f"Illegal move {uci} in {self.fen()}")
+        return move
+
+    def san(self, move, legal=None):
+        """Standard algebraic notation for a legal move in the current position."""
+        from_sq, to_sq, promo = move & 63, (move >> 6) & 63, move >> 12
+        piece = self.mailbox[from_sq] % 6
+        if legal is None:
+            legal = self.legal_moves()
+
+        if piece == KING and abs(to_sq - from_sq) == 2:
+            text = 'O-O' if to_sq > from_sq else 'O-O-O'
+        else:
+            text = ''
+            capture = self.is_capture(move)
+            if piece == PAWN:
+                if capture:
+                    text = 'abcdefgh'[from_sq & 7]
+            else:
+                text = PIECE_SYMBOLS[piece].upper()
+                rivals = [m & 63 for m in legal
+                          if (m >> 6) & 63 == to_sq and m & 63 != from_sq and self.mailbox[m & 63] % 6 == piece]
+                if rivals:
+                    if all((sq & 7) != (from_sq & 7) for sq in rivals):
+                        text += 'abcdefgh'[from_sq & 7]
+                    elif all((sq >> 3) != (from_sq >> 3) for sq in rivals):
+                        text += str((from_sq >> 3) + 1)
+                    else:
+                        text += square_name(from_sq)
+            if capture:
+                text += 'x'
+            text += square_name(to_sq)
+            if promo:
+                text += '=' + PIECE_SYMBOLS[promo].upper()
+
+        self.push(move)
+        if self.in_check():
+            text += '#' if not self.legal_moves() else '+'
+        self.pop()
+        return text
+
+    def parse_san(self, san):
+        """Resolve a SAN token (check marks and annotations allowed) to a legal move."""
+        text = san.rstrip('+#!?')
+        # Match against pseudo-legal moves and only test the candidates for legality
+        candidates = self.pseudo_legal_moves()
+        if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+            king = self.king_square(self.side)
+            target = king + (2 if len(text) == 3 else -2)
+            for move in candidates:
+                if move & 63 == king and (move >> 6) & 63 == target and self._is_legal_pseudo(move):
+                    return move
+            raise IllegalMoveError(f"Illegal move {san} in {self.fen()}")
+
+        promo = 0
+        if '=' in text:
+            text, promo_symbol = text.split('=', 1)
+            promo = PIECE_SYMBOLS.find(promo_symbol[:1].lower())
+        elif len(text) > 2 and text[-1] in 'QRBNqrbn' and text[-2].isdigit():
+            text, promo = text[:-1], PIECE_SYMBOLS.find(text[-1].lower())
+        if promo < 0 or promo == KING:
+            raise IllegalMoveError(f"Invalid SAN move: {san!r}")
+
+        piece = PAWN
+        if text[:1] in ('N', 'B', 'R', 'Q', 'K'):
+            piece = PIECE_SYMBOLS.index(text[0].lower())
+            text = text[1:]
+        text = text.replace('x', '').replace('-', '')
+        if len(text) < 2:
+            raise IllegalMoveError(f"Invalid SAN move: {san!r}")
+        try:
+            to_sq = parse_square(text[-2:])
+        except ValueError:
+            raise IllegalMoveError(f"Invalid SAN move: {san!r}")
+        hint = text[:-2]
+        from_file = 'abcdefgh'.find(hint[0]) if hint and hint[0] in 'abcdefgh' else None
+        from_rank = int(hint[-1]) - 1 if hint and hint[-1] in '12345678' else None
+
+        matches = [
+            move for move in candidates
+            if (move >> 6) & 63 == to_sq and move >> 12 == promo
+            and self.mailbox[move & 63] % 6 == piece
+            and (from_file is None or (move & 7) == from_file)
+            and (from_rank is None or (move & 63) >> 3 == from_rank)
+            and self._is_legal_pseudo(move)
+        ]
+        if len(matches) != 1:
+            problem = 'Ambiguous' if matches else 'Illegal'
+            raise IllegalMoveError(f"{problem} move {san} in {self.fen()}")
+        return matches[0]
+
+    def push_san(self, san):
+        move = self.parse_san(san)
+        self.push(move)
+        return move
+
+    # -- game state --------------------------------------------------------
+
+    def is_capture(self, move):
+        to_sq = (move >> 6) & 63
+        if self.mailbox[to_sq] != EMPTY:
+            return True
+        return to_sq == self.ep and self.mailbox[move & 63] % 6 == PAWN
+
+    def is_repetition(self, count=2):
+        """Whether the current position occurred ``count`` times before (within the reversible window)."""
+        seen = 0
+        for i in range(len(self.history) - 2, max(len(self.history) - self.halfmove, 0) - 1, -2):
+            if self.history[i][5] == self.hash:
+                seen += 1
+                if seen >= count:
+                    return True
+        return False
+
+    def is_insufficient_material(self):
+        for color in (WHITE, BLACK):
+            pieces = self.pieces[color]
+            if pieces[PAWN] or pieces[ROOK] or pieces[QUEEN]:
+                return False
+        minors = [popcount(self.pieces[c][KNIGHT] | self.pieces[c][BISHOP]) for c in (WHITE, BLACK)]
+        return max(minors) <= 1
+
+    def outcome(self):
+        """'1-0', '0-1', '1/2-1/2' or None while the game is still running."""
+        if not self.legal_moves():
+            if self.in_check():
+                return '0-1' if self.side == WHITE else '1-0'
+            return '1/2-1/2'
+        if self.halfmove >= 100 or self.is_insufficient_material() or self.is_repetition(2):
+            return '1/2-1/2'
+        return None
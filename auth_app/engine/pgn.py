@@ -0,0 +1,91 @@
+"""
+Incremental PGN reader.
+
+``split_games`` cuts a line iterator into per-game text blocks without ever
+holding more than one game in memory. ``parse_game`` turns one block into tag
+pairs plus UCI moves, replaying every SAN move on the bitboard so illegal or
+ambiguous moves are rejected. ``parse_games`` parses a whole batch and is what
+import worker processes run.
+"""
+import re
+
+from .board import Board, move_to_uci
+
+RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+
+_TAG_RE = re.compile(r'^\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]\s*$')
+_COMMENT_RE = re.compile(r'\{[^}]*\}|;[^\n]*')
+_MOVE_NUMBER_RE = re.compile(r'^\d+\.+')
+_NAG_RE = re.compile(r'^\$\d+$')
+
+
+def split_games(lines):
+    """Yield one game's text at a time from an iterable of str lines."""
+    buffer = []
+    in_moves = False
+    for line in lines:
+        stripped = line.strip()
+        if stripped.startswith('[') and in_moves:
+            yield '\n'.join(buffer)
+            buffer, in_moves = [], False
+        if stripped and not stripped.startswith('[') and not stripped.startswith('%'):
+            in_moves = True
+        buffer.append(stripped)
+    if in_moves:
+        yield '\n'.join(buffer)
+
+
+def _strip_variations(text):
+    depth, out = 0, []
+    for ch in text:
+        if ch == '(':
+            depth += 1
+        elif ch == ')':
+            depth = max(depth - 1, 0)
+        elif not depth:
+            out.append(ch)
+    return ''.join(out)
+
+
+def parse_game(text):
+    """
+    Parse one game block. Returns ``{'headers': {...}, 'moves': [uci, ...], 'result': '1-0'}``.
+    Raises ValueError (IllegalMoveError included) on bad input. Games with a SetUp/FEN tag are rejected
+    because stored games always start from the standard position.
+    """
+    headers, body = {}, []
+    for line in text.split('\n'):
+        match = _TAG_RE.match(line)
+        if match:
+            headers[match.group(1)] = match.group(2).replace('\\"', '"').replace('\\\\', '\\')
+        elif line and not line.startswith('%'):
+            body.append(line)
+    if 'FEN' in headers:
+        raise ValueError("Games from a custom start position are not supported")
+
+    movetext = _strip_variations(_COMMENT_RE.sub(' ', '\n'.join(body)))
+    board = Board()
+    moves = []
+    result = headers.get('Result', '*')
+    for token in movetext.split():
+        if token in RESULTS:
+            result = token
+            break
+        token = _MOVE_NUMBER_RE.sub('', token)
+        if not token or _NAG_RE.match(token):
+            continue
+        moves.append(move_to_uci(board.push_san(token)))
+    if result not in RESULTS:
+        result = '*'
+    return {'headers': headers, 'moves': moves, 'result': result}
+
+
+def parse_games(texts):
+    """Parse a batch; returns ``(parsed, errors)`` where errors are (index, message) pairs."""
+    parsed, errors = [], []
+    for index, text in enumerate(texts):
+        try:
+            parsed.append(parse_game(text))
+        except ValueError as e:
+            errors.append((index, str(e)))
+    return parsed, errors
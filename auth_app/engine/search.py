@@ -0,0 +1,368 @@
+"""
+Alpha-beta search with iterative deepening.
+
+Negamax with a transposition table, null-move pruning, check extensions and
+a capture-only quiescence search. Moves are ordered TT move first, then
+captures by MVV-LVA, killer moves and the history heuristic. The clock is
+checked every 1024 nodes; when the budget runs out the best move of the last
+completed iteration is returned.
+
+The transposition table is any object with ``get(key)`` and
+``put(key, depth, score, flag, move)``, so the process-local dict table below
+can be swapped for a shared one.
+"""
+import time
+from dataclasses import dataclass
+
+from .board import (
+    Board, WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, EMPTY,
+    iter_bits, move_to_uci,
+)
+
+MATE = 100000
+MATE_BOUND = MATE - 1000  # scores beyond this are mate distances
+INFINITY = MATE + 1
+EXACT, LOWER, UPPER = 0, 1, 2
+
+PIECE_VALUES = [100, 320, 330, 500, 900, 0]
+
+# Piece-square tables from white's point of view, written rank 8 first
+_PST_RANK8_FIRST = {
+    PAWN: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        50, 50, 50, 50, 50, 50, 50, 50,
+        10, 10, 20, 30, 30, 20, 10, 10,
+        5, 5, 10, 25, 25, 10, 5, 5,
+        0, 0, 0, 20, 20, 0, 0, 0,
+        5, -5, -10, 0, 0, -10, -5, 5,
+        5, 10, 10, -20, -20, 10, 10, 5,
+        0, 0, 0, 0, 0, 0, 0, 0,
+    ],
+    KNIGHT: [
+        -50, -40, -30, -30, -30, -30, -40, -50,
+        -40, -20, 0, 0, 0, 0, -20, -40,
+        -30, 0, 10, 15, 15, 10, 0, -30,
+        -30, 5, 15, 20, 20, 15, 5, -30,
+        -30, 0, 15, 20, 20, 15, 0, -30,
+        -30, 5, 10, 15, 15, 10, 5, -30,
+        -40, -20, 0, 5, 5, 0, -20, -40,
+        -50, -40, -30, -30, -30, -30, -40, -50,
+    ],
+    BISHOP: [
+        -20, -10, -10, -10, -10, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 10, 10, 5, 0, -10,
+        -10, 5, 5, 10, 10, 5, 5, -10,
+        -10, 0, 10, 10, 10, 10, 0, -10,
+        -10, 10, 10, 10, 10, 10, 10, -10,
+        -10, 5, 0, 0, 0, 0, 5, -10,
+        -20, -10, -10, -10, -10, -10, -10, -20,
+    ],
+    ROOK: [
+        0, 0, 0, 0, 0, 0, 0, 0,
+        5, 10, 10, 10, 10, 10, 10, 5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        -5, 0, 0, 0, 0, 0, 0, -5,
+        0, 0, 0, 5, 5, 0, 0, 0,
+    ],
+    QUEEN: [
+        -20, -10, -10, -5, -5, -10, -10, -20,
+        -10, 0, 0, 0, 0, 0, 0, -10,
+        -10, 0, 5, 5, 5, 5, 0, -10,
+        -5, 0, 5, 5, 5, 5, 0, -5,
+        0, 0, 5, 5, 5, 5, 0, -5,
+        -10, 5, 5, 5, 5, 5, 0, -10,
+        -10, 0, 5, 0, 0, 0, 0, -10,
+        -20, -10, -10, -5, -5, -10, -10, -20,
+    ],
+    KING: [
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -30, -40, -40, -50, -50, -40, -40, -30,
+        -20, -30, -30, -40, -40, -30, -30, -20,
+        -10, -20, -20, -20, -20, -20, -20, -10,
+        20, 20, 0, 0, 0, 0, 20, 20,
+        20, 30, 10, 0, 0, 10, 30, 20,
+    ],
+}
+
+
+def _build_pst():
+    # PST[color][piece][square] including material, indexed a1 = 0
+    tables = [[None] * 6 for _ in range(2)]
+    for piece, rows in _PST_RANK8_FIRST.items():
+        white = [0] * 64
+        for i, value in enumerate(rows):
+            rank, file = 7 - i // 8, i % 8
+            white[rank * 8 + file] = value + PIECE_VALUES[piece]
+        tables[WHITE][piece] = white
+        tables[BLACK][piece] = [white[sq ^ 56] for sq in range(64)]
+    return tables
+
+
+PST = _build_pst()
+
+
+def evaluate(board):
+    """Static evaluation in centipawns from the side to move's point of view."""
+    score = 0
+    for piece in range(6):
+        white_table = PST[WHITE][piece]
+        black_table = PST[BLACK][piece]
+        for sq in iter_bits(board.pieces[WHITE][piece]):
+            score += white_table[sq]
+        for sq in iter_bits(board.pieces[BLACK][piece]):
+            score -= black_table[sq]
+    return score if board.side == WHITE else -score
+
+
+def score_to_tt(score, ply):
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def score_from_tt(score, ply):
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+class TranspositionTable:
+    """Process-local table, cleared wholesale when it reaches ``max_entries``."""
+
+    def __init__(self, max_entries=1 << 20):
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        return self._entries.get(key)
+
+    def put(self, key, depth, score, flag, move):
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+        self._entries[key] = (depth, score, flag, move)
+
+    def clear(self):
+        self._entries.clear()
+
+
+class SearchTimeout(Exception):
+    pass
+
+
+@dataclass
+class SearchResult:
+    move: str  # UCI, None when there are no legal moves
+    score: int  # centipawns from the side to move's point of view
+    depth: int
+    nodes: int
+    elapsed: float
+
+    @property
+    def nps(self):
+        return int(self.nodes / self.elapsed) if self.elapsed > 0 else 0
+
+    @property
+    def is_mate(self):
+        return abs(self.score) > MATE_BOUND
+
+
+class Searcher:
+    def __init__(self, tt=None):
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.nodes = 0
+        self._deadline = None
+        self._killers = []
+        self._history = {}
+
+    def search(self, board, time_budget=1.0, max_depth=64):
+        board = board.copy()
+        start = time.perf_counter()
+        self._deadline = start + time_budget
+        self.nodes = 0
+        self._killers = [[0, 0] for _ in range(128)]
+        self._history = {}
+
+        root_moves = board.legal_moves()
+        if not root_moves:
+            score = -MATE if board.in_check() else 0
+            return SearchResult(None, score, 0, 0, 0.0)
+
+        best_move, best_score, completed = root_moves[0], 0, 0
+        for depth in range(1, max_depth + 1):
+            try:
+                score, move = self._root(board, depth, root_moves, best_move)
+            except SearchTimeout:
+                break
+            best_move, best_score, completed = move, score, depth
+            if abs(score) > MATE_BOUND:
+                break
+            # Don't start an iteration that almost certainly cannot finish
+            if time.perf_counter() - start > time_budget * 0.5:
+                break
+
+        return SearchResult(move_to_uci(best_move), best_score, completed, self.nodes, time.perf_counter() - start)
+
+    def _root(self, board, depth, moves, previous_best):
+        moves = sorted(moves, key=lambda m: m != previous_best)
+        alpha, beta = -INFINITY, INFINITY
+        best_move = moves[0]
+        for move in moves:
+            board.push(move)
+            score = -self._negamax(board, depth - 1, -beta, -alpha, 1)
+            board.pop()
+            if score > alpha:
+                alpha, best_move = score, move
+        self.tt.put(board.hash, depth, score_to_tt(alpha, 0), EXACT, best_move)
+        return alpha, best_move
+
+    def _tick(self):
+        self.nodes += 1
+        if not self.nodes & 1023 and time.perf_counter() > self._deadline:
+            raise SearchTimeout()
+
+    def _negamax(self, board, depth, alpha, beta, ply):
+        self._tick()
+        if board.halfmove >= 100 or board.is_repetition(1):
+            return 0
+
+        in_check = board.in_check()
+        if in_check:
+            depth += 1
+        if depth <= 0:
+            return self._quiesce(board, alpha, beta, ply)
+
+        tt_move = 0
+        entry = self.tt.get(board.hash)
+        if entry is not None:
+            tt_depth, tt_score, tt_flag, tt_move = entry
+            if tt_depth >= depth:
+                tt_score = score_from_tt(tt_score, ply)
+                if tt_flag == EXACT:
+                    return tt_score
+                if tt_flag == LOWER and tt_score >= beta:
+                    return tt_score
+                if tt_flag == UPPER and tt_score <= alpha:
+                    return tt_score
+
+        # Null move: if passing still fails high, the position is good enough
+        us = board.side
+        if depth >= 3 and not in_check and beta < MATE_BOUND and self._has_pieces(board, us):
+            board.push_null()
+            score = -self._negamax(board, depth - 3, -beta, -beta + 1, ply + 1)
+            board.pop_null()
+            if score >= beta:
+                return beta
+
+        alpha_orig = alpha
+        best_score, best_move, legal = -INFINITY, 0, 0
+        for move in self._ordered(board, board.pseudo_legal_moves(), tt_move, ply):
+            board.push(move)
+            if board.in_check(us):
+                board.pop()
+                continue
+            legal += 1
+            score = -self._negamax(board, depth - 1, -beta, -alpha, ply + 1)
+            board.pop()
+
+            if score > best_score:
+                best_score, best_move = score, move
+            if score > alpha:
+                alpha = score
+            if alpha >= beta:
+                if not board.is_capture(move) and ply < len(self._killers):
+                    killers = self._killers[ply]
+                    if killers[0] != move:
+                        killers[1], killers[0] = killers[0], move
+                    self._history[move] = self._history.get(move, 0) + depth * depth
+                break
+
+        if not legal:
+            return -MATE + ply if in_check else 0
+
+        if best_score <= alpha_orig:
+            flag = UPPER
+        elif best_score >= beta:
+            flag = LOWER
+        else:
+            flag = EXACT
+        self.tt.put(board.hash, depth, score_to_tt(best_score, ply), flag, best_move)
+        return best_score
+
+    def _quiesce(self, board, alpha, beta, ply):
+        self._tick()
+        stand_pat = evaluate(board)
+        if stand_pat >= beta:
+            return stand_pat
+        if stand_pat > alpha:
+            alpha = stand_pat
+
+        us = board.side
+        for move in self._ordered(board, board.pseudo_legal_moves(captures_only=True), 0, None):
+            board.push(move)
+            if board.in_check(us):
+                board.pop()
+                continue
+            score = -self._quiesce(board, -beta, -alpha, ply + 1)
+            board.pop()
+            if score >= beta:
+                return score
+            if score > alpha:
+                alpha = score
+        return alpha
+
+    def _ordered(self, board, moves, tt_move, ply):
+        mailbox = board.mailbox
+        killers = self._killers[ply] if ply is not None and ply < len(self._killers) else (0, 0)
+        history = self._history
+
+        def priority(move):
+            if move == tt_move:
+                return 10_000_000
+            victim = mailbox[(move >> 6) & 63]
+            if victim != EMPTY:
+                return 1_000_000 + PIECE_VALUES[victim % 6] * 10 - PIECE_VALUES[mailbox[move & 63] % 6] // 10
+            if move >> 12:
+                return 900_000 + PIECE_VALUES[move >> 12]
+            if move == killers[0]:
+                return 800_000
+            if move == killers[1]:
+                return 700_000
+            return history.get(move, 0)
+
+        return sorted(moves, key=priority, reverse=True)
+
+    @staticmethod
+    def _has_pieces(board, color):
+        pieces = board.pieces[color]
+        return bool(pieces[KNIGHT] | pieces[BISHOP] | pieces[ROOK] | pieces[QUEEN])
+
+
+_process_searcher = None
+
+
+def search_position(fen, moves=(), time_budget=1.0, max_depth=64):
+    """
+    Entry point for worker processes: replay ``moves`` (UCI) from ``fen`` so
+    repetitions are visible, then search. The searcher and its transposition
+    table persist per process, so consecutive moves of a game reuse work.
+    """
+    global _process_searcher
+    if _process_searcher is None:
+        _process_searcher = Searcher()
+    board = Board(fen)
+    for uci in moves:
+        board.push_uci(uci)
+    return _process_searcher.search(board, time_budget, max_depth)
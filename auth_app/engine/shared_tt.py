@@ -0,0 +1,65 @@
+"""
+Transposition table in ``multiprocessing.shared_memory``.
+
+Every worker process attaches to the same block, so positions reached by
+several games (common openings above all) are searched once. Each slot is two
+64-bit words: ``key ^ data`` and ``data``. Writers never lock; a reader only
+trusts a slot whose words XOR back to its key, so a torn write from another
+process looks like a miss instead of corrupt data (Hyatt's lockless hashing).
+
+``data`` packs move (16 bits), flag (2), depth (8) and score (21, offset).
+"""
+from multiprocessing import shared_memory
+
+SLOT_WORDS = 2
+WORD_BYTES = 8
+_SCORE_OFFSET = 1 << 20
+_MASK64 = (1 << 64) - 1
+
+
+def _pack(depth, score, flag, move):
+    return move | (flag << 16) | (min(max(depth, 0), 255) << 18) | ((score + _SCORE_OFFSET) << 26)
+
+
+def _unpack(data):
+    return ((data >> 18) & 0xFF, (data >> 26) - _SCORE_OFFSET, (data >> 16) & 3, data & 0xFFFF)
+
+
+class SharedTranspositionTable:
+    def __init__(self, name=None, entries=1 << 20, create=False):
+        """Create a new block (``create=True``) or attach to an existing one by name."""
+        if create:
+            self._shm = shared_memory.SharedMemory(create=True, size=entries * SLOT_WORDS * WORD_BYTES, name=name)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self._words = self._shm.buf.cast('Q')
+        self.entries = len(self._words) // SLOT_WORDS
+        self.name = self._shm.name
+        self.probes = 0
+        self.hits = 0
+
+    def get(self, key):
+        self.probes += 1
+        i = (key % self.entries) * SLOT_WORDS
+        data = self._words[i + 1]
+        if data and self._words[i] ^ data == key:
+            self.hits += 1
+            return _unpack(data)
+        return None
+
+    def put(self, key, depth, score, flag, move):
+        i = (key % self.entries) * SLOT_WORDS
+        old = self._words[i + 1]
+        # Keep a deeper result for the same position; otherwise always replace
+        if old and self._words[i] ^ old == key and ((old >> 18) & 0xFF) > depth:
+            return
+        data = _pack(depth, score, flag, move)
+        self._words[i] = (key ^ data) & _MASK64
+        self._words[i + 1] = data
+
+    def close(self):
+        self._words.release()
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
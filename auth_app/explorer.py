@@ -0,0 +1,163 @@
+"""
+Opening explorer.
+
+Every finished game is replayed once and each (position, move) pair is folded
+into PositionStat, keyed by the engine's Zobrist hash. Answering "what was
+played from this FEN" is then one hash computation and one index range scan,
+and transpositions land on the same rows however the position was reached.
+
+Indexing is incremental: a periodic task picks up games whose
+``positions_indexed`` flag is still false. Hot positions (the first few plies
+of every game) are served from a small in-process LRU with a TTL, so a burst
+of explorer requests doesn't hit the database for the same rows.
+"""
+import logging
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from . import background
+from .engine import Board
+from .lru import LRUCache
+
+logger = logging.getLogger(__name__)
+
+_SIGN_BIT = 1 << 63
+
+
+def signed_key(key):
+    """Map an unsigned 64-bit Zobrist hash onto the signed range of a BIGINT column."""
+    return key - (1 << 64) if key & _SIGN_BIT else key
+
+
+def position_key(fen):
+    """Signed Zobrist key for a FEN. Raises ValueError on malformed input."""
+    return signed_key(Board(fen).hash)
+
+
+cache = LRUCache(settings.EXPLORER_CACHE_SIZE, settings.EXPLORER_CACHE_TTL)
+
+_OUTCOME_FIELDS = {'1-0': 'white_wins', '1/2-1/2': 'draws', '0-1': 'black_wins'}
+STAT_FIELDS = ['games', *_OUTCOME_FIELDS.values()]
+INDEX_WRITE_CHUNK = 500  # rows per bulk statement, and keys per IN list
+
+
+def game_positions(moves):
+    """Distinct (signed key, uci) pairs of a game; a repeated position/move counts once per game."""
+    board = Board()
+    pairs = []
+    seen = set()
+    for uci in moves:
+        pair = (signed_key(board.hash), uci)
+        if pair not in seen:
+            seen.add(pair)
+            pairs.append(pair)
+        board.push_uci(uci)
+    return pairs
+
+
+def pending_games():
+    """Finished games not yet folded into the position table, oldest first."""
+    from .models import Game
+
+    return Game.objects.filter(positions_indexed=False).exclude(result='*').only('id', 'moves', 'result').order_by('id')
+
+
+def index_games(games):
+    """
+    Fold a batch of finished games into the position table. Returns how many were indexed.
+
+    Each game is claimed by flipping its ``positions_indexed`` flag, so concurrent
+    indexers skip it instead of double counting and indexing twice is harmless. The
+    counts of every (position, move) pair in the batch are summed first and written
+    with bulk inserts of the missing rows and bulk updates of INDEX_WRITE_CHUNK rows,
+    rather than one UPDATE per pair.
+    """
+    from .models import Game, PositionStat
+
+    parsed, unreadable = [], []
+    for game in games:
+        outcome = _OUTCOME_FIELDS.get(game.result)
+        if outcome is None:
+            continue
+        try:
+            parsed.append((game.pk, outcome, game_positions(game.move_list)))
+        except ValueError as e:
+            unreadable.append(game.pk)
+            logger.warning(f"⚠️ Skipping game {game.pk} in position index: {e}")
+    if unreadable:
+        # Stored moves are validated on the way in; mark anything unreadable as done so it isn't retried forever
+        Game.objects.filter(pk__in=unreadable).update(positions_indexed=True)
+    if not parsed:
+        return 0
+
+    with transaction.atomic():
+        totals = defaultdict(Counter)  # (key, uci) -> {'games': n, outcome: n}
+        indexed = 0
+        for pk, outcome, pairs in parsed:
+            # Claiming the flag first makes concurrent indexers skip the game instead of double counting
+            if not Game.objects.filter(pk=pk, positions_indexed=False).update(positions_indexed=True):
+                continue
+            indexed += 1
+            for pair in pairs:
+                totals[pair]['games'] += 1
+                totals[pair][outcome] += 1
+        if not totals:
+            return 0
+
+        PositionStat.objects.bulk_create(
+            [PositionStat(zobrist=key, move=uci) for key, uci in totals],
+            ignore_conflicts=True, batch_size=INDEX_WRITE_CHUNK,
+        )
+        keys = sorted({key for key, _ in totals})
+        rows = []
+        for i in range(0, len(keys), INDEX_WRITE_CHUNK):
+            rows.extend(
+                row for row in PositionStat.objects.select_for_update()
+                .filter(zobrist__in=keys[i:i + INDEX_WRITE_CHUNK]).order_by('zobrist', 'move')
+                if (row.zobrist, row.move) in totals
+            )
+        for row in rows:
+            for field, count in totals[(row.zobrist, row.move)].items():
+                setattr(row, field, getattr(row, field) + count)
+        PositionStat.objects.bulk_update(rows, STAT_FIELDS, batch_size=INDEX_WRITE_CHUNK)
+    return indexed
+
+
+def index_pending_games(batch_size=None):
+    """Index up to ``batch_size`` of the oldest pending games. Returns how many were indexed."""
+    indexed = index_games(list(pending_games()[:batch_size or settings.EXPLORER_INDEX_BATCH]))
+    if indexed:
+        logger.info(f"📚 Indexed {indexed} games into the opening explorer")
+    return indexed
+
+
+def lookup(fen):
+    """Moves played from ``fen`` with their results, most popular first."""
+    from .models import PositionStat
+
+    key = position_key(fen)
+    moves = cache.get(key)
+    if moves is None:
+        moves = [
+            {
+                'uci': row['move'],
+                'games': row['games'],
+                'white_wins': row['white_wins'],
+                'draws': row['draws'],
+                'black_wins': row['black_wins'],
+            }
+            for row in PositionStat.objects.filter(zobrist=key, games__gt=0)
+            .order_by('-games')
+            .values('move', 'games', 'white_wins', 'draws', 'black_wins')
+        ]
+        cache.put(key, moves)
+    return {
+        'key': f"{key & 0xFFFFFFFFFFFFFFFF:016x}",
+        'games': sum(m['games'] for m in moves),
+        'moves': moves,
+    }
+
+
+background.register('position_index', settings.EXPLORER_INDEX_INTERVAL, index_pending_games)
@@ -1,3 +1,6 @@
+import uuid
+
+from django.conf import settings
 from rest_framework import serializers
 from .models import User, GameInvitation
 
@@ -10,7 +13,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 
                  'profile_picture', 'is_online', 'last_seen', 'current_room',
-                 'wins', 'draws', 'losses']
+                 'wins', 'draws', 'losses', 'rating']
 
 class GameInvitationSerializer(serializers.ModelSerializer):
     sender = UserSerializer(read_only=True)
@@ -18,9 +21,50 @@ class GameInvitationSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = GameInvitation
-        fields = ['id', 'sender', 'receiver', 'room_id', 'status', 
+        fields = ['id', 'sender', 'receiver', 'room_id', 'challenge_id', 'status',
                  'created_at', 'updated_at']
 
+_datetime_field = serializers.DateTimeField()
+
+def _datetime(value):
+    return _datetime_field.to_representation(value) if value else None
+
+def user_summary(user):
+    """Same keys as UserSerializer, built directly for hot paths."""
+    return {
+        'id': user.id,
+        'username': user.username,
+        'email': user.email,
+        'first_name': user.first_name,
+        'last_name': user.last_name,
+        'profile_picture': user.profile_picture,
+        'is_online': user.is_online,
+        'last_seen': _datetime(user.last_seen),
+        'current_room': user.current_room,
+        'wins': user.wins,
+        'draws': user.draws,
+        'losses': user.losses,
+        'rating': user.rating,
+    }
+
+class InvitationReadSerializer(serializers.BaseSerializer):
+    """
+    Read-only equivalent of GameInvitationSerializer (identical output) without the
+    per-field ModelSerializer machinery. Pass invitations fetched with
+    select_related('sender', 'receiver') so nothing is queried per row.
+    """
+    def to_representation(self, invitation):
+        return {
+            'id': invitation.id,
+            'sender': user_summary(invitation.sender),
+            'receiver': user_summary(invitation.receiver),
+            'room_id': invitation.room_id,
+            'challenge_id': str(invitation.challenge_id) if invitation.challenge_id else None,
+            'status': invitation.status,
+            'created_at': _datetime(invitation.created_at),
+            'updated_at': _datetime(invitation.updated_at),
+        }
+
 class CreateInvitationSerializer(serializers.ModelSerializer):
     receiver_username = serializers.CharField(write_only=True)
     
@@ -57,3 +101,33 @@ class CreateInvitationSerializer(serializers.ModelSerializer):
             receiver=receiver,
             room_id=room_id
         )
+
+
+class CreateChallengeSerializer(serializers.Serializer):
+    """Open challenge: one pending invitation per receiver, sharing a challenge_id and room."""
+    receiver_usernames = serializers.ListField(
+        child=serializers.CharField(), allow_empty=False, max_length=settings.CHALLENGE_MAX_RECEIVERS
+    )
+    room_id = serializers.CharField(max_length=100)
+
+    def create(self, validated_data):
+        sender = self.context['request'].user
+        room_id = validated_data['room_id']
+        usernames = list(dict.fromkeys(validated_data['receiver_usernames']))
+
+        receivers = list(User.objects.filter(username__in=usernames))
+        missing = set(usernames) - {receiver.username for receiver in receivers}
+        if missing:
+            raise serializers.ValidationError(f"Receivers not found: {', '.join(sorted(missing))}")
+        if any(receiver.id == sender.id for receiver in receivers):
+            raise serializers.ValidationError("Cannot invite yourself")
+
+        existing = GameInvitation.objects.filter(sender=sender, receiver__in=receivers, room_id=room_id)
+        if existing.exists():
+            raise serializers.ValidationError("Invitation already sent")
+
+        challenge_id = uuid.uuid4()
+        return GameInvitation.objects.bulk_create([
+            GameInvitation(sender=sender, receiver=receiver, room_id=room_id, challenge_id=challenge_id)
+            for receiver in receivers
+        ])
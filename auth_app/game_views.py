@@ -2,54 +2,136 @@ from rest_framework import status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.parsers import MultiPartParser
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta
-from .models import GameInvitation
-from .game_serializers import UserSerializer, GameInvitationSerializer, CreateInvitationSerializer
-from .mqtt_utils import publish_mqtt_notification
+from django.db import connection, transaction
+from django.db.models import Q
+from .models import GameInvitation, Game, GameAnalysis
+from .game_serializers import UserSerializer, InvitationReadSerializer, CreateInvitationSerializer, CreateChallengeSerializer
+from .notifications import notify, notify_many, since as notifications_since
+from .encoding import ENCODINGS
+from .mqtt_utils import breaker as mqtt_breaker
+from .leaderboard import leaderboard, rating_after, PERIODS
+from .bot import bot_service, pick_bot_color
+from .analysis import pipeline as analysis_pipeline
+from . import bulkheads, explorer, endgame
+from .async_views import BulkheadAPIView
+from .pgn import export_games, import_games
+from .pagination import encode_cursor, decode_cursor, page_size, approximate_count
+from .user_search import index as user_search_index
+from .versioning import conditional_get, bump_invitations
+from .engine import Board, WHITE, IllegalMoveError, START_FEN
+from django.conf import settings
+from django.http import StreamingHttpResponse
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
 
 User = get_user_model()
 
+pagination_params = [
+    openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size (capped)'),
+    openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='next_cursor from the previous page'),
+]
+
 class OnlineUsersView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Get list of users who are currently connected to the server.",
+        operation_description="Get a page of users who are currently connected to the server, ordered by username. Follow `next_cursor` for more; `count` is approximate.",
+        manual_parameters=pagination_params,
         responses={200: 'List of online users'}
     )
+    @conditional_get('users')
     def get(self, request):
-
-        # Get users who were online in the last 5 minutes
-        five_minutes_ago = timezone.now() - timedelta(minutes=5)
-        online_users = User.objects.filter(
-            is_online=True
-        ).exclude(id=request.user.id)
+        try:
+            limit = page_size(request)
+            cursor = decode_cursor(request.query_params['cursor']) if request.query_params.get('cursor') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        online_users = User.objects.filter(is_online=True).exclude(id=request.user.id)
+        page = online_users.order_by('username')
+        if cursor:
+            page = page.filter(username__gt=cursor.get('username', ''))
+        page = list(page[:limit + 1])
         
-        serializer = UserSerializer(online_users, many=True)
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor({'username': page[-1].username})
+        
+        serializer = UserSerializer(page, many=True)
         return Response({
             'online_users': serializer.data,
-            'count': online_users.count()
+            'count': approximate_count(
+                User.objects.filter(is_online=True), 'count:users:online', excluded=int(bool(request.user.is_online))
+            ),
+            'next_cursor': next_cursor
         })
 
 class AllUsersView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Get list of all registered users in the system.",
+        operation_description="Get a page of registered users, online users first then by username. Follow `next_cursor` for more; `count` is approximate.",
+        manual_parameters=pagination_params,
         responses={200: 'List of all users'}
     )
+    @conditional_get('users')
     def get(self, request):
-
+        try:
+            limit = page_size(request)
+            cursor = decode_cursor(request.query_params['cursor']) if request.query_params.get('cursor') else None
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
         # Get all users except current user
-        users = User.objects.exclude(id=request.user.id).order_by('-is_online', 'username')
-        serializer = UserSerializer(users, many=True)
+        users = User.objects.exclude(id=request.user.id)
+        page = users.order_by('-is_online', 'username')
+        if cursor:
+            # Rows after (is_online, username) in "-is_online, username" order
+            username = cursor.get('username', '')
+            if cursor.get('is_online'):
+                page = page.filter(Q(is_online=True, username__gt=username) | Q(is_online=False))
+            else:
+                page = page.filter(is_online=False, username__gt=username)
+        page = list(page[:limit + 1])
+        
+        next_cursor = None
+        if len(page) > limit:
+            page = page[:limit]
+            next_cursor = encode_cursor({'is_online': page[-1].is_online, 'username': page[-1].username})
+        
+        serializer = UserSerializer(page, many=True)
         return Response({
             'users': serializer.data,
-            'count': users.count()
+            'count': approximate_count(User.objects.all(), 'count:users:all', model=User, excluded=1),
+            'next_cursor': next_cursor
+        })
+
+class UserSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Autocomplete users by username or name prefix for invites: exact username first, then online users, then everyone else.",
+        manual_parameters=[
+            openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=10),
+        ],
+        responses={200: 'Matching users'}
+    )
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), settings.USER_SEARCH_MAX_RESULTS)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'query': query,
+            'results': user_search_index.search(query, limit, exclude=request.user.id)
         })
 
 class UpdateOnlineStatusView(APIView):
@@ -105,23 +187,77 @@ class SendInvitationView(APIView):
         )
         
         if serializer.is_valid():
-            invitation = serializer.save()
-            
-            # Send MQTT notification for background/offline support
-            publish_mqtt_notification(
-                invitation.receiver.username,
-                'game_invitation',
-                GameInvitationSerializer(invitation).data
-            )
+            invitation, invitation_data = self.send(serializer)
             
             return Response({
                 'success': True,
-                'invitation': GameInvitationSerializer(invitation).data,
+                'invitation': invitation_data,
                 'message': f'Invitation sent to {invitation.receiver.username}'
             })
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @staticmethod
+    def send(serializer):
+        """Save the invitation and queue its notification in one transaction."""
+        with transaction.atomic():
+            invitation = serializer.save()
+            invitation_data = InvitationReadSerializer(invitation).data
+            
+            # Send MQTT notification for background/offline support
+            notify(
+                invitation.receiver,
+                'game_invitation',
+                invitation_data
+            )
+        return invitation, invitation_data
+
+class SendChallengeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="""
+        Send an open challenge to several users at once. The first receiver to accept
+        wins it and the other invitations are cancelled.
+        **Triggers Real-time Event**: `game_invitation` via MQTT to every receiver.
+        """,
+        request_body=CreateChallengeSerializer,
+        responses={200: 'Challenge sent', 400: 'Error'}
+    )
+    def post(self, request):
+
+        serializer = CreateChallengeSerializer(
+            data=request.data,
+            context={'request': request}
+        )
+        
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        invitations, invitations_data = self.send(serializer, request.user)
+        
+        return Response({
+            'success': True,
+            'challenge_id': str(invitations[0].challenge_id),
+            'invitations': invitations_data,
+            'message': f'Challenge sent to {len(invitations)} users'
+        })
+
+    @staticmethod
+    def send(serializer, sender):
+        """Create every invitation of the challenge and queue their notifications in one transaction."""
+        with transaction.atomic():
+            invitations = serializer.save()
+            # bulk_create skips post_save, so invalidate the invitation ETags here
+            bump_invitations(sender.id, *(invitation.receiver_id for invitation in invitations))
+            invitations_data = InvitationReadSerializer(invitations, many=True).data
+            
+            notify_many(
+                (invitation.receiver, 'game_invitation', data)
+                for invitation, data in zip(invitations, invitations_data)
+            )
+        return invitations, invitations_data
+
 class MyInvitationsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -129,20 +265,25 @@ class MyInvitationsView(APIView):
         operation_description="Get all pending invitations received by the current user.",
         responses={200: 'List of invitations'}
     )
+    @conditional_get('invitations:{user_id}')
     def get(self, request):
 
-        # Get received invitations that are pending
-        invitations = GameInvitation.objects.filter(
-            receiver=request.user,
-            status='pending'
-        ).order_by('-created_at')
+        invitations = list(self.pending(request.user))
         
-        serializer = GameInvitationSerializer(invitations, many=True)
+        serializer = InvitationReadSerializer(invitations, many=True)
         return Response({
             'invitations': serializer.data,
-            'count': invitations.count()
+            'count': len(invitations)
         })
 
+    @staticmethod
+    def pending(user):
+        # Get received invitations that are pending; one query, users joined in
+        return GameInvitation.objects.filter(
+            receiver=user,
+            status='pending'
+        ).select_related('sender', 'receiver').order_by('-created_at')
+
 class RespondToInvitationView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -161,8 +302,14 @@ class RespondToInvitationView(APIView):
     )
     def post(self, request, invitation_id):
 
+        action = request.data.get('action')  # 'accept' or 'decline'
+        if action not in ('accept', 'decline'):
+            return Response({
+                'error': 'Invalid action. Use "accept" or "decline"'
+            }, status=status.HTTP_400_BAD_REQUEST)
+        
         try:
-            invitation = GameInvitation.objects.get(
+            invitation = GameInvitation.objects.only('id', 'challenge_id', 'sender_id').get(
                 id=invitation_id,
                 receiver=request.user,
                 status='pending'
@@ -172,43 +319,92 @@ class RespondToInvitationView(APIView):
                 'error': 'Invitation not found'
             }, status=status.HTTP_404_NOT_FOUND)
         
-        action = request.data.get('action')  # 'accept' or 'decline'
+        won, invitation, invitation_data = self.decide(invitation, action)
         
-        if action == 'accept':
-            invitation.status = 'accepted'
-            message = f'Invitation from {invitation.sender.username} accepted'
-        elif action == 'decline':
-            invitation.status = 'declined'
-            message = f'Invitation from {invitation.sender.username} declined'
-        else:
+        if not won:
             return Response({
-                'error': 'Invalid action. Use "accept" or "decline"'
-            }, status=status.HTTP_400_BAD_REQUEST)
-        
-        invitation.save()
-        
-        publish_mqtt_notification(invitation.sender.username, 'invitation_response', {'invitation': GameInvitationSerializer(invitation).data, 'action': action})
+                'error': 'Invitation is no longer pending',
+                'status': invitation.status
+            }, status=status.HTTP_409_CONFLICT)
         
+        verb = 'accepted' if action == 'accept' else 'declined'
         return Response({
             'success': True,
-            'message': message,
-            'invitation': GameInvitationSerializer(invitation).data
+            'message': f'Invitation from {invitation.sender.username} {verb}',
+            'invitation': invitation_data
         })
 
+    @classmethod
+    def decide(cls, invitation, action):
+        """
+        Apply ``action`` to a pending invitation. Returns (won, invitation reloaded, its data);
+        ``won`` is False when something else settled the invitation first.
+
+        A conditional UPDATE of this row decides the outcome: a concurrent accept, cancel or
+        expiry leaves it no longer pending, and its rowcount is 0. That alone is enough for
+        plain invitations and declines, which touch one row.
+
+        Accepting a challenge also cancels the siblings, and two receivers accepting at once
+        would each win their own row, then block on the other's row when cancelling siblings:
+        both accepted, or a deadlock error, instead of one win and one 409. So a challenge
+        accept first locks the challenge's rows in id order (where the database has row
+        locks), which makes concurrent accepts of that one challenge queue up; the second
+        then finds its row cancelled. Nothing else waits on those locks: other challenges,
+        invitations and declines never take them. On SQLite the first UPDATE takes the
+        database-wide write lock, which serializes the same way.
+        """
+        now = timezone.now()
+        pending = GameInvitation.objects.filter(status='pending')
+        challenge = action == 'accept' and invitation.challenge_id
+        with transaction.atomic():
+            if challenge and connection.features.has_select_for_update:
+                list(GameInvitation.objects.select_for_update().filter(challenge_id=invitation.challenge_id)
+                     .order_by('id').values_list('id', flat=True))
+            won = pending.filter(id=invitation.id).update(
+                status='accepted' if action == 'accept' else 'declined',
+                updated_at=now,
+            )
+            if not won:
+                return False, GameInvitation.objects.select_related('sender', 'receiver').get(id=invitation.id), None
+            losers = []
+            if challenge:
+                # Everyone else the challenge went to has just lost it
+                losers = list(pending.filter(challenge_id=invitation.challenge_id).select_related('sender', 'receiver'))
+                GameInvitation.objects.filter(id__in=[loser.id for loser in losers]).update(
+                    status='cancelled', updated_at=now
+                )
+                for loser in losers:
+                    loser.status, loser.updated_at = 'cancelled', now
+            invitation = GameInvitation.objects.select_related('sender', 'receiver').get(id=invitation.id)
+            invitation_data = InvitationReadSerializer(invitation).data
+            cls.announce(invitation, invitation_data, action, losers)
+        return True, invitation, invitation_data
+
+    @staticmethod
+    def announce(invitation, invitation_data, action, losers):
+        """Invalidate ETags and queue notifications; runs inside the deciding transaction."""
+        bump_invitations(invitation.sender_id, invitation.receiver_id, *(loser.receiver_id for loser in losers))
+        notifications = [(invitation.sender, 'invitation_response', {'invitation': invitation_data, 'action': action})]
+        notifications += [
+            (loser.receiver, 'invitation_cancelled', InvitationReadSerializer(loser).data)
+            for loser in losers
+        ]
+        notify_many(notifications)
+
 @swagger_auto_schema(
     method='POST',
     operation_description="""
     Cancel a previously sent game invitation.
     **Triggers Real-time Event**: `invitation_cancelled` via MQTT and WebSocket.
     """,
-    responses={200: 'Invitation cancelled'}
+    responses={200: 'Invitation cancelled', 404: 'No such pending invitation', 409: 'Already accepted, declined or expired'}
 )
 @api_view(['POST'])
 
 @permission_classes([permissions.IsAuthenticated])
 def cancel_invitation(request, invitation_id):
     try:
-        invitation = GameInvitation.objects.get(
+        invitation = GameInvitation.objects.select_related('sender', 'receiver').get(
             id=invitation_id,
             sender=request.user,
             status='pending'
@@ -218,20 +414,39 @@ def cancel_invitation(request, invitation_id):
             'error': 'Invitation not found'
         }, status=status.HTTP_404_NOT_FOUND)
     
-    invitation.status = 'cancelled'
-    invitation.save()
-    
-    publish_mqtt_notification(
-        invitation.receiver.username,
-        'invitation_cancelled',
-        GameInvitationSerializer(invitation).data
-    )
+    if not cancel(invitation):
+        return Response({
+            'error': 'Invitation is no longer pending',
+            'status': invitation.status
+        }, status=status.HTTP_409_CONFLICT)
     
     return Response({
         'success': True,
         'message': 'Invitation cancelled'
     })
 
+def cancel(invitation):
+    """
+    Cancel a pending invitation and queue the receiver's notification in one transaction.
+    Returns False, with ``invitation.status`` reloaded, when an accept, decline or expiry
+    settled it first; nothing is sent then.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        # Same conditional UPDATE as RespondToInvitationView.decide, so a cancel can't overwrite an accept
+        if not GameInvitation.objects.filter(pk=invitation.pk, status='pending').update(status='cancelled', updated_at=now):
+            invitation.refresh_from_db(fields=['status', 'updated_at'])
+            return False
+        invitation.status, invitation.updated_at = 'cancelled', now
+        bump_invitations(invitation.sender_id, invitation.receiver_id)
+        
+        notify(
+            invitation.receiver,
+            'invitation_cancelled',
+            InvitationReadSerializer(invitation).data
+        )
+    return True
+
 class SendCallSignalView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -260,8 +475,8 @@ class SendCallSignalView(APIView):
              return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
              
         # Send MQTT notification for background/offline support
-        publish_mqtt_notification(
-            receiver.username,
+        notify(
+            receiver,
             'call_invitation',
             {
                 'caller': request.user.username,
@@ -300,8 +515,8 @@ class DeclineCallView(APIView):
              return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
              
         # Send MQTT notification to caller that call was declined
-        publish_mqtt_notification(
-            caller.username,
+        notify(
+            caller,
             'call_declined',
             {
                 'decliner': request.user.username,
@@ -340,8 +555,8 @@ class CancelCallView(APIView):
              return Response({'error': 'User not found'}, status=status.HTTP_404_NOT_FOUND)
              
         # Send MQTT notification that call was cancelled by the caller
-        publish_mqtt_notification(
-            receiver.username,
+        notify(
+            receiver,
             'call_cancelled',
             {
                 'caller': request.user.username,
@@ -355,19 +570,34 @@ class RecordGameResultView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     @swagger_auto_schema(
-        operation_description="Record a game result for the current user.",
+        operation_description="Record a game result for the current user and update their rating.",
         request_body=openapi.Schema(
             type=openapi.TYPE_OBJECT,
             required=['result'],
             properties={
                 'result': openapi.Schema(type=openapi.TYPE_STRING, enum=['win', 'draw', 'loss']),
+                'opponent_username': openapi.Schema(type=openapi.TYPE_STRING),
+                'moves': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_STRING), description='UCI moves from the start position; queues the game for engine analysis'),
+                'color': openapi.Schema(type=openapi.TYPE_STRING, enum=['white', 'black']),
+                'room_id': openapi.Schema(type=openapi.TYPE_STRING, description='Required with moves; both players\' reports for the room become one game'),
             }
         ),
-        responses={200: 'Result recorded'}
+        responses={200: 'Result recorded', 400: 'Invalid result or moves'}
     )
     def post(self, request):
         user = request.user
         result = request.data.get('result')
+        moves = request.data.get('moves')
+        color = request.data.get('color')
+        room_id = str(request.data.get('room_id') or '')
+        
+        if moves is not None:
+            if isinstance(moves, str):
+                moves = moves.split()
+            if not isinstance(moves, list) or color not in ('white', 'black'):
+                return Response({'error': 'moves must be a list of UCI moves and color must be white or black'}, status=status.HTTP_400_BAD_REQUEST)
+            if not room_id:
+                return Response({'error': 'room_id is required with moves'}, status=status.HTTP_400_BAD_REQUEST)
         
         if result == 'win':
             user.wins += 1
@@ -378,10 +608,324 @@ class RecordGameResultView(APIView):
         else:
             return Response({'error': 'Invalid result'}, status=status.HTTP_400_BAD_REQUEST)
         
+        opponent = None
+        opponent_username = request.data.get('opponent_username')
+        if opponent_username:
+            opponent = User.objects.filter(username=opponent_username).first()
+        
+        game = None
+        if moves is not None:
+            try:
+                game = Game.record(user, color, result, [str(m) for m in moves], opponent, room_id)
+            except IllegalMoveError as e:
+                return Response({'error': f'Illegal move sequence: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+            GameAnalysis.enqueue(game)
+        
+        user.rating = rating_after(user.rating, result, opponent.rating if opponent else None)
         user.save()
+        leaderboard.record_result(user, result)
         return Response({
             'success': True, 
             'wins': user.wins, 
             'draws': user.draws, 
-            'losses': user.losses
+            'losses': user.losses,
+            'rating': user.rating,
+            'game_id': game.id if game else None
         })
+
+leaderboard_period_param = openapi.Parameter(
+    'period', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(PERIODS), default='all'
+)
+
+class LeaderboardView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Top players by rating (`all`) or by points won today/this week (`daily`, `weekly`). Served from memory.",
+        manual_parameters=[
+            leaderboard_period_param,
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=10),
+        ],
+        responses={200: 'Leaderboard'}
+    )
+    def get(self, request):
+        period = request.query_params.get('period', 'all')
+        if period not in PERIODS:
+            return Response({'error': f'Invalid period. Use one of {", ".join(PERIODS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get('limit', 10)), 1), 100)
+        except ValueError:
+            return Response({'error': 'Invalid limit'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        return Response({
+            'period': period,
+            'period_key': leaderboard.key(period),
+            'leaderboard': leaderboard.top(period, limit),
+            'count': leaderboard.size(period)
+        })
+
+class MyLeaderboardRankView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Current user's rank and the players directly above and below them.",
+        manual_parameters=[
+            leaderboard_period_param,
+            openapi.Parameter('radius', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=5),
+        ],
+        responses={200: 'Rank and neighbours', 404: 'Not ranked in this period'}
+    )
+    def get(self, request):
+        period = request.query_params.get('period', 'all')
+        if period not in PERIODS:
+            return Response({'error': f'Invalid period. Use one of {", ".join(PERIODS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            radius = min(max(int(request.query_params.get('radius', 5)), 0), 25)
+        except ValueError:
+            return Response({'error': 'Invalid radius'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        standing = leaderboard.around(request.user.id, period, radius)
+        if standing is None:
+            return Response({'error': 'No games recorded in this period'}, status=status.HTTP_404_NOT_FOUND)
+        
+        return Response({'period': period, 'period_key': leaderboard.key(period), **standing})
+
+class PlayBotView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="""
+        Start a game against the built-in computer opponent.
+        Connect to `ws/call/{room_id}/` afterwards; the bot joins the room and answers `move` frames.
+        """,
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            properties={
+                'color': openapi.Schema(type=openapi.TYPE_STRING, enum=['white', 'black', 'random']),
+                'move_time': openapi.Schema(type=openapi.TYPE_NUMBER, description='Bot thinking time per move in seconds'),
+            }
+        ),
+        responses={200: 'Bot room created'}
+    )
+    def post(self, request):
+        color = request.data.get('color', 'random')
+        if color not in ('white', 'black', 'random'):
+            return Response({'error': 'Invalid color. Use "white", "black" or "random"'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            move_time = float(request.data.get('move_time', settings.BOT_MOVE_TIME))
+        except (TypeError, ValueError):
+            return Response({'error': 'Invalid move_time'}, status=status.HTTP_400_BAD_REQUEST)
+        move_time = min(max(move_time, settings.BOT_MIN_MOVE_TIME), settings.BOT_MOVE_TIME * 5)
+        
+        bot_color = pick_bot_color(color)
+        room_id = bot_service.create_game(bot_color, move_time)
+        return Response({
+            'success': True,
+            'room_id': room_id,
+            'color': 'black' if bot_color == WHITE else 'white',
+            'move_time': move_time
+        })
+
+class BotStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Computer opponent throughput: nodes/sec per core, games served per core and queue depth.",
+        responses={200: 'Bot service statistics'}
+    )
+    def get(self, request):
+        return Response(bot_service.stats())
+
+class GameAnalysisView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Engine analysis of one of your games: per-position evaluations (centipawns, white's view), best moves, accuracy and blunder/mistake counts per side.",
+        responses={200: 'Analysis (status queued/running/done/failed)', 404: 'Game not found'}
+    )
+    def get(self, request, game_id):
+        game = Game.objects.filter(id=game_id).select_related('analysis').first()
+        if game is None or request.user.id not in (game.white_id, game.black_id):
+            return Response({'error': 'Game not found'}, status=status.HTTP_404_NOT_FOUND)
+        
+        analysis = getattr(game, 'analysis', None)
+        if analysis is None:
+            analysis = GameAnalysis.enqueue(game)
+        
+        data = {'game_id': game.id, 'moves': game.move_list, 'result': game.result, 'status': analysis.status}
+        if analysis.status == 'done':
+            data.update({
+                'evaluations': analysis.evaluations,
+                'best_moves': analysis.best_moves,
+                'white': {'accuracy': analysis.white_accuracy, 'mistakes': analysis.white_mistakes, 'blunders': analysis.white_blunders},
+                'black': {'accuracy': analysis.black_accuracy, 'mistakes': analysis.black_mistakes, 'blunders': analysis.black_blunders},
+                'nodes': analysis.nodes,
+            })
+        elif analysis.status == 'failed':
+            data['error'] = analysis.error
+        return Response(data)
+
+class AnalysisStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Analysis pipeline throughput: games/minute, positions/second, shared transposition table hit rate and queue depth.",
+        responses={200: 'Analysis pipeline statistics'}
+    )
+    def get(self, request):
+        return Response(analysis_pipeline.stats())
+
+class OpeningExplorerView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Moves played from a position in stored games, with white wins / draws / black wins for each. Positions are matched by Zobrist hash, so transpositions are merged.",
+        manual_parameters=[
+            openapi.Parameter('fen', openapi.IN_QUERY, type=openapi.TYPE_STRING, description='Defaults to the starting position'),
+        ],
+        responses={200: 'Moves and results from this position', 400: 'Invalid FEN'}
+    )
+    def get(self, request):
+        fen = request.query_params.get('fen') or START_FEN
+        try:
+            data = explorer.lookup(fen)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        data['fen'] = fen
+        return Response(data)
+
+class GameExportView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Download all of your games as a PGN file. The file is streamed, so it works for any archive size. Pass `compress=gzip` for a .pgn.gz.",
+        manual_parameters=[
+            openapi.Parameter('compress', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['gzip']),
+        ],
+        responses={200: 'PGN file'}
+    )
+    def get(self, request):
+        compress = request.query_params.get('compress') == 'gzip'
+        filename = f"{request.user.username}_games.pgn"
+        if compress:
+            response = StreamingHttpResponse(export_games(request.user, compress=True), content_type='application/gzip')
+            filename += '.gz'
+        else:
+            response = StreamingHttpResponse(export_games(request.user), content_type='application/x-chess-pgn; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+class GameImportView(BulkheadAPIView):
+    permission_classes = [permissions.IsAuthenticated]
+    parser_classes = [MultiPartParser]
+    bulkhead = bulkheads.cpu  # parses and writes up to PGN_IMPORT_MAX_UPLOAD_MB of PGN
+    
+    @swagger_auto_schema(
+        operation_description="Import games you played elsewhere from a PGN file. Only games where `player_name` (default: your username) appears as White or Black are imported, linked to your account; the rest are counted as `not_played`.",
+        manual_parameters=[
+            openapi.Parameter('file', openapi.IN_FORM, type=openapi.TYPE_FILE, required=True),
+            openapi.Parameter('player_name', openapi.IN_FORM, type=openapi.TYPE_STRING),
+        ],
+        responses={200: 'Import summary', 400: 'Missing or oversized file'}
+    )
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if upload.size > settings.PGN_IMPORT_MAX_UPLOAD_MB * 1024 * 1024:
+            return Response({'error': f'File too large (max {settings.PGN_IMPORT_MAX_UPLOAD_MB} MB)'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        lines = (line.decode('utf-8', errors='replace') for line in upload)
+        stats = import_games(lines, owner=request.user, owner_name=request.data.get('player_name') or None)
+        return Response(stats)
+
+class EndgameProbeView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Exact result of a king + queen/rook/pawn vs king position from the endgame bitbase, for adjudicating or offering draws. `covered` is false for other material.",
+        manual_parameters=[
+            openapi.Parameter('fen', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=True),
+        ],
+        responses={200: 'Probe result', 400: 'Invalid FEN'}
+    )
+    def get(self, request):
+        fen = request.query_params.get('fen')
+        if not fen:
+            return Response({'error': 'fen is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            board = Board(fen)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        verdict = endgame.adjudicate(board)
+        if verdict is None:
+            return Response({'fen': fen, 'covered': False})
+        return Response({'fen': fen, 'covered': True, **verdict})
+
+class NotificationSyncView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Everything in the current user's notification inbox after `cursor` (the `id` of the last MQTT notification or the previous `next_cursor`), oldest first. Call once on app resume; repeat while `has_more` is true.",
+        manual_parameters=[
+            openapi.Parameter('cursor', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Last notification id already handled (0 for everything retained)'),
+            openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, description='Page size (capped)'),
+        ],
+        responses={200: 'Notifications since the cursor', 400: 'Invalid cursor or limit'}
+    )
+    def get(self, request):
+        try:
+            cursor = int(request.query_params.get('cursor', 0))
+            limit = page_size(request)
+        except ValueError:
+            return Response({'error': 'cursor and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        notifications = notifications_since(request.user, cursor, limit + 1)
+        has_more = len(notifications) > limit
+        notifications = notifications[:limit]
+        return Response({
+            'notifications': notifications,
+            'next_cursor': notifications[-1]['id'] if notifications else cursor,
+            'has_more': has_more,
+        })
+
+class NotificationEncodingView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="The wire encoding used for the current user's MQTT and WebSocket notifications.",
+        responses={200: 'Current and available encodings'}
+    )
+    def get(self, request):
+        return Response({'encoding': request.user.notification_encoding, 'available': list(ENCODINGS)})
+    
+    @swagger_auto_schema(
+        operation_description="Choose the notification encoding: `json` (full payloads), `compact` (trimmed JSON) or `msgpack` (trimmed, MessagePack).",
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['encoding'],
+            properties={
+                'encoding': openapi.Schema(type=openapi.TYPE_STRING, enum=list(ENCODINGS)),
+            }
+        ),
+        responses={200: 'Encoding updated', 400: 'Unknown encoding'}
+    )
+    def put(self, request):
+        encoding = request.data.get('encoding')
+        if encoding not in ENCODINGS:
+            return Response({'error': f'encoding must be one of {", ".join(ENCODINGS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        request.user.notification_encoding = encoding
+        request.user.save(update_fields=['notification_encoding'])
+        return Response({'encoding': encoding, 'available': list(ENCODINGS)})
+
+class MQTTPublisherStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="MQTT publisher circuit breaker state and counters (successful/failed batches, calls rejected while open, messages deferred to a later outbox drain).",
+        responses={200: 'Publisher statistics'}
+    )
+    def get(self, request):
+        return Response(mqtt_breaker.stats())
@@ -8,14 +8,17 @@ from requests import RequestException
 import requests
 import json
 from drf_yasg.utils import swagger_auto_schema
+from . import bulkheads
+from .async_views import BulkheadAPIView
 
 User = get_user_model()
 
-class GoogleLoginView(APIView):
+class GoogleLoginView(BulkheadAPIView):
     """
     Google Sign-In endpoint for Django authentication
     """
     permission_classes = [permissions.AllowAny]
+    bulkhead = bulkheads.network  # waits on googleapis.com
     
     @swagger_auto_schema(auto_schema=None)
     def post(self, request):
@@ -0,0 +1,177 @@
+"""
+Dependency health for the liveness and readiness probes.
+
+Orchestrators probe every few seconds, so the probes must not touch the
+database themselves. A periodic task (every HEALTH_CHECK_INTERVAL seconds)
+checks the dependencies and stores a snapshot, and the readiness endpoint
+only reads it:
+
+    database       a connection and ``SELECT 1``, with its latency
+    channel_layer  a message sent to and received from a fresh channel
+    notifications  the MQTT publisher's circuit breaker and the outbox
+                   backlog (bounded count and age of the oldest row,
+                   both off the partial unpublished index)
+
+With HEALTH_ROW_ESTIMATES the snapshot also carries table sizes from the
+planner's catalog statistics (PostgreSQL only; never a COUNT(*)).
+
+The process is ready when the database and channel layer are up and the
+snapshot is fresh; an open breaker or a growing outbox only marks it
+degraded, since notifications wait in the outbox until the broker is back.
+In a process without background tasks the snapshot is refreshed inline
+when stale, by one request at a time.
+"""
+import logging
+import threading
+import time
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from . import background
+from .mqtt_utils import breaker as mqtt_breaker
+from .pagination import table_estimate
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BACKLOG_CAP = 1000  # the backlog is counted up to this many rows
+
+_lock = threading.Lock()
+_inline_refresh = threading.Lock()
+_snapshot = None
+
+
+def check_database():
+    started = time.monotonic()
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return {'vendor': connection.vendor, 'latency_ms': round((time.monotonic() - started) * 1000, 2)}
+
+
+def check_channel_layer():
+    layer = get_channel_layer()
+    if layer is None:
+        raise RuntimeError('CHANNEL_LAYERS is not configured')
+
+    async def round_trip():
+        channel = await layer.new_channel('health.')
+        await layer.send(channel, {'type': 'health.ping', 'nonce': uuid.uuid4().hex})
+        return await layer.receive(channel)
+
+    started = time.monotonic()
+    async_to_sync(round_trip)()
+    return {'backend': type(layer).__name__, 'latency_ms': round((time.monotonic() - started) * 1000, 2)}
+
+
+def check_notifications():
+    from .models import Notification
+
+    unpublished = Notification.objects.filter(published_at__isnull=True)
+    backlog = unpublished.values('id')[:OUTBOX_BACKLOG_CAP].count()
+    oldest = unpublished.order_by('id').values_list('created_at', flat=True).first()
+    breaker = mqtt_breaker.stats()
+    oldest_age = round((timezone.now() - oldest).total_seconds(), 1) if oldest else 0
+    return {
+        'breaker': breaker['state'],
+        'last_error': breaker['last_error'],
+        'outbox_backlog': backlog if backlog < OUTBOX_BACKLOG_CAP else f"{OUTBOX_BACKLOG_CAP}+",
+        'outbox_oldest_seconds': oldest_age,
+        'healthy': breaker['state'] == mqtt_breaker.CLOSED and oldest_age <= settings.HEALTH_OUTBOX_MAX_AGE,
+    }
+
+
+def row_estimates():
+    from .models import Game, Notification, User
+
+    return {model._meta.db_table: table_estimate(model) for model in (User, Game, Notification)}
+
+
+def _run(check):
+    try:
+        return {'status': 'ok', **check()}
+    except Exception as e:
+        logger.error(f"❌ Health: {check.__name__} failed - {type(e).__name__}: {str(e)}")
+        return {'status': 'error', 'error': f"{type(e).__name__}: {str(e)}"}
+
+
+def refresh():
+    """Check every dependency now and store the snapshot."""
+    global _snapshot
+    started = time.monotonic()
+    dependencies = {
+        'database': _run(check_database),
+        'channel_layer': _run(check_channel_layer),
+        'notifications': _run(check_notifications),
+    }
+    notifications = dependencies['notifications']
+    if notifications['status'] == 'ok' and not notifications.pop('healthy'):
+        notifications['status'] = 'degraded'
+
+    snapshot = {
+        'dependencies': dependencies,
+        'checked_at': timezone.now(),
+        'duration_ms': round((time.monotonic() - started) * 1000, 1),
+        'monotonic': time.monotonic(),
+    }
+    if settings.HEALTH_ROW_ESTIMATES and dependencies['database']['status'] == 'ok':
+        try:
+            snapshot['row_estimates'] = row_estimates()
+        except Exception as e:
+            logger.error(f"❌ Health: row estimates failed - {type(e).__name__}: {str(e)}")
+    with _lock:
+        _snapshot = snapshot
+    return snapshot
+
+
+def readiness():
+    """
+    The last snapshot with an overall ``status`` (ready, degraded or unready)
+    and ``ready`` flag. Unready when the database or channel layer failed or
+    the snapshot is older than HEALTH_CHECK_MAX_AGE (the refresh task died).
+    """
+    with _lock:
+        current = _snapshot
+    age = None if current is None else time.monotonic() - current['monotonic']
+    stale = age is None or age > settings.HEALTH_CHECK_INTERVAL
+    if stale and not _task.is_running and _inline_refresh.acquire(blocking=False):
+        try:
+            current = refresh()  # no background tasks in this process
+            age = 0.0
+        finally:
+            _inline_refresh.release()
+
+    if current is None:
+        return {'status': 'unready', 'ready': False, 'reason': 'no health snapshot yet'}
+
+    dependencies = current['dependencies']
+    if age > settings.HEALTH_CHECK_MAX_AGE:
+        status, reason = 'unready', f"health snapshot is {age:.1f}s old"
+    elif any(dependencies[name]['status'] != 'ok' for name in ('database', 'channel_layer')):
+        status, reason = 'unready', 'a required dependency is down'
+    elif dependencies['notifications']['status'] != 'ok':
+        status, reason = 'degraded', 'notifications are delayed'
+    else:
+        status, reason = 'ready', None
+
+    result = {
+        'status': status,
+        'ready': status != 'unready',
+        'checked_at': current['checked_at'].isoformat(),
+        'age_seconds': round(age, 1),
+        'duration_ms': current['duration_ms'],
+        'dependencies': dependencies,
+    }
+    if reason:
+        result['reason'] = reason
+    if 'row_estimates' in current:
+        result['row_estimates'] = current['row_estimates']
+    return result
+
+
+_task = background.register('health', settings.HEALTH_CHECK_INTERVAL, refresh)
+_task.wake()  # take the first snapshot as soon as the task starts, not one interval later
@@ -0,0 +1,99 @@
+"""
+Expiry sweeper for pending game invitations.
+
+Invitations nobody answers would otherwise stay ``pending`` forever and keep
+growing the set that MyInvitationsView and the duplicate check in
+CreateInvitationSerializer have to scan. Every INVITATION_SWEEP_INTERVAL
+seconds the oldest pending rows past INVITATION_TTL are marked ``expired``.
+
+Work is done in chunks of INVITATION_SWEEP_BATCH rows, each in its own short
+transaction: lock the chunk (``SKIP LOCKED``, so rows a user is accepting
+right now are simply left for the next sweep), update it with one statement
+and commit. The (status, created_at) index turns the chunk selection into a
+range scan. The UPDATE re-checks ``status='pending'``, and only the rows it
+changed are announced: both players' ``invitation_cancelled`` notifications
+are queued in the same transaction and published by the outbox drain once
+it commits.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import background, versioning
+from .game_serializers import InvitationReadSerializer
+from .models import GameInvitation
+from .notifications import notify_many
+
+logger = logging.getLogger(__name__)
+
+
+def _claim(cutoff, batch_size):
+    """(id, sender_id, receiver_id) of up to ``batch_size`` stale pending invitations, locked."""
+    return list(
+        GameInvitation.objects.select_for_update(skip_locked=True)
+        .filter(status='pending', created_at__lt=cutoff)
+        .order_by('created_at')
+        .values_list('id', 'sender_id', 'receiver_id')[:batch_size]
+    )
+
+
+def _expire_chunk(cutoff, batch_size):
+    """Expire up to ``batch_size`` stale invitations. Returns (rows claimed, ids expired)."""
+    with transaction.atomic():
+        rows = _claim(cutoff, batch_size)
+        if not rows:
+            return 0, []
+        ids = [row[0] for row in rows]
+        now = timezone.now()
+        with transaction.atomic():
+            all_expired = GameInvitation.objects.filter(
+                id__in=ids, status='pending'
+            ).update(status='expired', updated_at=now) == len(ids)
+            if not all_expired:
+                # Some were answered after the SELECT (SKIP LOCKED is a no-op on SQLite): undo, and
+                # expire row by row so only the invitations this sweep changed get announced
+                transaction.set_rollback(True)
+        if not all_expired:
+            ids = [
+                pk for pk in ids
+                if GameInvitation.objects.filter(id=pk, status='pending').update(status='expired', updated_at=now)
+            ]
+        expired = set(ids)
+        # .update() skips post_save, so invalidate the invitation ETags here
+        versioning.bump_invitations(*(user_id for row in rows if row[0] in expired for user_id in row[1:]))
+        _notify(ids)
+    return len(rows), ids
+
+
+def _notify(ids):
+    invitations = GameInvitation.objects.filter(id__in=ids).select_related('sender', 'receiver')
+    notifications = []
+    for invitation in invitations:
+        payload = InvitationReadSerializer(invitation).data
+        notifications.append((invitation.receiver, 'invitation_cancelled', payload))
+        notifications.append((invitation.sender, 'invitation_cancelled', payload))
+    notify_many(notifications)  # queued in the chunk's transaction, published after it commits
+
+
+def expire_stale_invitations(ttl=None, batch_size=None):
+    """Expire every pending invitation older than ``ttl`` seconds. Returns the number expired."""
+    ttl = settings.INVITATION_TTL if ttl is None else ttl
+    batch_size = batch_size or settings.INVITATION_SWEEP_BATCH
+    if ttl <= 0:
+        return 0
+    cutoff = timezone.now() - timedelta(seconds=ttl)
+    expired = 0
+    while True:
+        claimed, ids = _expire_chunk(cutoff, batch_size)
+        expired += len(ids)
+        if claimed < batch_size:
+            break
+    if expired:
+        logger.info(f"⌛ Expired {expired} pending invitations older than {ttl}s")
+    return expired
+
+
+background.register('invitation_expiry', settings.INVITATION_SWEEP_INTERVAL, expire_stale_invitations)
@@ -0,0 +1,284 @@
+"""
+In-memory leaderboard with incremental rank maintenance.
+
+Scores live in integer buckets counted by a Fenwick tree, so recording a
+result, looking up a rank or selecting the k-th player are all O(log n)
+without touching the database. Three boards are kept:
+
+- ``all``: current Elo rating of every user (loaded once from the DB)
+- ``daily`` / ``weekly``: points won in the current window (win = 2, draw = 1
+  half-points), reset when the window rolls over
+
+Windowed boards are snapshotted to ``LeaderboardSnapshot`` periodically and
+restored from the latest snapshot on startup. Boards are per process; the
+server runs a single Daphne worker (see Procfile).
+"""
+import bisect
+import logging
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import background
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ('all', 'daily', 'weekly')
+SCORE_BUCKETS = 4096  # ratings / half-points are clamped into [0, SCORE_BUCKETS)
+RESULT_POINTS = {'win': 2, 'draw': 1, 'loss': 0}
+ELO_K_FACTOR = 32
+
+
+def expected_score(rating, opponent_rating):
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def rating_after(rating, result, opponent_rating=None):
+    """Elo update for a single reported result. Without an opponent assume an equal one."""
+    if opponent_rating is None:
+        opponent_rating = rating
+    actual = RESULT_POINTS[result] / 2
+    return round(rating + ELO_K_FACTOR * (actual - expected_score(rating, opponent_rating)))
+
+
+def period_key(period, now=None):
+    now = timezone.localtime(now or timezone.now())
+    if period == 'daily':
+        return now.date().isoformat()
+    if period == 'weekly':
+        year, week, _ = now.isocalendar()
+        return f"{year}-W{week:02d}"
+    return 'all'
+
+
+class FenwickTree:
+    """Binary indexed tree over bucket counts (0-based public indexes)."""
+
+    def __init__(self, size):
+        self.size = size
+        self._tree = [0] * (size + 1)
+        self._top_bit = 1 << (size.bit_length() - 1)
+
+    def add(self, index, delta):
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index):
+        """Sum of buckets [0, index]; prefix(-1) == 0."""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k):
+        """Smallest bucket index whose prefix sum is >= k (k is 1-based)."""
+        pos = 0
+        step = self._top_bit
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+
+class RankedBoard:
+    """
+    Users ranked by score, highest first, ties broken by user id.
+
+    Bucket i of the Fenwick tree holds users with score ``SCORE_BUCKETS - 1 - i``
+    so that prefix sums count players ranked above a given score.
+    """
+
+    def __init__(self, size=SCORE_BUCKETS):
+        self._tree = FenwickTree(size)
+        self._size = size
+        self._buckets = {}
+        self._scores = {}
+
+    def __len__(self):
+        return len(self._scores)
+
+    def _index(self, score):
+        return self._size - 1 - min(max(score, 0), self._size - 1)
+
+    def score_of(self, user_id):
+        return self._scores.get(user_id)
+
+    def set(self, user_id, score):
+        old = self._scores.get(user_id)
+        if old == score:
+            return
+        if old is not None:
+            self.discard(user_id)
+        index = self._index(score)
+        bisect.insort(self._buckets.setdefault(index, []), user_id)
+        self._tree.add(index, 1)
+        self._scores[user_id] = score
+
+    def add(self, user_id, delta):
+        self.set(user_id, self._scores.get(user_id, 0) + delta)
+
+    def discard(self, user_id):
+        score = self._scores.pop(user_id, None)
+        if score is None:
+            return
+        index = self._index(score)
+        bucket = self._buckets[index]
+        del bucket[bisect.bisect_left(bucket, user_id)]
+        if not bucket:
+            del self._buckets[index]
+        self._tree.add(index, -1)
+
+    def rank(self, user_id):
+        """1-based rank, or None if the user is not on the board."""
+        score = self._scores.get(user_id)
+        if score is None:
+            return None
+        index = self._index(score)
+        return self._tree.prefix(index - 1) + bisect.bisect_left(self._buckets[index], user_id) + 1
+
+    def slice(self, start_rank, count):
+        """Up to ``count`` consecutive entries starting at a 1-based rank, as (rank, user_id, score)."""
+        entries = []
+        rank = max(start_rank, 1)
+        end = min(rank + count, len(self._scores) + 1)
+        while rank < end:
+            index = self._tree.find(rank)
+            bucket = self._buckets[index]
+            offset = rank - self._tree.prefix(index - 1) - 1
+            for user_id in bucket[offset:offset + end - rank]:
+                entries.append((rank, user_id, self._scores[user_id]))
+                rank += 1
+        return entries
+
+
+class Leaderboard:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._boards = {period: RankedBoard() for period in PERIODS}
+        self._keys = {period: period_key(period) for period in PERIODS}
+        self._usernames = {}
+        self._finished = []
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        from .models import User, LeaderboardSnapshot
+
+        for user_id, username, rating in User.objects.values_list('id', 'username', 'rating').iterator():
+            self._usernames[user_id] = username
+            self._boards['all'].set(user_id, rating)
+
+        for period in ('daily', 'weekly'):
+            rows = LeaderboardSnapshot.objects.filter(
+                period=period, period_key=self._keys[period]
+            ).values_list('user_id', 'score')
+            for user_id, score in rows:
+                self._boards[period].set(user_id, score)
+        self._loaded = True
+
+    def _roll_windows(self):
+        for period in ('daily', 'weekly'):
+            key = period_key(period)
+            if key != self._keys[period]:
+                # Keep the closed window around so the next snapshot records its final standings
+                board = self._boards[period]
+                self._finished.append((period, self._keys[period], board.slice(1, len(board))))
+                self._keys[period] = key
+                self._boards[period] = RankedBoard()
+
+    def _board(self, period):
+        if period not in PERIODS:
+            raise ValueError(f"Unknown leaderboard period '{period}'")
+        self._ensure_loaded()
+        self._roll_windows()
+        return self._boards[period]
+
+    def record_result(self, user, result):
+        """Apply a saved result: ``user.rating`` must already hold the new rating."""
+        with self._lock:
+            self._board('all')
+            self._usernames[user.id] = user.username
+            self._boards['all'].set(user.id, user.rating)
+            for period in ('daily', 'weekly'):
+                self._boards[period].add(user.id, RESULT_POINTS[result])
+
+    def _entry(self, rank, user_id, score, period):
+        return {
+            'rank': rank,
+            'user_id': user_id,
+            'username': self._usernames.get(user_id),
+            'score': score if period == 'all' else score / 2,
+        }
+
+    def top(self, period='all', limit=10):
+        with self._lock:
+            board = self._board(period)
+            return [self._entry(*entry, period) for entry in board.slice(1, limit)]
+
+    def around(self, user_id, period='all', radius=5):
+        """Rank and score of a user plus up to ``radius`` neighbours on each side."""
+        with self._lock:
+            board = self._board(period)
+            rank = board.rank(user_id)
+            if rank is None:
+                return None
+            start = max(rank - radius, 1)
+            neighbours = board.slice(start, rank + radius - start + 1)
+            score = board.score_of(user_id)
+            return {
+                'rank': rank,
+                'score': score if period == 'all' else score / 2,
+                'total': len(board),
+                'neighbours': [self._entry(*entry, period) for entry in neighbours],
+            }
+
+    def size(self, period='all'):
+        with self._lock:
+            return len(self._board(period))
+
+    def key(self, period):
+        with self._lock:
+            self._board(period)
+            return self._keys[period]
+
+    def snapshot(self):
+        """Persist windowed boards and the top of the all-time board."""
+        from .models import LeaderboardSnapshot
+
+        with self._lock:
+            self._ensure_loaded()
+            self._roll_windows()
+            captured, self._finished = self._finished, []
+            for period in PERIODS:
+                board = self._boards[period]
+                count = len(board) if period != 'all' else settings.LEADERBOARD_SNAPSHOT_SIZE
+                captured.append((period, self._keys[period], board.slice(1, count)))
+
+        # Write outside the lock so results keep flowing while the DB is busy
+        for period, key, entries in captured:
+            with transaction.atomic():
+                LeaderboardSnapshot.objects.filter(period=period, period_key=key).delete()
+                LeaderboardSnapshot.objects.bulk_create([
+                    LeaderboardSnapshot(period=period, period_key=key, user_id=user_id, rank=rank, score=score)
+                    for rank, user_id, score in entries
+                ], batch_size=1000)
+        logger.info(f"📸 Leaderboard snapshot written ({', '.join(f'{p}={len(e)}' for p, _, e in captured)})")
+
+
+leaderboard = Leaderboard()
+
+background.register(
+    'leaderboard_snapshot',
+    settings.LEADERBOARD_SNAPSHOT_INTERVAL,
+    leaderboard.snapshot,
+)
@@ -0,0 +1,121 @@
+"""
+Open-seek lobby with diff-based push updates.
+
+Open seeks (time control, rating, colour) live in memory, indexed by time
+control. Subscribers join one channel-layer group per time control they
+watch (or the ``lobby_all`` group), receive a snapshot once, and from then on
+only ``seek_added`` / ``seek_removed`` diffs. Every change bumps a lobby-wide
+version so clients can drop diffs that are already reflected in their snapshot.
+
+Like the matchmaker this lives on the server's event loop, so mutations need
+no locking.
+"""
+import itertools
+import time
+from dataclasses import dataclass, field, asdict
+
+from channels.layers import get_channel_layer
+
+COLOR_CHOICES = ('white', 'black', 'random')
+ALL_GROUP = 'lobby_all'
+
+
+def group_for(time_control):
+    # Channel layer group names only allow [a-zA-Z0-9_.-]
+    return f"lobby_{time_control.replace('+', '_')}"
+
+
+@dataclass
+class OpenSeek:
+    id: int
+    user_id: int
+    username: str
+    rating: int
+    time_control: str
+    color: str
+    channel_name: str = field(default=None, repr=False)
+    created_at: float = field(default_factory=time.time)
+
+    def as_dict(self):
+        data = asdict(self)
+        del data['channel_name']
+        return data
+
+
+class SeekLobby:
+    def __init__(self):
+        self._by_time_control = {}  # time control -> {seek_id: OpenSeek}, insertion ordered
+        self._by_user = {}  # user_id -> seek_id (one open seek per user)
+        self._ids = itertools.count(1)
+        self.version = 0
+
+    def __len__(self):
+        return len(self._by_user)
+
+    def snapshot(self, time_controls=None):
+        if time_controls is None:
+            time_controls = self._by_time_control.keys()
+        seeks = []
+        for time_control in time_controls:
+            seeks.extend(seek.as_dict() for seek in self._by_time_control.get(time_control, {}).values())
+        return {'version': self.version, 'seeks': seeks}
+
+    def get(self, seek_id):
+        for seeks in self._by_time_control.values():
+            if seek_id in seeks:
+                return seeks[seek_id]
+        return None
+
+    async def post(self, user, time_control, color, channel_name):
+        """Open a seek for ``user``, replacing any seek they already had open."""
+        replaced = self._detach(self._by_user.get(user.id))
+        seek = OpenSeek(
+            id=next(self._ids),
+            user_id=user.id,
+            username=user.username,
+            rating=user.rating,
+            time_control=time_control,
+            color=color,
+            channel_name=channel_name,
+        )
+        self._by_time_control.setdefault(time_control, {})[seek.id] = seek
+        self._by_user[user.id] = seek.id
+        if replaced is not None:
+            await self._publish(replaced.time_control, {'type': 'seek_removed', 'seek_id': replaced.id})
+        await self._publish(time_control, {'type': 'seek_added', 'seek': seek.as_dict()})
+        return seek
+
+    async def remove(self, seek_id):
+        seek = self._detach(seek_id)
+        if seek is not None:
+            await self._publish(seek.time_control, {'type': 'seek_removed', 'seek_id': seek_id})
+        return seek
+
+    def _detach(self, seek_id):
+        seek = self.get(seek_id)
+        if seek is None:
+            return None
+        del self._by_time_control[seek.time_control][seek_id]
+        if not self._by_time_control[seek.time_control]:
+            del self._by_time_control[seek.time_control]
+        del self._by_user[seek.user_id]
+        return seek
+
+    async def remove_for_user(self, user_id, channel_name=None):
+        """Drop the user's open seek; with ``channel_name`` only if it was posted from that socket."""
+        seek_id = self._by_user.get(user_id)
+        if seek_id is None:
+            return None
+        if channel_name is not None and self.get(seek_id).channel_name != channel_name:
+            return None
+        return await self.remove(seek_id)
+
+    async def _publish(self, time_control, diff):
+        self.version += 1
+        event = {'type': 'lobby_diff', 'version': self.version, 'diff': diff}
+        channel_layer = get_channel_layer()
+        await channel_layer.group_send(group_for(time_control), event)
+        await channel_layer.group_send(ALL_GROUP, event)
+
+
+lobby = SeekLobby()
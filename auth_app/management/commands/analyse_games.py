@@ -0,0 +1,26 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from auth_app.analysis import pipeline
+
+
+class Command(BaseCommand):
+    help = "Run the post-game analysis dispatcher outside the web server."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Drain the queue once and exit')
+
+    def handle(self, *args, **options):
+        try:
+            while True:
+                pipeline.run_once()
+                if options['once']:
+                    break
+                time.sleep(settings.ANALYSIS_POLL_INTERVAL)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            pipeline.shutdown()
+        self.stdout.write(self.style.SUCCESS(str(pipeline.stats())))
@@ -0,0 +1,178 @@
+import asyncio
+import json
+import random
+import threading
+import time
+import types
+from collections import Counter
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework_simplejwt.tokens import AccessToken
+
+from auth_app import async_game_views, game_views, mqtt_utils, notifications
+from auth_app.models import User
+from auth_app.mqtt_broker import Broker
+
+USER_PREFIX = 'bench_async_'
+
+
+def bench_urlconf():
+    """The endpoints under test, once per implementation."""
+    urlpatterns = []
+    for prefix, views in (('sync', game_views), ('async', async_game_views)):
+        urlpatterns += [
+            path(f'{prefix}/call/send/', views.SendCallSignalView.as_view()),
+            path(f'{prefix}/invitations/my/', views.MyInvitationsView.as_view()),
+        ]
+    urlconf = types.ModuleType('bench_async_views_urls')
+    urlconf.urlpatterns = urlpatterns
+    return urlconf
+
+
+async def asgi_request(app, method, path_, token, body=None):
+    """One HTTP request through the ASGI application, in process. Returns the status code."""
+    payload = json.dumps(body).encode() if body is not None else b''
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method,
+        'scheme': 'http', 'path': path_, 'raw_path': path_.encode(), 'query_string': b'', 'root_path': '',
+        'headers': [
+            (b'host', b'localhost'), (b'authorization', f'Bearer {token}'.encode()),
+            (b'content-type', b'application/json'), (b'content-length', str(len(payload)).encode()),
+        ],
+        'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+    }
+    messages = [{'type': 'http.request', 'body': payload, 'more_body': False}]
+    result = {}
+
+    async def receive():
+        if messages:
+            return messages.pop()
+        await asyncio.Event().wait()  # the request is complete; never report a disconnect
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            result['status'] = message['status']
+
+    await app(scope, receive, send)
+    return result['status']
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync and async implementations of the invitation and call endpoints under "
+        "concurrency: --requests requests (call/send/ writes and invitations/my/ reads) from --clients "
+        "concurrent clients through Django's ASGI handler, as daphne runs them. Reports throughput, "
+        "latency, the peak number of threads and the database connections opened. --db-latency adds a per-query delay to stand in for "
+        "the network round trip to a database server. Bench users are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=500, help='Requests in flight at once')
+        parser.add_argument('--requests', type=int, default=5000)
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--db-latency', type=float, default=0, help='Milliseconds added to every query')
+        parser.add_argument('--scenario', choices=['calls', 'reads', 'mixed'], default='mixed')
+
+    def handle(self, *args, **options):
+        users = self.create_users(options['users'])
+        tokens = {user.username: str(AccessToken.for_user(user)) for user in users}
+
+        # Publish to an in-process broker through the outbox thread, as a daphne worker does
+        loop = asyncio.new_event_loop()
+        threading.Thread(target=loop.run_forever, daemon=True).start()
+        broker = asyncio.run_coroutine_threadsafe(Broker().start('127.0.0.1', 0), loop).result()
+        original = (mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT)
+        mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT = '127.0.0.1', broker.port
+        notifications._outbox_task.start()
+
+        delay = options['db_latency'] / 1000
+
+        def slow_queries(sender, connection, **kwargs):
+            def wrapper(execute, sql, params, many, context):
+                time.sleep(delay)
+                return execute(sql, params, many, context)
+            connection.execute_wrappers.append(wrapper)
+
+        if delay:
+            connection_created.connect(slow_queries, weak=False)
+        try:
+            with override_settings(ROOT_URLCONF=bench_urlconf()):
+                for implementation in ('sync', 'async'):
+                    report = asyncio.run(self.run(implementation, tokens, options))
+                    self.stdout.write(self.style.SUCCESS(report))
+        finally:
+            connection_created.disconnect(slow_queries)
+            notifications._outbox_task.stop()
+            asyncio.run_coroutine_threadsafe(broker.stop(), loop).result()
+            loop.call_soon_threadsafe(loop.stop)
+            mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT = original
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+    def create_users(self, count):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        User.objects.bulk_create([
+            User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@bench.invalid") for i in range(count)
+        ])
+        return list(User.objects.filter(username__startswith=USER_PREFIX))
+
+    async def run(self, implementation, tokens, options):
+        app = ASGIHandler()
+        usernames = list(tokens)
+        rng = random.Random(42)
+        plan = []
+        for n in range(options['requests']):
+            caller, receiver = rng.sample(usernames, 2)
+            write = options['scenario'] == 'calls' or (options['scenario'] == 'mixed' and n % 2 == 0)
+            if write:
+                plan.append(('POST', f'/{implementation}/call/send/', tokens[caller],
+                             {'receiver_username': receiver, 'room_id': f'bench-{n}'}))
+            else:
+                plan.append(('GET', f'/{implementation}/invitations/my/', tokens[caller], None))
+
+        limit = asyncio.Semaphore(options['clients'])
+        latencies, statuses = [], Counter()
+        peak_threads = threading.active_count()
+        done = asyncio.Event()
+        connections_opened = 0
+
+        def count_connection(sender, **kwargs):
+            nonlocal connections_opened
+            connections_opened += 1
+
+        connection_created.connect(count_connection, weak=False)
+
+        async def sample_threads():
+            nonlocal peak_threads
+            while not done.is_set():
+                peak_threads = max(peak_threads, threading.active_count())
+                await asyncio.sleep(0.005)
+
+        async def client(method, path_, token, body):
+            async with limit:
+                started = time.perf_counter()
+                try:
+                    statuses[await asgi_request(app, method, path_, token, body)] += 1
+                except Exception as e:
+                    statuses[type(e).__name__] += 1
+                latencies.append((time.perf_counter() - started) * 1000)
+
+        sampler = asyncio.ensure_future(sample_threads())
+        started = time.perf_counter()
+        await asyncio.gather(*(client(*request) for request in plan))
+        elapsed = time.perf_counter() - started
+        done.set()
+        await sampler
+        connection_created.disconnect(count_connection)
+
+        latencies.sort()
+        p = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]  # noqa: E731
+        return (
+            f"{implementation:>5}: {len(plan)} requests, {options['clients']} in flight, "
+            f"{len(plan) / elapsed:.0f} req/s; latency p50 {p(50):.1f} ms, p99 {p(99):.1f} ms, "
+            f"max {latencies[-1]:.1f} ms; peak threads {peak_threads}; "
+            f"db connections opened {connections_opened}; responses {dict(statuses)}"
+        )
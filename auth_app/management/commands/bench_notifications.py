@@ -0,0 +1,208 @@
+import asyncio
+import json
+import multiprocessing
+import time
+
+import msgpack
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+
+from auth_app import mqtt_utils, notifications
+from auth_app.game_serializers import InvitationReadSerializer
+from auth_app.models import User, GameInvitation, Notification
+from auth_app.mqtt_broker import (
+    Broker, PUBLISH, SUBACK, connect_packet, subscribe_packet, read_packet, parse_publish,
+)
+
+USER_PREFIX = 'bench_device_'
+
+
+class Devices:
+    """Simulated phones: one MQTT connection per user, subscribed to its notifications topic."""
+
+    def __init__(self, usernames, encoding):
+        self.usernames = usernames
+        self.decode = msgpack.unpackb if encoding == 'msgpack' else json.loads
+        self.received = {}  # inbox id -> time.monotonic() at arrival
+        self.writers = []
+
+    async def connect(self, host, port, concurrency=200):
+        limit = asyncio.Semaphore(concurrency)
+
+        async def device(username):
+            async with limit:
+                reader, writer = await asyncio.open_connection(host, port)
+                writer.write(connect_packet(username))
+                await read_packet(reader)  # CONNACK
+                writer.write(subscribe_packet(1, [(f"{mqtt_utils.MQTT_TOPIC_PREFIX}{username}/notifications", 0)]))
+                while (await read_packet(reader))[0] != SUBACK:
+                    pass
+            self.writers.append(writer)
+            asyncio.ensure_future(self._listen(reader))
+
+        await asyncio.gather(*(device(username) for username in self.usernames))
+
+    async def _listen(self, reader):
+        try:
+            while True:
+                packet_type, flags, body = await read_packet(reader)
+                if packet_type == PUBLISH:
+                    _, payload, _, _, _ = parse_publish(flags, body)
+                    self.received[self.decode(payload)['id']] = time.monotonic()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+
+    async def wait_for(self, ids, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline and any(i not in self.received for i in ids):
+            await asyncio.sleep(0.02)
+        return {i: self.received[i] for i in ids if i in self.received}
+
+    def close(self):
+        for writer in self.writers:
+            writer.close()
+
+
+def device_process(conn, host, port, usernames, encoding):
+    """
+    Child process holding the broker (unless external) and every device connection, so
+    thousands of sockets never share a process with paho, whose select() loop cannot
+    handle descriptors above 1024. Serves ('collect', ids, timeout) / ('stats',) / ('stop',)
+    requests from the parent over ``conn``; arrival times are time.monotonic(), which is
+    system-wide and so comparable across the two processes.
+    """
+    async def main():
+        loop = asyncio.get_running_loop()
+        broker = await Broker().start('127.0.0.1', 0) if host is None else None
+        address = ('127.0.0.1', broker.port) if broker else (host, port)
+        devices = Devices(usernames, encoding)
+        started = time.monotonic()
+        await devices.connect(*address)
+        conn.send((address, time.monotonic() - started))
+        try:
+            while True:
+                request = await loop.run_in_executor(None, conn.recv)
+                if request[0] == 'collect':
+                    conn.send(await devices.wait_for(*request[1:]))
+                elif request[0] == 'stats':
+                    conn.send(broker.stats() if broker else None)
+                else:
+                    break
+        finally:
+            devices.close()
+            if broker:
+                await broker.stop()
+
+    asyncio.run(main())
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark notification delivery end to end: connects --devices simulated phones to the in-repo "
+        "MQTT broker (or --host/--port), then measures invitation-to-device latency for --invitations "
+        "invitations sent one at a time, and publisher throughput for a --burst of queued notifications "
+        "drained in outbox batches. Bench users are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--devices', type=int, default=2000)
+        parser.add_argument('--invitations', type=int, default=300, help='Sequential invitations for the latency phase')
+        parser.add_argument('--burst', type=int, default=10000, help='Queued notifications for the throughput phase')
+        parser.add_argument('--batch-size', type=int, default=None, help='Outbox drain batch size')
+        parser.add_argument('--encoding', choices=['compact', 'msgpack'], default='compact')
+        parser.add_argument('--host', default=None, help='External broker host (default: start the in-repo broker)')
+        parser.add_argument('--port', type=int, default=1883)
+
+    def handle(self, *args, **options):
+        sender, receivers = self.create_users(options['devices'], options['encoding'])
+        connections.close_all()  # the child is forked and must not inherit a database connection
+        parent, child = multiprocessing.Pipe()
+        process = multiprocessing.get_context('fork').Process(
+            target=device_process, daemon=True,
+            args=(child, options['host'], options['port'], [user.username for user in receivers], options['encoding']),
+        )
+        process.start()
+        original = (mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT)
+        try:
+            (mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT), took = parent.recv()
+            self.stdout.write(
+                f"{len(receivers)} devices connected to {mqtt_utils.MQTT_BROKER}:{mqtt_utils.MQTT_PORT} in {took:.1f}s"
+            )
+
+            def collect(ids):
+                """Arrival time of each inbox id that reached its device, waiting up to 30s for stragglers."""
+                parent.send(('collect', list(ids), 30))
+                return parent.recv()
+
+            self.latency_phase(sender, receivers, collect, options['invitations'])
+            self.throughput_phase(sender, receivers, collect, options['burst'], options['batch_size'])
+            parent.send(('stats',))
+            stats = parent.recv()
+            if stats:
+                self.stdout.write(f"Broker: {stats}")
+        finally:
+            if process.is_alive():
+                parent.send(('stop',))
+                process.join(5)
+            mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT = original
+            User.objects.filter(username__startswith=USER_PREFIX).delete()
+
+    def create_users(self, count, encoding):
+        User.objects.filter(username__startswith=USER_PREFIX).delete()
+        User.objects.bulk_create([
+            User(username=f"{USER_PREFIX}{i}", email=f"{USER_PREFIX}{i}@bench.invalid", notification_encoding=encoding)
+            for i in range(count + 1)
+        ])
+        users = list(User.objects.filter(username__startswith=USER_PREFIX).order_by('id'))
+        return users[0], users[1:]
+
+    def latency_phase(self, sender, receivers, collect, count):
+        """Invitations sent one at a time, each queued in its transaction and published right after commit."""
+        sent_at = {}
+        started = time.monotonic()
+        for n in range(count):
+            receiver = receivers[n % len(receivers)]
+            t0 = time.monotonic()
+            with transaction.atomic():
+                invitation = GameInvitation.objects.create(sender=sender, receiver=receiver, room_id=f"bench-{n}")
+                invitation.sender, invitation.receiver = sender, receiver
+                row = notifications.notify(receiver, 'game_invitation', InvitationReadSerializer(invitation).data)
+            sent_at[row.id] = t0  # the commit hook has published it by the time we get here
+        elapsed = time.monotonic() - started
+        received = collect(sent_at)
+
+        latencies = sorted((received[i] - t0) * 1000 for i, t0 in sent_at.items() if i in received)
+        if not latencies:
+            self.stdout.write(self.style.ERROR("Latency: no invitation reached a device"))
+            return
+        p = lambda pct: latencies[min(len(latencies) - 1, int(len(latencies) * pct / 100))]  # noqa: E731
+        self.stdout.write(self.style.SUCCESS(
+            f"Latency over {len(latencies)}/{count} invitations ({count / elapsed:.0f} invitations/s sequential): "
+            f"p50 {p(50):.2f} ms, p95 {p(95):.2f} ms, p99 {p(99):.2f} ms, max {latencies[-1]:.2f} ms"
+        ))
+
+    def throughput_phase(self, sender, receivers, collect, count, batch_size):
+        """
+        A backlog such as a broker outage leaves behind: rows inserted straight into the outbox
+        (no commit hook), then drained in batches the way the notification_outbox task does.
+        """
+        rows = Notification.objects.bulk_create([
+            Notification(
+                user=receivers[n % len(receivers)], type='call_invitation', collapse_key=f"call:burst-{n}",
+                payload={'caller': sender.username, 'room_id': f"burst-{n}"},
+            )
+            for n in range(count)
+        ])
+        ids = [row.id for row in rows]
+
+        started = time.monotonic()
+        published = notifications.drain(batch_size)
+        drained = time.monotonic() - started
+        arrivals = list(collect(ids).values())
+        last = max(arrivals, default=started) - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Throughput: {published}/{count} notifications published in {drained:.2f}s "
+            f"({published / max(drained, 1e-9):.0f} msgs/s, batches of {batch_size or settings.NOTIFICATION_OUTBOX_BATCH}); "
+            f"{len(arrivals)} delivered, the last {last:.2f}s after draining began"
+        ))
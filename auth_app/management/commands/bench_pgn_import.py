@@ -0,0 +1,74 @@
+import os
+import random
+import tempfile
+from itertools import cycle
+
+from django.core.management.base import BaseCommand
+
+from auth_app.engine import Board
+from auth_app.models import Game
+from auth_app.pgn import import_games
+
+
+def random_game(rng, max_plies):
+    board = Board()
+    moves = []
+    while len(moves) < max_plies and board.outcome() is None:
+        move = rng.choice(board.legal_moves())
+        moves.append(board.san(move))
+        board.push(move)
+    result = board.outcome() or '*'
+    return moves, result
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark PGN import: writes a synthetic PGN file of --games games (cycling through "
+        "--distinct random legal games), imports it and reports games/second. "
+        "Imported rows are deleted afterwards unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--games', type=int, default=100000)
+        parser.add_argument('--distinct', type=int, default=500, help='Distinct random games to cycle through')
+        parser.add_argument('--plies', type=int, default=80, help='Maximum length of each random game')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--seed', type=int, default=2630)
+        parser.add_argument('--keep', action='store_true')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        templates = []
+        for _ in range(options['distinct']):
+            moves, result = random_game(rng, options['plies'])
+            text = []
+            for ply, san in enumerate(moves):
+                if ply % 2 == 0:
+                    text.append(f"{ply // 2 + 1}.")
+                text.append(san)
+            templates.append((' '.join(text + [result]), result))
+
+        with tempfile.NamedTemporaryFile('w', suffix='.pgn', delete=False, encoding='utf-8') as handle:
+            path = handle.name
+            for number, (movetext, result) in zip(range(options['games']), cycle(templates)):
+                handle.write(
+                    f'[Event "Benchmark"]\n[White "bench_white"]\n[Black "bench_black"]\n'
+                    f'[Round "{number + 1}"]\n[Result "{result}"]\n\n{movetext}\n\n'
+                )
+        size_mb = os.path.getsize(path) / 1e6
+        self.stdout.write(f"Wrote {options['games']} games ({size_mb:.1f} MB) to {path}")
+
+        last_id = Game.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        try:
+            with open(path, encoding='utf-8') as handle:
+                stats = import_games(handle, workers=options['workers'], batch_size=options['batch_size'])
+        finally:
+            os.unlink(path)
+            if not options['keep']:
+                Game.objects.filter(id__gt=last_id, white_name='bench_white').delete()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} games ({stats['skipped']} skipped) with {options['workers']} workers "
+            f"in {stats['elapsed']}s - {stats['games_per_second']} games/s ({size_mb / stats['elapsed']:.2f} MB/s)"
+        ))
@@ -0,0 +1,31 @@
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from auth_app.engine import bitbase
+
+
+class Command(BaseCommand):
+    help = "Generate the endgame bitbase file (KQK, KRK, KPK) used for adjudication and analysis."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=settings.BITBASE_PATH)
+        parser.add_argument('--tables', nargs='+', choices=bitbase.TABLES, default=list(bitbase.TABLES))
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        tables = bitbase.generate(
+            tables=options['tables'],
+            progress=lambda name: self.stdout.write(f"Building {name} ({time.monotonic() - started:.1f}s)"),
+        )
+        output = options['output']
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        tmp = f"{output}.tmp"
+        bitbase.write(tmp, tables)
+        os.replace(tmp, output)  # readers holding the old mapping keep working
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {', '.join(sorted(tables))} to {output} ({os.path.getsize(output)} bytes) "
+            f"in {time.monotonic() - started:.1f}s"
+        ))
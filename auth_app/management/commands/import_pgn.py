@@ -0,0 +1,31 @@
+import gzip
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auth_app.pgn import import_games
+
+
+class Command(BaseCommand):
+    help = "Bulk import games from a PGN file (plain or .gz), parsing in worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Parser processes (0 parses in this process)')
+        parser.add_argument('--batch-size', type=int, default=None, help='Games per batch and per transaction')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f"No such file: {path}")
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as handle:
+            stats = import_games(handle, workers=options['workers'], batch_size=options['batch_size'])
+
+        for error in stats['errors']:
+            self.stderr.write(f"game {error['game']}: {error['error']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {stats['imported']} games ({stats['skipped']} skipped) in {stats['elapsed']}s "
+            f"- {stats['games_per_second']} games/s"
+        ))
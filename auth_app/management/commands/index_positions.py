@@ -0,0 +1,21 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from auth_app.explorer import index_games, pending_games
+
+
+class Command(BaseCommand):
+    help = "Fold every finished game that is not yet in the opening explorer into the position index."
+
+    def handle(self, *args, **options):
+        total = 0
+        last_id = 0
+        # Walk the pending games by id until none are left: a batch can index nothing
+        # (unreadable games, or games another indexer claimed) with more still to come
+        while True:
+            games = list(pending_games().filter(id__gt=last_id)[:settings.EXPLORER_INDEX_BATCH])
+            if not games:
+                break
+            total += index_games(games)
+            last_id = games[-1].id
+        self.stdout.write(self.style.SUCCESS(f"Indexed {total} games"))
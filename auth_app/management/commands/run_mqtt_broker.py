@@ -0,0 +1,25 @@
+import asyncio
+
+from django.core.management.base import BaseCommand
+
+from auth_app.mqtt_broker import Broker
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the in-repo MQTT 3.1.1 broker stand-in (QoS 0/1, retained messages, wildcards) for local "
+        "development. Point the server at it with MQTT_BROKER_HOST / MQTT_BROKER_PORT."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=1883)
+
+    def handle(self, *args, **options):
+        asyncio.run(self.serve(options['host'], options['port']))
+
+    async def serve(self, host, port):
+        broker = await Broker().start(host, port)
+        self.stdout.write(self.style.SUCCESS(f"MQTT broker listening on {host}:{broker.port} (Ctrl+C to stop)"))
+        async with broker.server:
+            await broker.server.serve_forever()
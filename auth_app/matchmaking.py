@@ -0,0 +1,189 @@
+"""
+Rating-banded matchmaking queue.
+
+Seeks are kept per time control in a list sorted by (rating, user_id), so a
+pairing attempt is a bisect to the seeker's rating followed by a walk outwards
+to the closest mutually acceptable opponent. The acceptable band starts at
+MATCHMAKING_BASE_BAND and widens with wait time; a sweeper task re-tries
+waiting seeks once a second so long waits still find partners.
+
+Everything runs on the server's event loop: pairing has no awaits, so the
+queue needs no locking. Matches are pushed to both ``user_{id}`` groups with a
+freshly allocated room id.
+"""
+import asyncio
+import bisect
+import logging
+import random
+import re
+import time
+import uuid
+from dataclasses import dataclass, field
+
+from channels.layers import get_channel_layer
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+TIME_CONTROL_RE = re.compile(r'^\d{1,3}\+\d{1,3}$')  # minutes+increment, e.g. "5+3"
+
+
+@dataclass
+class Seek:
+    user_id: int
+    username: str
+    rating: int
+    time_control: str
+    min_rating: int = None
+    max_rating: int = None
+    channel_name: str = None  # socket the seek was posted from
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def key(self):
+        return (self.rating, self.user_id)
+
+    def band(self, now):
+        waited = now - self.enqueued_at
+        return min(
+            settings.MATCHMAKING_BASE_BAND + int(waited * settings.MATCHMAKING_BAND_GROWTH),
+            settings.MATCHMAKING_MAX_BAND,
+        )
+
+    def accepts(self, rating, now):
+        if self.min_rating is not None and rating < self.min_rating:
+            return False
+        if self.max_rating is not None and rating > self.max_rating:
+            return False
+        return abs(rating - self.rating) <= self.band(now)
+
+
+async def announce_match(white, black, time_control):
+    """
+    Allocate a room and push `match_found` to both players' user groups.
+    ``white`` and ``black`` are (user_id, username, rating) tuples.
+    """
+    room_id = uuid.uuid4().hex
+    channel_layer = get_channel_layer()
+    for player, other, color in ((white, black, 'white'), (black, white, 'black')):
+        await channel_layer.group_send(f'user_{player[0]}', {
+            'type': 'match_found',
+            'room_id': room_id,
+            'time_control': time_control,
+            'color': color,
+            'opponent': {'id': other[0], 'username': other[1], 'rating': other[2]},
+        })
+    logger.info(f"♟️ Matched {white[1]} vs {black[1]} ({time_control}) in room {room_id}")
+    return room_id
+
+
+class Matchmaker:
+    def __init__(self):
+        self._queues = {}  # time control -> sorted list of (rating, user_id)
+        self._seeks = {}  # user_id -> Seek
+        self._sweeper = None
+        self.enqueued = 0
+        self.matched = 0
+
+    def __len__(self):
+        return len(self._seeks)
+
+    def stats(self):
+        return {
+            'waiting': len(self._seeks),
+            'by_time_control': {tc: len(queue) for tc, queue in self._queues.items() if queue},
+            'enqueued': self.enqueued,
+            'matched': self.matched,
+        }
+
+    async def enqueue(self, seek):
+        """Queue a seek (replacing any previous one for the user) and try to pair it at once."""
+        self._ensure_sweeper()
+        self._remove(seek.user_id)
+        self.enqueued += 1
+
+        opponent = self._find_opponent(seek, time.monotonic())
+        if opponent is None:
+            bisect.insort(self._queues.setdefault(seek.time_control, []), seek.key)
+            self._seeks[seek.user_id] = seek
+            return None
+
+        self._remove(opponent.user_id)
+        return await self._announce(seek, opponent)
+
+    def cancel(self, user_id, channel_name=None):
+        """Drop the user's seek; with ``channel_name`` only if it was posted from that socket."""
+        seek = self._seeks.get(user_id)
+        if seek is None or (channel_name is not None and seek.channel_name != channel_name):
+            return False
+        return self._remove(user_id) is not None
+
+    def _remove(self, user_id):
+        seek = self._seeks.pop(user_id, None)
+        if seek is not None:
+            queue = self._queues[seek.time_control]
+            del queue[bisect.bisect_left(queue, seek.key)]
+        return seek
+
+    def _find_opponent(self, seek, now):
+        queue = self._queues.get(seek.time_control)
+        if not queue:
+            return None
+
+        band = seek.band(now)
+        lo = seek.rating - band
+        hi = seek.rating + band
+        # Walk outwards from the seeker's rating so the closest rating wins
+        right = bisect.bisect_left(queue, seek.key)
+        left = right - 1
+        while left >= 0 or right < len(queue):
+            left_gap = seek.rating - queue[left][0] if left >= 0 else None
+            right_gap = queue[right][0] - seek.rating if right < len(queue) else None
+            if right_gap is None or (left_gap is not None and left_gap <= right_gap):
+                rating, user_id = queue[left]
+                left = left - 1 if rating >= lo else -1
+            else:
+                rating, user_id = queue[right]
+                right = right + 1 if rating <= hi else len(queue)
+            if not lo <= rating <= hi or user_id == seek.user_id:
+                continue
+            candidate = self._seeks[user_id]
+            if seek.accepts(rating, now) and candidate.accepts(seek.rating, now):
+                return candidate
+        return None
+
+    async def _announce(self, seek, opponent):
+        self.matched += 1
+        white, black = random.sample([seek, opponent], 2)
+        return await announce_match(
+            (white.user_id, white.username, white.rating),
+            (black.user_id, black.username, black.rating),
+            seek.time_control,
+        )
+
+    def _ensure_sweeper(self):
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_forever())
+
+    async def _sweep_forever(self):
+        while self._seeks:
+            await asyncio.sleep(settings.MATCHMAKING_SWEEP_INTERVAL)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"❌ Matchmaking sweep failed - {type(e).__name__}: {str(e)}")
+
+    async def sweep(self):
+        """Retry waiting seeks, longest-waiting first, with their widened bands."""
+        now = time.monotonic()
+        for seek in sorted(self._seeks.values(), key=lambda s: s.enqueued_at):
+            if seek.user_id not in self._seeks:
+                continue  # already paired during this sweep
+            opponent = self._find_opponent(seek, now)
+            if opponent is not None:
+                self._remove(seek.user_id)
+                self._remove(opponent.user_id)
+                await self._announce(seek, opponent)
+
+
+matchmaker = Matchmaker()
@@ -0,0 +1,36 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:13
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0006_user_draws_user_losses_user_wins'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='rating',
+            field=models.IntegerField(default=1200),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('all', 'All time'), ('daily', 'Daily'), ('weekly', 'Weekly')], max_length=10)),
+                ('period_key', models.CharField(max_length=20)),
+                ('rank', models.PositiveIntegerField()),
+                ('score', models.IntegerField()),
+                ('taken_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entries', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['period', 'period_key', 'rank'], name='auth_app_le_period_b9e782_idx')],
+                'unique_together': {('period', 'period_key', 'user')},
+            },
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:24
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0007_user_rating_leaderboardsnapshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Game',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('room_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('moves', models.TextField(blank=True)),
+                ('result', models.CharField(choices=[('1-0', 'White wins'), ('0-1', 'Black wins'), ('1/2-1/2', 'Draw'), ('*', 'Unfinished')], default='*', max_length=7)),
+                ('time_control', models.CharField(blank=True, max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('black', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_as_black', to=settings.AUTH_USER_MODEL)),
+                ('white', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='games_as_white', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='GameAnalysis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('priority', models.BigIntegerField(default=0)),
+                ('evaluations', models.JSONField(blank=True, default=list)),
+                ('best_moves', models.JSONField(blank=True, default=list)),
+                ('white_accuracy', models.FloatField(blank=True, null=True)),
+                ('black_accuracy', models.FloatField(blank=True, null=True)),
+                ('white_blunders', models.PositiveIntegerField(default=0)),
+                ('black_blunders', models.PositiveIntegerField(default=0)),
+                ('white_mistakes', models.PositiveIntegerField(default=0)),
+                ('black_mistakes', models.PositiveIntegerField(default=0)),
+                ('nodes', models.BigIntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('game', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='analysis', to='auth_app.game')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', '-priority'], name='auth_app_ga_status_3d6f4d_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0008_game_gameanalysis'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='positions_indexed',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='PositionStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('zobrist', models.BigIntegerField()),
+                ('move', models.CharField(max_length=5)),
+                ('games', models.PositiveIntegerField(default=0)),
+                ('white_wins', models.PositiveIntegerField(default=0)),
+                ('draws', models.PositiveIntegerField(default=0)),
+                ('black_wins', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('zobrist', 'move')},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0009_positionstat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='game',
+            name='black_name',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='game',
+            name='white_name',
+            field=models.CharField(blank=True, max_length=150),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0010_game_player_names'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['is_online', 'username'], name='user_online_username_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['-is_online', 'username'], name='user_online_first_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0011_user_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gameinvitation',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('accepted', 'Accepted'), ('declined', 'Declined'), ('cancelled', 'Cancelled'), ('expired', 'Expired')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='gameinvitation',
+            index=models.Index(fields=['status', 'created_at'], name='invitation_status_created_idx'),
+        ),
+    ]
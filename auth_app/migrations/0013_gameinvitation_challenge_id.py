@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0012_gameinvitation_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameinvitation',
+            name='challenge_id',
+            field=models.UUIDField(blank=True, db_index=True, null=True),
+        ),
+    ]
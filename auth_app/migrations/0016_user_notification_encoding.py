@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-19 02:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0015_notification_collapse_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='notification_encoding',
+            field=models.CharField(choices=[('json', 'JSON'), ('compact', 'Compact JSON'), ('msgpack', 'MessagePack')], default='json', max_length=10),
+        ),
+    ]
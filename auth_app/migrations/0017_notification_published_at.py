@@ -0,0 +1,22 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0016_user_notification_encoding'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='published_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('published_at__isnull', True)), fields=['id'], name='notification_unpublished_idx'),
+        ),
+    ]
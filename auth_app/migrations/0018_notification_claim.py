@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0017_notification_published_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notification',
+            name='claim',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
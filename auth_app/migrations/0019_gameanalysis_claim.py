@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-19 04:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_app', '0018_notification_claim'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gameanalysis',
+            name='claim',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gameanalysis',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
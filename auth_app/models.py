@@ -1,5 +1,6 @@
 from datetime import datetime, timedelta
 from django.db import models
+from django.db.models import Q
 from django.contrib.auth.models import AbstractUser
 from django.contrib.auth.hashers import make_password, check_password
 from django.conf import settings
@@ -8,6 +9,12 @@ import os
 import requests
 
 class User(AbstractUser):
+    NOTIFICATION_ENCODING_CHOICES = [
+        ('json', 'JSON'),
+        ('compact', 'Compact JSON'),
+        ('msgpack', 'MessagePack'),
+    ]
+
     email = models.EmailField(unique=True, blank=False)
     firebase_uid = models.CharField(max_length=255, unique=True, null=True, blank=True)
     google_id = models.CharField(max_length=255, unique=True, null=True, blank=True)
@@ -20,8 +27,15 @@ class User(AbstractUser):
     wins = models.IntegerField(default=0)
     draws = models.IntegerField(default=0)
     losses = models.IntegerField(default=0)
+    rating = models.IntegerField(default=1200)
+    notification_encoding = models.CharField(max_length=10, choices=NOTIFICATION_ENCODING_CHOICES, default='json')
 
-    
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Back the keyset-paginated user lists (OnlineUsersView, AllUsersView)
+            models.Index(fields=['is_online', 'username'], name='user_online_username_idx'),
+            models.Index(fields=['-is_online', 'username'], name='user_online_first_idx'),
+        ]
     
     def __str__(self):
         return self.email
@@ -136,17 +150,201 @@ class GameInvitation(models.Model):
         ('accepted', 'Accepted'),
         ('declined', 'Declined'),
         ('cancelled', 'Cancelled'),
+        ('expired', 'Expired'),
     ]
     
     sender = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sent_invitations')
     receiver = models.ForeignKey(User, on_delete=models.CASCADE, related_name='received_invitations')
     room_id = models.CharField(max_length=100)
+    # Shared by the invitations of one open challenge; the first to accept wins it
+    challenge_id = models.UUIDField(null=True, blank=True, db_index=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         unique_together = ['sender', 'receiver', 'room_id']
+        indexes = [
+            # Expiry sweeps scan the oldest pending rows first
+            models.Index(fields=['status', 'created_at'], name='invitation_status_created_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.sender.username} → {self.receiver.username} ({self.status})"
\ No newline at end of file
+        return f"{self.sender.username} → {self.receiver.username} ({self.status})"
+
+class LeaderboardSnapshot(models.Model):
+    PERIOD_CHOICES = [
+        ('all', 'All time'),
+        ('daily', 'Daily'),
+        ('weekly', 'Weekly'),
+    ]
+
+    period = models.CharField(max_length=10, choices=PERIOD_CHOICES)
+    period_key = models.CharField(max_length=20)  # e.g. 2026-10-19 or 2026-W42
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='leaderboard_entries')
+    rank = models.PositiveIntegerField()
+    score = models.IntegerField()
+    taken_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ['period', 'period_key', 'user']
+        indexes = [models.Index(fields=['period', 'period_key', 'rank'])]
+
+    def __str__(self):
+        return f"{self.period} {self.period_key} #{self.rank} {self.user.username}"
+
+class Game(models.Model):
+    RESULT_CHOICES = [
+        ('1-0', 'White wins'),
+        ('0-1', 'Black wins'),
+        ('1/2-1/2', 'Draw'),
+        ('*', 'Unfinished'),
+    ]
+
+    white = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='games_as_white')
+    black = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='games_as_black')
+    white_name = models.CharField(max_length=150, blank=True)  # player names from imported PGN when there is no matching account
+    black_name = models.CharField(max_length=150, blank=True)
+    room_id = models.CharField(max_length=100, blank=True, db_index=True)
+    moves = models.TextField(blank=True)  # space separated UCI from the standard start position
+    result = models.CharField(max_length=7, choices=RESULT_CHOICES, default='*')
+    time_control = models.CharField(max_length=20, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    positions_indexed = models.BooleanField(default=False)  # folded into PositionStat by explorer.index_pending_games
+
+    def __str__(self):
+        return f"{self.white_player} vs {self.black_player} ({self.result})"
+
+    @property
+    def white_player(self):
+        return self.white.username if self.white else (self.white_name or '?')
+
+    @property
+    def black_player(self):
+        return self.black.username if self.black else (self.black_name or '?')
+
+    @property
+    def move_list(self):
+        return self.moves.split()
+
+    @classmethod
+    def record(cls, player, color, result, moves, opponent, room_id):
+        """
+        Store a finished game reported by one of its players.
+        Both players report the same room, so the second report completes the first one's row;
+        ``room_id`` is what ties the two reports together, so it is required.
+        Raises IllegalMoveError if ``moves`` is not a legal UCI sequence.
+        """
+        from django.utils import timezone
+        from .engine import Board
+
+        board = Board()
+        for uci in moves:
+            board.push_uci(uci)
+
+        scores = {'win': ('1-0', '0-1'), 'loss': ('0-1', '1-0'), 'draw': ('1/2-1/2', '1/2-1/2')}
+        game_result = scores[result][0 if color == 'white' else 1]
+
+        if not room_id:
+            raise ValueError('room_id is required to record a game')
+        game = cls.objects.filter(room_id=room_id, moves=' '.join(moves)).first()
+        if game is None:
+            game = cls(room_id=room_id, moves=' '.join(moves), result=game_result, finished_at=timezone.now())
+        if color == 'white':
+            game.white = player
+            game.black = game.black or opponent
+        else:
+            game.black = player
+            game.white = game.white or opponent
+        game.save()
+        return game
+
+class GameAnalysis(models.Model):
+    """Engine analysis of a finished game; the table doubles as the resumable work queue."""
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    game = models.OneToOneField(Game, on_delete=models.CASCADE, related_name='analysis')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+    priority = models.BigIntegerField(default=0)  # higher first; the game's finish timestamp by default
+    evaluations = models.JSONField(default=list, blank=True)  # centipawns from white's side, one per position
+    best_moves = models.JSONField(default=list, blank=True)
+    white_accuracy = models.FloatField(null=True, blank=True)
+    black_accuracy = models.FloatField(null=True, blank=True)
+    white_blunders = models.PositiveIntegerField(default=0)
+    black_blunders = models.PositiveIntegerField(default=0)
+    white_mistakes = models.PositiveIntegerField(default=0)
+    black_mistakes = models.PositiveIntegerField(default=0)
+    nodes = models.BigIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    # Dispatcher lease on a running job, renewed as its batch progresses (see AnalysisPipeline.claim)
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', '-priority'])]
+
+    def __str__(self):
+        return f"Analysis of game {self.game_id} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, game, priority=None):
+        """Queue a game once; re-queuing bumps priority but never duplicates the job."""
+        if priority is None:
+            priority = int((game.finished_at or game.created_at).timestamp())
+        job, created = cls.objects.get_or_create(game=game, defaults={'priority': priority})
+        if not created and job.status == 'queued' and priority > job.priority:
+            cls.objects.filter(pk=job.pk, status='queued').update(priority=priority)
+        return job
+
+class PositionStat(models.Model):
+    """
+    Opening-explorer aggregate: how often ``move`` was played from a position and how those games ended.
+    ``zobrist`` is the engine's 64-bit position hash stored as a signed integer; the
+    (zobrist, move) unique index keeps rows for one position adjacent, so a lookup is a single range scan.
+    """
+    zobrist = models.BigIntegerField()
+    move = models.CharField(max_length=5)  # UCI
+    games = models.PositiveIntegerField(default=0)
+    white_wins = models.PositiveIntegerField(default=0)
+    draws = models.PositiveIntegerField(default=0)
+    black_wins = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('zobrist', 'move')
+
+    def __str__(self):
+        return f"{self.zobrist & 0xFFFFFFFFFFFFFFFF:016x} {self.move} ({self.games})"
+
+
+class Notification(models.Model):
+    """Inbox copy of every push notification, so clients that missed the MQTT message can sync."""
+    # The (user, id) index covers every lookup by user, so the FK gets no index of its own
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications', db_index=False)
+    type = models.CharField(max_length=40)
+    payload = models.JSONField()
+    collapse_key = models.CharField(max_length=120, blank=True)  # e.g. invitation:42; newer entries replace older ones
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    published_at = models.DateTimeField(null=True, blank=True)  # null while waiting in the MQTT outbox
+    # Outbox lease: the drain that is publishing this row, and since when (see notifications.drain)
+    claim = models.UUIDField(null=True, blank=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'id'], name='notification_user_id_idx'),
+            models.Index(fields=['user', 'collapse_key'], name='notification_user_collapse_idx'),
+            # Only the (few) rows still waiting for the outbox drain
+            models.Index(fields=['id'], name='notification_unpublished_idx', condition=Q(published_at__isnull=True)),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.type} → {self.user_id}"
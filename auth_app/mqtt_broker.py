@@ -0,0 +1,261 @@
+"""
+Minimal MQTT 3.1.1 broker for local development, load tests and benchmarks.
+
+Enough of the protocol for the notification pipeline and its devices:
+CONNECT, PUBLISH at QoS 0 and 1 (PUBACK to the publisher, delivery at the
+lower of the publish and subscription QoS), SUBSCRIBE / UNSUBSCRIBE with
+``+`` and ``#`` wildcards, retained messages, PINGREQ and DISCONNECT.
+Not supported: QoS 2, persistent sessions, will messages, authentication,
+keep-alive enforcement and redelivery of unacknowledged QoS 1 messages.
+
+Exact-topic subscriptions (one per device, the common case) are found with
+a dict lookup; only wildcard filters are matched one by one. Everything
+runs on one asyncio event loop. The packet helpers at the top are shared
+with the benchmark's simulated devices.
+"""
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+CONNECT, CONNACK, PUBLISH, PUBACK = 1, 2, 3, 4
+SUBSCRIBE, SUBACK, UNSUBSCRIBE, UNSUBACK = 8, 9, 10, 11
+PINGREQ, PINGRESP, DISCONNECT = 12, 13, 14
+
+
+def encode_length(length):
+    out = bytearray()
+    while True:
+        byte, length = length % 128, length // 128
+        out.append(byte | 0x80 if length else byte)
+        if not length:
+            return bytes(out)
+
+
+def encode_string(value):
+    data = value.encode() if isinstance(value, str) else value
+    return len(data).to_bytes(2, 'big') + data
+
+
+def packet(packet_type, flags, body=b''):
+    return bytes([packet_type << 4 | flags]) + encode_length(len(body)) + body
+
+
+async def read_packet(reader):
+    """(packet type, flags, body) of the next packet. Raises IncompleteReadError at EOF."""
+    header = (await reader.readexactly(1))[0]
+    length, shift = 0, 0
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) << shift
+        if not byte & 0x80:
+            break
+        shift += 7
+        if shift > 21:
+            raise ValueError('Malformed remaining length')
+    body = await reader.readexactly(length) if length else b''
+    return header >> 4, header & 0x0F, body
+
+
+def connect_packet(client_id, keepalive=60):
+    body = encode_string('MQTT') + bytes([4, 0x02]) + keepalive.to_bytes(2, 'big') + encode_string(client_id)
+    return packet(CONNECT, 0, body)
+
+
+def subscribe_packet(packet_id, topic_filters):
+    """``topic_filters``: iterable of (filter, qos)."""
+    body = packet_id.to_bytes(2, 'big') + b''.join(encode_string(f) + bytes([qos]) for f, qos in topic_filters)
+    return packet(SUBSCRIBE, 0x02, body)
+
+
+def publish_packet(topic, payload, qos=0, retain=False, packet_id=None):
+    body = encode_string(topic)
+    if qos:
+        body += packet_id.to_bytes(2, 'big')
+    return packet(PUBLISH, qos << 1 | int(retain), body + payload)
+
+
+def parse_publish(flags, body):
+    """(topic, payload, qos, retain, packet_id) of a PUBLISH body."""
+    qos = flags >> 1 & 0x03
+    topic_length = int.from_bytes(body[:2], 'big')
+    topic = body[2:2 + topic_length].decode()
+    offset = 2 + topic_length
+    packet_id = None
+    if qos:
+        packet_id = int.from_bytes(body[offset:offset + 2], 'big')
+        offset += 2
+    return topic, body[offset:], qos, bool(flags & 0x01), packet_id
+
+
+def topic_matches(topic_filter, topic):
+    filter_levels = topic_filter.split('/')
+    topic_levels = topic.split('/')
+    for i, level in enumerate(filter_levels):
+        if level == '#':
+            return True
+        if i >= len(topic_levels) or (level != '+' and level != topic_levels[i]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class Session:
+    def __init__(self, writer):
+        self.writer = writer
+        self.client_id = None
+        self.filters = {}  # topic filter -> granted qos
+        self._packet_id = 0
+
+    def next_packet_id(self):
+        self._packet_id = self._packet_id % 65535 + 1
+        return self._packet_id
+
+    def send(self, data):
+        if not self.writer.is_closing():
+            self.writer.write(data)
+
+
+class Broker:
+    def __init__(self):
+        self.exact = {}  # topic -> {session: qos}
+        self.wildcard = {}  # filter -> {session: qos}
+        self.retained = {}  # topic -> payload
+        self.sessions = set()
+        self.server = None
+        self.port = None
+        self.received = 0
+        self.delivered = 0
+
+    async def start(self, host='127.0.0.1', port=1883):
+        self.server = await asyncio.start_server(self._handle, host, port, backlog=4096)
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"🛰️ MQTT broker listening on {host}:{self.port}")
+        return self
+
+    async def stop(self):
+        if self.server:
+            self.server.close()
+            await self.server.wait_closed()
+        for session in list(self.sessions):
+            session.writer.close()
+
+    def stats(self):
+        return {
+            'sessions': len(self.sessions),
+            'received': self.received,
+            'delivered': self.delivered,
+            'retained': len(self.retained),
+        }
+
+    async def _handle(self, reader, writer):
+        session = Session(writer)
+        try:
+            packet_type, _, body = await read_packet(reader)
+            if packet_type != CONNECT:
+                return
+            session.client_id = self._client_id(body)
+            self.sessions.add(session)
+            session.send(packet(CONNACK, 0, b'\x00\x00'))
+
+            while True:
+                packet_type, flags, body = await read_packet(reader)
+                if packet_type == PUBLISH:
+                    self._on_publish(session, flags, body)
+                elif packet_type == SUBSCRIBE:
+                    self._on_subscribe(session, body)
+                elif packet_type == UNSUBSCRIBE:
+                    self._on_unsubscribe(session, body)
+                elif packet_type == PINGREQ:
+                    session.send(packet(PINGRESP, 0))
+                elif packet_type == DISCONNECT:
+                    return
+                elif packet_type != PUBACK:  # acks from subscribers need no action without redelivery
+                    logger.warning(f"⚠️ MQTT broker: unsupported packet type {packet_type}, closing connection")
+                    return
+                if writer.transport.get_write_buffer_size() > 1 << 20:
+                    await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            self._drop(session)
+            writer.close()
+
+    @staticmethod
+    def _client_id(body):
+        offset = 2 + int.from_bytes(body[:2], 'big') + 4  # protocol name, level, flags, keepalive
+        length = int.from_bytes(body[offset:offset + 2], 'big')
+        return body[offset + 2:offset + 2 + length].decode()
+
+    def _on_publish(self, session, flags, body):
+        topic, payload, qos, retain, packet_id = parse_publish(flags, body)
+        self.received += 1
+        if qos == 1:
+            session.send(packet(PUBACK, 0, packet_id.to_bytes(2, 'big')))
+        elif qos > 1:
+            raise ValueError('QoS 2 is not supported')
+        if retain:
+            if payload:
+                self.retained[topic] = payload
+            else:
+                self.retained.pop(topic, None)
+        self._route(topic, payload, qos)
+
+    def _route(self, topic, payload, qos):
+        targets = dict(self.exact.get(topic, {}))
+        for topic_filter, subscribers in self.wildcard.items():
+            if topic_matches(topic_filter, topic):
+                for subscriber, granted in subscribers.items():
+                    targets[subscriber] = max(granted, targets.get(subscriber, 0))
+        for subscriber, granted in targets.items():
+            delivery_qos = min(qos, granted)
+            packet_id = subscriber.next_packet_id() if delivery_qos else None
+            subscriber.send(publish_packet(topic, payload, delivery_qos, False, packet_id))
+            self.delivered += 1
+
+    def _on_subscribe(self, session, body):
+        packet_id, offset = body[:2], 2
+        granted = bytearray()
+        new_filters = []
+        while offset < len(body):
+            length = int.from_bytes(body[offset:offset + 2], 'big')
+            topic_filter = body[offset + 2:offset + 2 + length].decode()
+            qos = min(body[offset + 2 + length], 1)
+            offset += 3 + length
+            table = self.wildcard if '+' in topic_filter or '#' in topic_filter else self.exact
+            table.setdefault(topic_filter, {})[session] = qos
+            session.filters[topic_filter] = qos
+            granted.append(qos)
+            new_filters.append((topic_filter, qos))
+        session.send(packet(SUBACK, 0, packet_id + bytes(granted)))
+
+        for topic_filter, qos in new_filters:
+            if '+' in topic_filter or '#' in topic_filter:
+                matches = [(t, p) for t, p in self.retained.items() if topic_matches(topic_filter, t)]
+            else:
+                matches = [(topic_filter, self.retained[topic_filter])] if topic_filter in self.retained else []
+            for topic, payload in matches:
+                packet_id = session.next_packet_id() if qos else None
+                session.send(publish_packet(topic, payload, qos, True, packet_id))
+                self.delivered += 1
+
+    def _on_unsubscribe(self, session, body):
+        packet_id, offset = body[:2], 2
+        while offset < len(body):
+            length = int.from_bytes(body[offset:offset + 2], 'big')
+            self._unsubscribe(session, body[offset + 2:offset + 2 + length].decode())
+            offset += 2 + length
+        session.send(packet(UNSUBACK, 0, packet_id))
+
+    def _unsubscribe(self, session, topic_filter):
+        session.filters.pop(topic_filter, None)
+        for table in (self.exact, self.wildcard):
+            subscribers = table.get(topic_filter)
+            if subscribers is not None:
+                subscribers.pop(session, None)
+                if not subscribers:
+                    del table[topic_filter]
+
+    def _drop(self, session):
+        for topic_filter in list(session.filters):
+            self._unsubscribe(session, topic_filter)
+        self.sessions.discard(session)
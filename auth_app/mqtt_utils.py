@@ -1,53 +1,197 @@
 import json
+import threading
+import time
 import paho.mqtt.client as mqtt
 from django.conf import settings
 import logging
 
+from .encoding import JSON, encode_message, encode_state
+
 logger = logging.getLogger(__name__)
 
 # MQTT Broker Settings
-MQTT_BROKER = "broker.emqx.io"
-MQTT_PORT = 1883
+MQTT_BROKER = settings.MQTT_BROKER_HOST
+MQTT_PORT = settings.MQTT_BROKER_PORT
 MQTT_KEEPALIVE = 60
 MQTT_TOPIC_PREFIX = "chess/user/"
 
-def publish_mqtt_notification(username, notification_type, payload):
+
+class CircuitBreaker:
     """
-    Publishes a notification message to the user's specific MQTT topic.
-    Topic format: chess/user/{username}/notifications
+    Stops request threads from waiting on a broker that is down.
+
+    closed: calls go through; ``failure_threshold`` consecutive failures open it.
+    open: calls fail fast without touching the network for ``reset_timeout`` seconds.
+    half-open: one probe call is let through; success closes the breaker, failure reopens it.
+    """
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.last_error = None
+        self.successes = 0
+        self.errors = 0
+        self.rejected = 0
+        self.deferred_messages = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN  # this caller is the probe
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.successes += 1
+            self.failures = 0
+            if self.state != self.CLOSED:
+                logger.info("✅ MQTT: Broker reachable again, circuit closed")
+            self.state = self.CLOSED
+
+    def record_failure(self, error):
+        with self._lock:
+            self.errors += 1
+            self.failures += 1
+            self.last_error = f"{type(error).__name__}: {error}"
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.error(f"❌ MQTT: Circuit opened after {self.failures} failures ({self.last_error})")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+    def defer(self, count):
+        """Count messages not sent this time; the outbox keeps their rows and retries them."""
+        with self._lock:
+            self.deferred_messages += count
+
+    def stats(self):
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'successes': self.successes,
+                'errors': self.errors,
+                'rejected': self.rejected,
+                'deferred_messages': self.deferred_messages,
+                'last_error': self.last_error,
+            }
+
+
+breaker = CircuitBreaker(settings.MQTT_BREAKER_FAILURE_THRESHOLD, settings.MQTT_BREAKER_RESET_TIMEOUT)
+
+
+def _loop_until(client, done, deadline, what):
+    """Run the client's network loop until ``done()`` or the deadline passes."""
+    while not done():
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Broker did not {what} in time")
+        rc = client.loop(timeout=min(remaining, 0.05))
+        if rc != mqtt.MQTT_ERR_SUCCESS:
+            raise ConnectionError(f"MQTT loop failed with code {rc}")
+
+
+def _publish(messages):
+    """
+    One connection, strict deadlines: MQTT_CONNECT_TIMEOUT covers the TCP connect and
+    the CONNACK, MQTT_PUBLISH_TIMEOUT covers flushing every message.
     """
-    logger.info(f"🔔 MQTT PUBLISH: Starting publish for user '{username}', type '{notification_type}'")
-    
     client = mqtt.Client()
+    client.connect_timeout = settings.MQTT_CONNECT_TIMEOUT
     try:
-        logger.info(f"🔌 MQTT: Connecting to broker {MQTT_BROKER}:{MQTT_PORT}")
         client.connect(MQTT_BROKER, MQTT_PORT, MQTT_KEEPALIVE)
-        logger.info(f"✅ MQTT: Connected to broker successfully")
-        
-        topic = f"{MQTT_TOPIC_PREFIX}{username}/notifications"
-        message = {
-            'type': notification_type,
-            'payload': payload
-        }
-        
-        logger.info(f"📤 MQTT: Publishing to topic '{topic}'")
-        logger.info(f"📦 MQTT: Message payload: {json.dumps(message)}")
-        
-        result = client.publish(topic, json.dumps(message))
-        
-        # Wait for publish to complete (optional for small messages, but safer)
-        result.wait_for_publish()
-        
-        if result.rc == mqtt.MQTT_ERR_SUCCESS:
-            logger.info(f"✅ MQTT: Message published successfully to {username} on {topic}")
-            return True
-        else:
-            logger.error(f"❌ MQTT: Publish failed with return code {result.rc} for user {username}")
-            return False
-            
-    except Exception as e:
-        logger.error(f"❌ MQTT: Exception during publish - {type(e).__name__}: {str(e)}")
-        return False
+        _loop_until(client, client.is_connected, time.monotonic() + settings.MQTT_CONNECT_TIMEOUT, 'acknowledge CONNECT')
+
+        results = [
+            client.publish(topic, message if isinstance(message, bytes) else json.dumps(message), retain=retain)
+            for topic, message, retain in messages
+        ]
+        _loop_until(
+            client, lambda: all(result.is_published() or result.rc != mqtt.MQTT_ERR_SUCCESS for result in results),
+            time.monotonic() + settings.MQTT_PUBLISH_TIMEOUT, 'accept the messages'
+        )
+        return sum(1 for result in results if result.rc == mqtt.MQTT_ERR_SUCCESS)
     finally:
         client.disconnect()
-        logger.info(f"🔌 MQTT: Disconnected from broker")
+        client.loop(timeout=0)  # flush DISCONNECT, which closes the socket; never blocks
+
+
+def notification_message(username, notification_type, payload, notification_id=None, collapse_key=None, encoding=JSON):
+    """(topic, encoded message, retain) for a user notification, as taken by publish_mqtt_messages."""
+    fields = {'type': notification_type}
+    if notification_id is not None:
+        fields['id'] = notification_id  # inbox id, the client's sync cursor
+    if collapse_key:
+        fields['collapse_key'] = collapse_key  # a newer message with the same key supersedes this one
+    message = encode_message(fields, 'payload', notification_type, payload, encoding)
+    return f"{MQTT_TOPIC_PREFIX}{username}/notifications", message, False
+
+
+def state_message(username, state, encoding=JSON):
+    """
+    Retained snapshot on chess/user/{username}/state: the broker keeps the latest one
+    and hands it to a device as soon as it subscribes.
+    """
+    return f"{MQTT_TOPIC_PREFIX}{username}/state", encode_state(state, encoding), True
+
+
+def publish_mqtt_messages(messages):
+    """
+    Publishes (topic, message, retain) tuples over a single broker connection.
+    ``message`` is either already encoded (bytes) or a dict sent as JSON.
+    Returns the number of messages the broker accepted.
+
+    While the circuit breaker is open the call returns 0 at once instead of waiting
+    on the broker. Messages not accepted are counted as deferred: the outbox keeps
+    their rows and publishes them on a later drain, and devices can also get them
+    through notifications/sync/ meanwhile.
+    """
+    messages = list(messages)
+    if not messages:
+        return 0
+    if not breaker.allow():
+        breaker.defer(len(messages))
+        logger.warning(f"⚡ MQTT: Circuit open, deferred {len(messages)} messages")
+        return 0
+    logger.info(f"🔔 MQTT PUBLISH: Starting batch of {len(messages)} messages")
+
+    try:
+        published = _publish(messages)
+    except Exception as e:
+        breaker.record_failure(e)
+        breaker.defer(len(messages))
+        logger.error(f"❌ MQTT: Exception during batch publish - {type(e).__name__}: {str(e)}")
+        return 0
+    breaker.record_success()
+
+    if published < len(messages):
+        breaker.defer(len(messages) - published)
+        logger.error(f"❌ MQTT: {len(messages) - published} of {len(messages)} batched publishes failed")
+    else:
+        logger.info(f"✅ MQTT: Published batch of {published} messages")
+    return published
+
+
+def publish_mqtt_notifications(notifications):
+    """
+    Publishes many notifications over a single broker connection.
+    ``notifications`` is an iterable of (username, notification_type, payload, notification_id).
+    """
+    return publish_mqtt_messages(notification_message(*notification) for notification in notifications)
+
+
+def publish_mqtt_notification(username, notification_type, payload, notification_id=None):
+    """
+    Publishes a notification message to the user's specific MQTT topic.
+    Topic format: chess/user/{username}/notifications
+    """
+    return publish_mqtt_notifications([(username, notification_type, payload, notification_id)]) == 1
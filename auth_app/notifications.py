@@ -0,0 +1,258 @@
+"""
+Per-user notification inbox.
+
+MQTT delivery is QoS 0 and fire-and-forget, so a device that was offline
+misses whatever was published meanwhile. Every push notification therefore
+goes through ``notify`` / ``notify_many``, which append it to the
+``Notification`` table. Clients keep the id of the last message they handled
+and, on resume, call ``notifications/sync/?cursor=`` once to receive
+everything after it; that is one range scan on the (user, id) index.
+
+The same table is the transactional outbox for MQTT. Rows are inserted in
+the transaction that changes the invitation, so a notification exists
+exactly when the change it announces committed, and the request never
+waits on the broker. After commit the ``notification_outbox`` task is woken
+(or, in a process without it, a drain is queued on the ``network``
+bulkhead) and publishes unpublished rows in batches (``drain``): each batch
+is leased in a short transaction, published with no transaction or row
+lock held, and stamped ``published_at`` in bulk. A lease older than
+NOTIFICATION_OUTBOX_LEASE is taken over, so a drain that died mid-batch
+does not strand its rows. NOTIFICATION_OUTBOX_INTERVAL is only the retry
+interval while the broker is unreachable.
+
+Messages about the same invitation or call carry a collapse key; a newer one
+replaces the older ones in the inbox, so a device coming back online gets
+one message per invitation or call rather than its whole history. Each
+recipient also gets a retained snapshot on ``chess/user/{username}/state``
+(pending invitations, ringing calls, the inbox cursor it reflects), which
+the broker delivers as a single message the moment a device subscribes.
+
+Rows older than NOTIFICATION_RETENTION_DAYS, published or not, are pruned
+in chunks by a background task.
+"""
+import logging
+import operator
+import threading
+import uuid
+from collections import defaultdict
+from datetime import timedelta
+from functools import reduce
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import background, bulkheads
+from .models import Notification, GameInvitation
+from .mqtt_utils import publish_mqtt_messages, notification_message, state_message
+
+logger = logging.getLogger(__name__)
+
+PRUNE_CHUNK = 5000
+COLLAPSE_DELETE_CHUNK = 200  # users per superseded-entries DELETE; SQLite caps expression depth at 1000
+
+_drain_lock = threading.Lock()
+_drain_queued = False
+
+
+def collapse_key(notification_type, payload):
+    """Messages about the same invitation or call share a key; '' for messages that never collapse."""
+    if notification_type in ('game_invitation', 'invitation_cancelled'):
+        return f"invitation:{payload['id']}"
+    if notification_type == 'invitation_response':
+        return f"invitation:{payload['invitation']['id']}"
+    if notification_type in ('call_invitation', 'call_declined', 'call_cancelled') and payload.get('room_id'):
+        return f"call:{payload['room_id']}"
+    return ''
+
+
+def _state_invitation(invitation, other):
+    return {
+        'id': invitation.id,
+        'challenge_id': str(invitation.challenge_id) if invitation.challenge_id else None,
+        'room_id': invitation.room_id,
+        'user': other.username,
+        'created_at': invitation.created_at.isoformat(),
+    }
+
+
+def current_states(users, cursors):
+    """
+    Snapshot of what each user's device should be showing: pending invitations received
+    and sent, and calls still ringing. ``cursors`` maps user id to the newest inbox id
+    the snapshot already reflects. Three queries whatever the number of users.
+    """
+    user_ids = [user.id for user in users]
+    states = {
+        user_id: {'cursor': cursors.get(user_id), 'invitations': [], 'sent': [], 'calls': []}
+        for user_id in user_ids
+    }
+    invitations = (
+        GameInvitation.objects.filter(Q(receiver_id__in=user_ids) | Q(sender_id__in=user_ids), status='pending')
+        .select_related('sender', 'receiver')
+        .order_by('-created_at')
+    )
+    limit = settings.NOTIFICATION_STATE_MAX_ITEMS
+    for invitation in invitations:
+        received = states.get(invitation.receiver_id)
+        if received is not None and len(received['invitations']) < limit:
+            received['invitations'].append(_state_invitation(invitation, invitation.sender))
+        sent = states.get(invitation.sender_id)
+        if sent is not None and len(sent['sent']) < limit:
+            sent['sent'].append(_state_invitation(invitation, invitation.receiver))
+
+    # Superseded call messages are deleted, so a call_invitation still in the inbox is unanswered
+    ringing_since = timezone.now() - timedelta(seconds=settings.NOTIFICATION_CALL_RING_SECONDS)
+    calls = Notification.objects.filter(
+        user_id__in=user_ids, type='call_invitation', created_at__gte=ringing_since
+    ).values_list('user_id', 'payload')
+    for user_id, payload in calls:
+        states[user_id]['calls'].append(payload)
+    return states
+
+
+def notify(user, notification_type, payload):
+    """Queue a notification for ``user``: stored in the inbox now, pushed over MQTT after commit."""
+    return notify_many([(user, notification_type, payload)])[0]
+
+
+def notify_many(notifications):
+    """
+    ``notify`` for an iterable of (user, notification_type, payload), in one INSERT.
+
+    Call it inside the transaction that makes the change being announced: the rows
+    commit or roll back with it, and the outbox drain is woken once it commits.
+
+    A notification with a collapse key deletes the older inbox entries it supersedes
+    (a cancelled invitation replaces the invitation, a cancelled call the call), so a
+    device syncing after being offline only sees the latest word on each.
+    """
+    notifications = [
+        (user, notification_type, payload, collapse_key(notification_type, payload))
+        for user, notification_type, payload in notifications
+    ]
+    if not notifications:
+        return []
+    superseded = defaultdict(set)
+    for user, _, _, key in notifications:
+        if key:
+            superseded[user.id].add(key)
+    superseded = list(superseded.items())
+    with transaction.atomic():
+        for start in range(0, len(superseded), COLLAPSE_DELETE_CHUNK):
+            Notification.objects.filter(reduce(operator.or_, (
+                Q(user_id=user_id, collapse_key__in=keys)
+                for user_id, keys in superseded[start:start + COLLAPSE_DELETE_CHUNK]
+            ))).delete()
+        rows = Notification.objects.bulk_create([
+            Notification(user=user, type=notification_type, payload=payload, collapse_key=key)
+            for user, notification_type, payload, key in notifications
+        ])
+        transaction.on_commit(_kick_drain)
+    return rows
+
+
+def _kick_drain():
+    global _drain_queued
+    if _outbox_task.is_running:
+        _outbox_task.wake()
+        return
+    # No outbox thread in this process (WSGI worker, shell, management command): drain on the
+    # network bulkhead rather than in the request thread, one queued drain at a time
+    with _drain_lock:
+        if _drain_queued:
+            return
+        _drain_queued = True
+    try:
+        bulkheads.network.submit(_queued_drain)
+    except bulkheads.BulkheadFull:
+        with _drain_lock:
+            _drain_queued = False
+        logger.warning("⚠️ Notification outbox: network bulkhead full, rows wait for the next drain")
+
+
+def _queued_drain():
+    global _drain_queued
+    with _drain_lock:
+        _drain_queued = False  # commits from here on queue another drain
+    drain()
+
+
+def _claim(batch_size):
+    """
+    Lease up to ``batch_size`` unpublished rows to this drain in one UPDATE, committed at
+    once, and return them. Rows another drain leased are skipped until the lease expires.
+    """
+    token = uuid.uuid4()
+    now = timezone.now()
+    claimable = Q(claim__isnull=True) | Q(claimed_at__lt=now - timedelta(seconds=settings.NOTIFICATION_OUTBOX_LEASE))
+    batch = Notification.objects.filter(claimable, published_at__isnull=True).order_by('id').values('id')[:batch_size]
+    # The conditions are repeated outside the subquery so a concurrent drain's claim is re-checked
+    Notification.objects.filter(claimable, id__in=batch, published_at__isnull=True).update(claim=token, claimed_at=now)
+    return token, list(Notification.objects.filter(claim=token).select_related('user').order_by('id'))
+
+
+def drain(batch_size=None):
+    """
+    Publish unpublished inbox rows, oldest first, a batch per broker connection, with each
+    recipient's retained state snapshot. Each batch is leased and committed first, then
+    published with no transaction open, and marked published in one UPDATE once the broker
+    accepted all of it; otherwise its lease is released and it stays queued for the next
+    run (clients drop repeats by id). Returns the number of notifications published.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH
+    published = 0
+    while True:
+        token, rows = _claim(batch_size)
+        if not rows:
+            break
+        users = {row.user_id: row.user for row in rows}
+        cursors = {row.user_id: row.id for row in rows}  # ordered by id, so the last id wins
+        states = current_states(users.values(), cursors)
+        messages = [
+            notification_message(
+                row.user.username, row.type, row.payload, row.id, row.collapse_key, row.user.notification_encoding
+            )
+            for row in rows
+        ] + [
+            state_message(users[user_id].username, state, users[user_id].notification_encoding)
+            for user_id, state in states.items()
+        ]
+        claimed = Notification.objects.filter(claim=token)
+        if publish_mqtt_messages(messages) < len(messages):
+            claimed.update(claim=None, claimed_at=None)
+            break
+        claimed.update(published_at=timezone.now())
+        published += len(rows)
+        if len(rows) < batch_size:
+            break
+    return published
+
+
+def since(user, after_id, limit):
+    """Up to ``limit`` inbox entries of ``user`` with id > ``after_id``, oldest first."""
+    return list(
+        Notification.objects.filter(user=user, id__gt=after_id)
+        .order_by('id')
+        .values('id', 'type', 'payload', 'created_at')[:limit]
+    )
+
+
+def prune(days=None):
+    """Delete inbox entries older than the retention period. Returns the number deleted."""
+    days = settings.NOTIFICATION_RETENTION_DAYS if days is None else days
+    cutoff = timezone.now() - timedelta(days=days)
+    deleted = 0
+    while True:
+        ids = list(Notification.objects.filter(created_at__lt=cutoff).values_list('id', flat=True)[:PRUNE_CHUNK])
+        if not ids:
+            break
+        deleted += Notification.objects.filter(id__in=ids).delete()[0]
+    if deleted:
+        logger.info(f"🧹 Pruned {deleted} inbox notifications older than {days} days")
+    return deleted
+
+
+_outbox_task = background.register('notification_outbox', settings.NOTIFICATION_OUTBOX_INTERVAL, drain)
+background.register('notification_prune', settings.NOTIFICATION_PRUNE_INTERVAL, prune)
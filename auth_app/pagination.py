@@ -0,0 +1,73 @@
+"""
+Keyset (cursor) pagination and cheap row counts for large list endpoints.
+
+A cursor is the sort key of the last row on the previous page, base64-encoded
+so clients treat it as opaque. The next page is fetched with a WHERE on that
+key, which an index on the sort columns turns into a range scan, so page 1000
+costs the same as page 1 (unlike OFFSET, which reads and discards every
+earlier row).
+"""
+import base64
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(',', ':')).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Decode a cursor from a query string. Raises ValueError if it was tampered with or truncated."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, dict):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_size(request, default=None):
+    """``?limit=`` clamped to 1..PAGINATION_MAX_PAGE_SIZE. Raises ValueError on junk."""
+    default = default or settings.PAGINATION_DEFAULT_PAGE_SIZE
+    limit = int(request.query_params.get('limit', default))
+    return min(max(limit, 1), settings.PAGINATION_MAX_PAGE_SIZE)
+
+
+def table_estimate(model):
+    """
+    Planner row estimate for a whole table on PostgreSQL (pg_class.reltuples, kept
+    fresh by autovacuum), or None when the backend has no cheap estimate.
+    """
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:  # -1 until the table has been analysed
+        return None
+    return row[0]
+
+
+def approximate_count(queryset, cache_key, model=None, excluded=0):
+    """
+    Approximate row count that does not scan the table on every request: the
+    planner estimate for whole-table counts on PostgreSQL, otherwise an exact
+    count cached for PAGINATION_COUNT_CACHE_TTL seconds, so it lags writes.
+
+    ``queryset`` and ``cache_key`` are shared by every caller. A list that also
+    leaves out per-request rows (usually the requesting user) passes the shared
+    queryset and the number of rows it leaves out as ``excluded``; they are
+    subtracted from the shared count.
+    """
+    count = table_estimate(model) if model is not None else None
+    if count is None:
+        count = cache.get(cache_key)
+        if count is None:
+            count = queryset.count()
+            cache.set(cache_key, count, settings.PAGINATION_COUNT_CACHE_TTL)
+    return max(count - excluded, 0)
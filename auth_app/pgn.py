@@ -0,0 +1,219 @@
+"""
+PGN export and bulk import.
+
+``export_games`` is an async generator: it walks a user's games in
+primary-key order one page at a time (keyset pagination, so every page is an
+index range scan and nothing is held between pages), fetching and rendering
+each page on a thread with ``sync_to_async``, and optionally pushes the text
+through an incremental gzip compressor. Under ASGI a StreamingHttpResponse
+only streams an async iterator (a sync one is collected into a list first),
+so memory use is bounded by one page of games no matter how large the
+archive is.
+
+``import_games`` goes the other way: it cuts a PGN stream into games lazily,
+parses batches of them (optionally in worker processes, with a bounded number
+of batches in flight) and writes each batch with ``bulk_create`` in its own
+short transaction, so a multi-gigabyte file never sits in memory or in one
+giant transaction.
+"""
+import multiprocessing
+import time
+import zlib
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .engine import Board
+from .engine.pgn import split_games, parse_games
+
+PGN_LINE_WIDTH = 80
+
+
+def _tag(name, value):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+    return f'[{name} "{value}"]\n'
+
+
+def movetext(moves, result):
+    """Numbered SAN move text wrapped to PGN_LINE_WIDTH, ending with the result token."""
+    board = Board()
+    tokens = []
+    for ply, uci in enumerate(moves):
+        move = board.parse_uci(uci)
+        if ply % 2 == 0:
+            tokens.append(f"{ply // 2 + 1}.")
+        tokens.append(board.san(move))
+        board.push(move)
+    tokens.append(result)
+
+    lines, line = [], ''
+    for token in tokens:
+        if line and len(line) + 1 + len(token) > PGN_LINE_WIDTH:
+            lines.append(line)
+            line = token
+        else:
+            line = f"{line} {token}" if line else token
+    lines.append(line)
+    return '\n'.join(lines)
+
+
+def render_game(game):
+    played = game.finished_at or game.created_at
+    headers = [
+        _tag('Event', 'Casual game'),
+        _tag('Site', 'Chess App'),
+        _tag('Date', played.strftime('%Y.%m.%d') if played else '????.??.??'),
+        _tag('Round', '-'),
+        _tag('White', game.white_player),
+        _tag('Black', game.black_player),
+        _tag('Result', game.result),
+    ]
+    if game.time_control:
+        headers.append(_tag('TimeControl', game.time_control))
+    return ''.join(headers) + '\n' + movetext(game.move_list, game.result) + '\n\n'
+
+
+def render_page(user, after_id, page_size=None):
+    """
+    PGN text of the user's next ``page_size`` games with id above ``after_id``,
+    fetched by keyset, and the last id on the page (None once there are no more).
+    """
+    from .models import Game
+
+    page = list(
+        Game.objects.filter(Q(white=user) | Q(black=user), id__gt=after_id)
+        .select_related('white', 'black')
+        .only('id', 'moves', 'result', 'time_control', 'created_at', 'finished_at',
+              'white_name', 'black_name', 'white__username', 'black__username')
+        .order_by('id')[:page_size or settings.PGN_EXPORT_PAGE_SIZE]
+    )
+    if not page:
+        return None, ''
+    return page[-1].id, ''.join(render_game(game) for game in page)
+
+
+async def export_games(user, compress=False):
+    """Stream a user's games as PGN text, or as gzip bytes when ``compress`` is set."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None  # gzip container
+    last_id = 0
+    while True:
+        last_id, text = await sync_to_async(render_page)(user, last_id)
+        if last_id is None:
+            break
+        if compressor is None:
+            yield text
+            continue
+        chunk = compressor.compress(text.encode('utf-8'))
+        if chunk:
+            yield chunk
+    if compressor is not None:
+        yield compressor.flush()
+
+
+def _batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _parse_date(value):
+    try:
+        return timezone.make_aware(datetime.strptime(value, '%Y.%m.%d'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _save_batch(parsed, owner, owner_name):
+    """
+    Insert one parsed batch in a single transaction; returns the number of games written.
+
+    With an ``owner`` only games they played are written: the rest would be
+    stored without either account and still feed the opening explorer.
+    """
+    from .models import Game
+
+    if owner is not None:
+        # Uploads only link the uploader's own account; other names are kept as text
+        accounts = {owner_name or owner.username: owner}
+        parsed = [g for g in parsed if any(g['headers'].get(side, '') in accounts for side in ('White', 'Black'))]
+        if not parsed:
+            return 0
+    else:
+        names = {g['headers'].get(side, '') for g in parsed for side in ('White', 'Black')}
+        accounts = {u.username: u for u in get_user_model().objects.filter(username__in=names)}
+
+    games = []
+    for game in parsed:
+        headers = game['headers']
+        white, black = headers.get('White', ''), headers.get('Black', '')
+        games.append(Game(
+            white=accounts.get(white),
+            black=accounts.get(black),
+            white_name=white[:150],
+            black_name=black[:150],
+            moves=' '.join(game['moves']),
+            result=game['result'],
+            time_control=headers.get('TimeControl', '')[:20],
+            finished_at=_parse_date(headers.get('UTCDate') or headers.get('Date')),
+        ))
+    with transaction.atomic():
+        Game.objects.bulk_create(games, batch_size=settings.PGN_IMPORT_BATCH_SIZE)
+    return len(games)
+
+
+def import_games(lines, owner=None, owner_name=None, workers=0, batch_size=None, max_errors=20):
+    """
+    Import every game in an iterable of PGN lines.
+
+    ``workers`` > 0 parses in that many spawned processes; at most ``2 * workers`` batches
+    are in flight, so memory stays flat however large the input is. ``owner`` restricts
+    the import to that user's games, matched by ``owner_name`` (default: their username) in
+    the White/Black tags, and counts the others as ``not_played``; without it every game is
+    kept and players are linked to accounts with the same username.
+    Returns counts, timing and the first ``max_errors`` parse errors.
+    """
+    batch_size = batch_size or settings.PGN_IMPORT_BATCH_SIZE
+    stats = {'imported': 0, 'skipped': 0, 'not_played': 0, 'errors': []}
+    started = time.monotonic()
+
+    def collect(batch_index, result):
+        parsed, errors = result
+        written = _save_batch(parsed, owner, owner_name) if parsed else 0
+        stats['imported'] += written
+        stats['not_played'] += len(parsed) - written
+        stats['skipped'] += len(errors)
+        for index, message in errors:
+            if len(stats['errors']) < max_errors:
+                stats['errors'].append({'game': batch_index * batch_size + index + 1, 'error': message})
+
+    batches = enumerate(_batches(split_games(lines), batch_size))
+    if workers <= 0:
+        for batch_index, texts in batches:
+            collect(batch_index, parse_games(texts))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+            in_flight = deque()
+            for batch_index, texts in batches:
+                in_flight.append((batch_index, executor.submit(parse_games, texts)))
+                if len(in_flight) >= workers * 2:
+                    index, future = in_flight.popleft()
+                    collect(index, future.result())
+            while in_flight:
+                index, future = in_flight.popleft()
+                collect(index, future.result())
+
+    elapsed = time.monotonic() - started
+    stats['elapsed'] = round(elapsed, 3)
+    stats['games_per_second'] = round(stats['imported'] / elapsed, 1) if elapsed else 0
+    return stats
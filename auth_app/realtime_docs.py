@@ -14,26 +14,45 @@ class MQTTDocumentationView(APIView):
         ### MQTT Service Overview
         The application uses MQTT for background notifications and high-priority signaling (e.g., incoming calls).
 
-        **Broker**: `broker.emqx.io` (Port 1883)
+        **Broker**: `broker.emqx.io` (Port 1883) by default; set by `MQTT_BROKER_HOST` / `MQTT_BROKER_PORT`.
+        For local development `python manage.py run_mqtt_broker` starts a minimal in-repo broker.
         **Protocol**: MQTT v3.1.1
 
         ### Topics
         - `chess/user/{username}/notifications`: Primary topic for user-specific notifications.
+        - `chess/user/{username}/state`: Retained snapshot of the user's current state, republished
+          after every notification: `{"cursor": 123, "invitations": [...], "sent": [...], "calls": [...]}`.
+          A reconnecting device receives it immediately on subscribe.
 
         ### Message Format (JSON)
         ```json
         {
+            "id": 123,
             "type": "string",
-            "payload": { ... }
+            "payload": { ... },
+            "collapse_key": "invitation:42"
         }
         ```
+        A message supersedes earlier ones with the same `collapse_key` (`invitation:{id}` or
+        `call:{room_id}`); clients should replace, not append.
+
+        ### Encodings
+        Set with `PUT /api/auth/notifications/encoding/`: `json` (default, full payloads),
+        `compact` (JSON; invitations carry ids, room, status and a `{id, username, rating, picture}`
+        summary per player) or `msgpack` (the compact schema as MessagePack). The state topic
+        uses the same encoding.
+
+        ### Missed Messages
+        Delivery is QoS 0, so messages published while a device is offline are lost. Every
+        message is also kept in the user's inbox: remember the last `id` handled and call
+        `GET /api/auth/notifications/sync/?cursor={id}` on resume to fetch the rest.
 
         ### Notification Types
         | Type | Description | Payload |
         |---|---|---|
         | `game_invitation` | New match request | `GameInvitationSerializer` |
         | `invitation_response` | User accepted/declined | `{"invitation": ..., "action": "accept/decline"}` |
-        | `invitation_cancelled` | Sender revoked invite | `GameInvitationSerializer` |
+        | `invitation_cancelled` | Sender revoked invite, it expired, or another player took the challenge | `GameInvitationSerializer` |
         | `call_invitation` | Incoming WebRTC call | `{"caller": "name", "room_id": "id", "caller_picture": "url"}` |
         | `call_declined` | Call was rejected | `{"decliner": "name", "room_id": "id"}` |
         | `call_cancelled` | Caller ended attempt | `{"caller": "name", "room_id": "id"}` |
@@ -56,8 +75,10 @@ class WebSocketDocumentationView(APIView):
         **Base URL**: `ws://{host}/ws/` (or `wss://` for HTTPS)
 
         ### Endpoints
-        - `/ws/notifications/`: Live notification stream (Alternative to MQTT when app is foregrounded).
+        - `/ws/notifications/`: Live notification stream (Alternative to MQTT when app is foregrounded). `?encoding=json|compact|msgpack` overrides the user's notification encoding; msgpack is sent as binary frames.
         - `/ws/signaling/{room_id}/`: WebRTC signaling for active calls.
+        - `/ws/matchmaking/`: Rating-banded seek queue (authenticated).
+        - `/ws/lobby/`: Open-seek lobby with incremental updates (authenticated).
 
         ### Signaling Protocol (/ws/signaling/)
         All participants in a `room_id` receive messages sent to this socket.
@@ -74,11 +95,37 @@ class WebSocketDocumentationView(APIView):
         **Server -> Client (Signaling)**:
         Returns the same message to all other participants in the room.
 
+        Rooms created with `POST /api/auth/bot/play/` contain a computer opponent that joins
+        when you connect and answers each `move` frame with its own `move` frame.
+
         ### Notification Socket Events (/ws/notifications/)
         - `game_invitation`
         - `invitation_response`
         - `invitation_cancelled`
         - `call_invitation`
+        - `match_found`: `{"room_id": "...", "time_control": "5+0", "color": "white/black", "opponent": {"id", "username", "rating"}}`
+
+        ### Matchmaking Socket (/ws/matchmaking/)
+        **Client -> Server**:
+        ```json
+        {"type": "seek", "time_control": "5+0", "min_rating": 1000, "max_rating": 1600}
+        {"type": "cancel"}
+        ```
+        The acceptable rating band starts at ±100 and widens the longer a seek waits.
+        Disconnecting cancels the seek. Pairings are pushed as `match_found` with a new `room_id`.
+
+        ### Lobby Socket (/ws/lobby/)
+        **Client -> Server**:
+        ```json
+        {"type": "subscribe", "time_controls": ["5+0", "10+0"]}
+        {"type": "post", "time_control": "5+0", "color": "white/black/random"}
+        {"type": "cancel"}
+        {"type": "accept", "seek_id": 42}
+        ```
+        After subscribing the socket receives one `lobby_snapshot` (`{"version": n, "seeks": [...]}`)
+        followed only by diffs: `{"type": "seek_added", "version": n, "seek": {...}}` and
+        `{"type": "seek_removed", "version": n, "seek_id": 42}`. Ignore diffs whose `version` is not
+        newer than the snapshot. Accepting a seek pushes `match_found` to both players.
         """,
         responses={200: openapi.Response("Documentation reference only")}
     )
@@ -13,6 +13,8 @@ from django.conf import settings
 import pyotp
 import requests
 import traceback
+from . import bulkheads, health
+from .async_views import BulkheadAPIView
 from .serializers import (
     RegisterSerializer, LoginSerializer, LogoutSerializer, 
     UserSerializer, TokenSerializer, AuthResponseSerializer,
@@ -23,11 +25,12 @@ from .serializers import (
 User = get_user_model()
 
 # ========== REGISTRATION ==========
-class RegisterView(APIView):
+class RegisterView(BulkheadAPIView):
     """
     Register a new user with email, username and password
     """
     permission_classes = [AllowAny]
+    bulkhead = bulkheads.cpu  # PBKDF2 password hashing
     
     @swagger_auto_schema(
         request_body=RegisterSerializer,
@@ -121,11 +124,12 @@ class RegisterView(APIView):
 
 
 # ========== LOGIN ==========
-class LoginView(APIView):
+class LoginView(BulkheadAPIView):
     """
     Login with email and password
     """
     permission_classes = [AllowAny]
+    bulkhead = bulkheads.cpu  # PBKDF2 password check
     
     @swagger_auto_schema(
         request_body=LoginSerializer,
@@ -460,19 +464,13 @@ class HealthCheckView(APIView):
     def get(self, request):
         from django.db import connection
         
-        # Check database connection and engine
-        db_status = 'connected'
-        db_engine = 'unknown'
-        db_host = 'unknown'
-        user_count = 0
-        try:
-            from django.db import connection
-            connection.ensure_connection()
-            db_engine = connection.vendor
-            db_host = connection.settings_dict.get('HOST', 'unknown')
-            user_count = User.objects.count()
-        except Exception as e:
-            db_status = f'error: {str(e)}'
+        # Database state from the background health snapshot; no query or COUNT(*) per probe
+        snapshot = health.readiness()
+        database = snapshot.get('dependencies', {}).get('database', {})
+        db_status = 'connected' if database.get('status') == 'ok' else f"error: {database.get('error', 'not checked yet')}"
+        db_engine = database.get('vendor', connection.vendor)
+        db_host = connection.settings_dict.get('HOST', 'unknown')
+        user_count = snapshot.get('row_estimates', {}).get(User._meta.db_table)  # planner estimate; None off PostgreSQL
         
         return Response({
             'status': 'healthy',
@@ -493,6 +491,33 @@ class HealthCheckView(APIView):
             }
         }, status=status.HTTP_200_OK)
 
+
+class LivenessView(APIView):
+    """
+    Liveness probe: the process is up and serving requests. Touches no dependency.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    @swagger_auto_schema(auto_schema=None)
+    def get(self, request):
+        return Response({'status': 'alive'}, status=status.HTTP_200_OK)
+
+
+class ReadinessView(APIView):
+    """
+    Readiness probe: the cached dependency snapshot (see health.py); 503 when unready.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    
+    @swagger_auto_schema(auto_schema=None)
+    def get(self, request):
+        result = health.readiness()
+        return Response(
+            result, status=status.HTTP_200_OK if result['ready'] else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
     
 
 class DebugPasswordView(APIView):
@@ -517,11 +542,12 @@ class DebugPasswordView(APIView):
     
 
 # ========== SEND OTP ==========
-class SendOTPView(APIView):
+class SendOTPView(BulkheadAPIView):
     """
     Send OTP for password reset
     """
     permission_classes = [AllowAny]
+    bulkhead = bulkheads.cpu  # PBKDF2 OTP hashing; the email itself goes to the network bulkhead
     
     @swagger_auto_schema(
         request_body=EmailSerializer,
@@ -546,16 +572,8 @@ class SendOTPView(APIView):
             # CLEAR LOG FOR USER
             print(f"\n🚀 [OTP FOR {email}]: {otp_obj.otp_code} 🚀\n")
             
-            # Try to send email in background
-            import threading
-            from .models import OTP
-            
-            # Start background thread to send OTP
-            email_thread = threading.Thread(
-                target=otp_obj.send_otp
-            )
-            email_thread.daemon = True
-            email_thread.start()
+            # Send the email in the background, within the network bulkhead's limits
+            bulkheads.network.submit(otp_obj.send_otp)
             
             return Response({
                 'success': True,
@@ -568,6 +586,8 @@ class SendOTPView(APIView):
                 'success': False,
                 'message': 'No user found with this email'
             }, status=status.HTTP_200_OK)
+        except bulkheads.BulkheadFull:
+            raise
         except Exception as e:
             return Response({
                 'success': False,
@@ -576,11 +596,12 @@ class SendOTPView(APIView):
 
 
 # ========== VERIFY OTP ==========
-class VerifyOTPView(APIView):
+class VerifyOTPView(BulkheadAPIView):
     """
     Verify OTP for password reset
     """
     permission_classes = [AllowAny]
+    bulkhead = bulkheads.cpu  # PBKDF2 OTP check
     
     @swagger_auto_schema(
         request_body=OTPSerializer,
@@ -620,11 +641,12 @@ class VerifyOTPView(APIView):
 
 
 # ========== RESET PASSWORD ==========
-class ResetPasswordView(APIView):
+class ResetPasswordView(BulkheadAPIView):
     """
     Reset password using verified OTP
     """
     permission_classes = [AllowAny]
+    bulkhead = bulkheads.cpu  # PBKDF2 OTP check and password hashing
     
     @swagger_auto_schema(
         request_body=PasswordResetSerializer,
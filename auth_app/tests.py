@@ -0,0 +1,1400 @@
+import asyncio
+import gzip
+import json
+import os
+import random
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+import msgpack
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from . import (
+    analysis, async_game_views, bulkheads, connectivity, consumers, encoding, explorer, game_views, health, invitations,
+    leaderboard, lobby, matchmaking, mqtt_broker, mqtt_utils, notifications, pgn, user_search, views,
+)
+from .async_views import AsyncAPIView, BulkheadAPIView
+from .bot import BotPeer
+from .engine import BLACK, START_FEN, Board, bitbase
+from .engine.board import move_to_uci
+from .game_views import RespondToInvitationView
+from .lru import LRUCache
+from .models import Game, GameAnalysis, GameInvitation, Notification, User
+from .notifications import notify_many
+
+
+def make_users(count, prefix='user'):
+    User.objects.bulk_create([User(username=f"{prefix}{i}", email=f"{prefix}{i}@test.invalid") for i in range(count)])
+    return list(User.objects.filter(username__startswith=prefix).order_by('id'))
+
+
+class RankedBoardTests(SimpleTestCase):
+    def assertMatchesSort(self, board, scores):
+        expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        self.assertEqual(board.slice(1, len(scores)), [(i + 1, uid, score) for i, (uid, score) in enumerate(expected)])
+        for i, (uid, _) in enumerate(expected):
+            self.assertEqual(board.rank(uid), i + 1)
+
+    def test_ranks_and_slices_follow_a_full_sort(self):
+        rng = random.Random(26)
+        board, scores = leaderboard.RankedBoard(size=64), {}
+        for _ in range(500):
+            uid = rng.randrange(40)
+            if rng.random() < 0.2:
+                board.discard(uid)
+                scores.pop(uid, None)
+            else:
+                scores[uid] = rng.randrange(20)  # few distinct scores, so plenty of ties
+                board.set(uid, scores[uid])
+        self.assertEqual(len(board), len(scores))
+        self.assertMatchesSort(board, scores)
+
+    def test_slice_crosses_buckets_and_stops_at_the_end(self):
+        board = leaderboard.RankedBoard(size=16)
+        for uid, score in [(1, 5), (2, 9), (3, 5), (4, 5), (5, 0)]:
+            board.set(uid, score)
+
+        self.assertEqual(board.slice(2, 3), [(2, 1, 5), (3, 3, 5), (4, 4, 5)])
+        self.assertEqual(board.slice(4, 10), [(4, 4, 5), (5, 5, 0)])
+        self.assertEqual(board.slice(6, 3), [])
+        self.assertIsNone(board.rank(99))
+
+    def test_out_of_range_scores_are_clamped_into_the_end_buckets(self):
+        board = leaderboard.RankedBoard(size=16)
+        board.set(1, 100)
+        board.set(2, 15)
+        board.set(3, -4)
+
+        self.assertEqual([uid for _, uid, _ in board.slice(1, 3)], [1, 2, 3])
+        self.assertEqual(board.score_of(1), 100)
+
+@override_settings(MATCHMAKING_BASE_BAND=100, MATCHMAKING_BAND_GROWTH=10, MATCHMAKING_MAX_BAND=600)
+class MatchmakerTests(SimpleTestCase):
+    def setUp(self):
+        self.matchmaker = matchmaking.Matchmaker()
+        self.matches = []
+
+        async def announce(white, black, time_control):
+            self.matches.append({white[0], black[0]})
+            return 'room'
+
+        patcher = mock.patch.object(matchmaking, 'announce_match', announce)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def seek(self, user_id, rating, time_control='5+0', **band):
+        room = await self.matchmaker.enqueue(
+            matchmaking.Seek(user_id=user_id, username=f"u{user_id}", rating=rating, time_control=time_control, **band)
+        )
+        self.addCleanup(lambda: self.matchmaker._sweeper and self.matchmaker._sweeper.cancel())
+        return room
+
+    async def test_closest_rating_in_band_wins(self):
+        for user_id, rating in ((1, 1400), (2, 1610), (3, 1505)):  # 105 apart: none pair yet
+            self.assertIsNone(await self.seek(user_id, rating))
+
+        self.assertEqual(await self.seek(4, 1520), 'room')  # 1505 and 1610 are both in band
+        self.assertEqual(self.matches, [{3, 4}])
+        self.assertEqual(len(self.matchmaker), 2)
+
+    async def test_no_pairing_outside_the_band_or_across_time_controls(self):
+        await self.seek(1, 1500)
+        self.assertIsNone(await self.seek(2, 1750))
+        self.assertIsNone(await self.seek(3, 1500, time_control='3+2'))
+        self.assertEqual(self.matches, [])
+
+    async def test_both_sides_rating_limits_are_respected(self):
+        await self.seek(1, 1500, min_rating=1550)
+        self.assertIsNone(await self.seek(2, 1520))  # 1 won't play 1520
+        self.assertIsNone(await self.seek(3, 1560, max_rating=1450))  # 3 won't play 1 or 2
+        self.assertEqual(self.matches, [])
+
+    async def test_band_widens_with_waiting_time(self):
+        await self.seek(1, 1500)
+        await self.seek(2, 1750)
+        self.assertEqual(self.matches, [])
+
+        for seek in self.matchmaker._seeks.values():
+            seek.enqueued_at -= 20  # 100 + 20s * 10/s = 300 points
+        await self.matchmaker.sweep()
+
+        self.assertEqual(self.matches, [{1, 2}])
+        self.assertEqual(len(self.matchmaker), 0)
+
+    async def test_cancelled_seek_is_not_paired(self):
+        await self.seek(1, 1500)
+        self.assertTrue(self.matchmaker.cancel(1))
+        self.assertFalse(self.matchmaker.cancel(1))
+
+        self.assertIsNone(await self.seek(2, 1500))
+        self.assertEqual(self.matchmaker.stats()['by_time_control'], {'5+0': 1})
+
+    async def test_new_seek_replaces_the_old_one(self):
+        await self.seek(1, 1500, time_control='3+2')
+        await self.seek(1, 1500)
+        self.assertEqual(self.matchmaker.stats()['by_time_control'], {'5+0': 1})
+
+class MatchmakingConsumerTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1, prefix='seeker')
+        self.matchmaker = matchmaking.Matchmaker()
+        patcher = mock.patch.object(consumers, 'matchmaker', self.matchmaker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def connect(self):
+        communicator = WebsocketCommunicator(consumers.MatchmakingConsumer.as_asgi(), '/ws/matchmaking/')
+        communicator.scope['user'] = self.user
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    async def seek(self, communicator, **fields):
+        await communicator.send_json_to({'type': 'seek', 'time_control': '5+0', **fields})
+        return await communicator.receive_json_from()
+
+    async def test_closing_another_tab_keeps_the_seek(self):
+        first, second = await self.connect(), await self.connect()
+        self.assertEqual((await self.seek(first))['type'], 'seek_queued')
+        self.addCleanup(lambda: self.matchmaker._sweeper and self.matchmaker._sweeper.cancel())
+
+        await second.disconnect()
+        self.assertEqual(len(self.matchmaker), 1)
+        await first.disconnect()
+        self.assertEqual(len(self.matchmaker), 0)
+
+    async def test_inverted_rating_range_is_rejected(self):
+        communicator = await self.connect()
+        reply = await self.seek(communicator, min_rating=1600, max_rating=1400)
+        await communicator.disconnect()
+
+        self.assertEqual(reply['type'], 'error')
+        self.assertEqual(len(self.matchmaker), 0)
+
+    async def test_seek_uses_the_current_rating(self):
+        communicator = await self.connect()
+        await User.objects.filter(id=self.user.id).aupdate(rating=1733)  # a rated game finished meanwhile
+        await self.seek(communicator)
+        self.addCleanup(lambda: self.matchmaker._sweeper and self.matchmaker._sweeper.cancel())
+
+        self.assertEqual(self.matchmaker._seeks[self.user.id].rating, 1733)
+        await communicator.disconnect()
+
+class SeekLobbyTests(TestCase):
+    def setUp(self):
+        self.lobby = lobby.SeekLobby()
+        patcher = mock.patch.object(consumers, 'lobby', self.lobby)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.poster, self.first, self.second = make_users(3, prefix='lobby')
+
+    async def connect(self, user):
+        communicator = WebsocketCommunicator(consumers.LobbyConsumer.as_asgi(), '/ws/lobby/')
+        communicator.scope['user'] = user
+        self.assertTrue((await communicator.connect())[0])
+        return communicator
+
+    async def test_snapshot_then_versioned_diffs(self):
+        poster = await self.connect(self.poster)
+        await poster.send_json_to({'type': 'post', 'time_control': '5+0', 'color': 'white'})
+        first_id = (await poster.receive_json_from())['seek_id']
+
+        watcher = await self.connect(self.first)
+        await watcher.send_json_to({'type': 'subscribe', 'time_controls': ['5+0']})
+        snapshot = await watcher.receive_json_from()
+        self.assertEqual(snapshot['type'], 'lobby_snapshot')
+        self.assertEqual([seek['id'] for seek in snapshot['seeks']], [first_id])
+
+        await poster.send_json_to({'type': 'post', 'time_control': '3+2'})  # unwatched control, replaces the seek
+        await poster.receive_json_from()
+        removed = await watcher.receive_json_from()
+        self.assertEqual((removed['type'], removed['seek_id']), ('seek_removed', first_id))
+        self.assertEqual(removed['version'], snapshot['version'] + 1)
+        self.assertTrue(await watcher.receive_nothing())  # the 3+2 seek_added goes to other groups
+
+        self.assertEqual(self.lobby.snapshot(['5+0'])['seeks'], [])
+        self.assertEqual(self.lobby.version, snapshot['version'] + 2)
+        for communicator in (poster, watcher):
+            await communicator.disconnect()
+
+    async def test_only_one_of_two_accepts_wins(self):
+        poster = await self.connect(self.poster)
+        await poster.send_json_to({'type': 'post', 'time_control': '5+0'})
+        seek_id = (await poster.receive_json_from())['seek_id']
+        first, second = await self.connect(self.first), await self.connect(self.second)
+
+        await first.send_json_to({'type': 'accept', 'seek_id': seek_id})
+        await second.send_json_to({'type': 'accept', 'seek_id': seek_id})
+        replies = [await first.receive_json_from(), await second.receive_json_from()]
+
+        self.assertEqual(sorted(reply['type'] for reply in replies), ['error', 'match_found'])
+        matched = await poster.receive_json_from()
+        self.assertEqual(matched['type'], 'match_found')
+        self.assertTrue(await poster.receive_nothing())  # paired once
+        self.assertEqual(len(self.lobby), 0)
+        for communicator in (poster, first, second):
+            await communicator.disconnect()
+
+    async def test_disconnect_drops_only_seeks_from_that_socket(self):
+        tab, other_tab = await self.connect(self.poster), await self.connect(self.poster)
+        await tab.send_json_to({'type': 'post', 'time_control': '5+0'})
+        await tab.receive_json_from()
+
+        await other_tab.disconnect()
+        self.assertEqual(len(self.lobby), 1)
+        await tab.disconnect()
+        self.assertEqual(len(self.lobby), 0)
+
+class NotifyManyTests(TestCase):
+    def test_large_batch_replaces_superseded_entries(self):
+        users = make_users(1000)
+        Notification.objects.bulk_create([
+            Notification(user=user, type='game_invitation', payload={'id': user.id}, collapse_key=f"invitation:{user.id}")
+            for user in users
+        ])
+
+        rows = notify_many([(user, 'invitation_cancelled', {'id': user.id}) for user in users])
+
+        self.assertEqual(len(rows), 1000)
+        self.assertEqual(Notification.objects.count(), 1000)
+        self.assertFalse(Notification.objects.filter(type='game_invitation').exists())
+
+    def test_collapse_is_per_user(self):
+        alice, bob = make_users(2)
+        Notification.objects.create(user=bob, type='game_invitation', payload={'id': 7}, collapse_key='invitation:7')
+
+        notify_many([(alice, 'invitation_cancelled', {'id': 7})])
+
+        self.assertTrue(Notification.objects.filter(user=bob, collapse_key='invitation:7').exists())
+
+
+class NotificationSyncTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = make_users(2)
+
+    def sync(self, **params):
+        request = APIRequestFactory().get('/notifications/sync/', params)
+        force_authenticate(request, user=self.alice)
+        return game_views.NotificationSyncView.as_view()(request)
+
+    def test_pages_through_the_inbox_from_the_cursor(self):
+        rows = notify_many([(self.alice, 'game_result', {'n': n}) for n in range(5)])
+        notify_many([(self.bob, 'game_result', {'n': 99})])
+
+        first = self.sync(cursor=rows[0].id, limit=2).data
+        self.assertEqual([n['payload']['n'] for n in first['notifications']], [1, 2])
+        self.assertTrue(first['has_more'])
+        second = self.sync(cursor=first['next_cursor'], limit=2).data
+        self.assertEqual([n['payload']['n'] for n in second['notifications']], [3, 4])
+        self.assertFalse(second['has_more'])
+
+        caught_up = self.sync(cursor=second['next_cursor']).data
+        self.assertEqual(caught_up['notifications'], [])
+        self.assertEqual(caught_up['next_cursor'], second['next_cursor'])
+
+    def test_only_the_latest_word_on_an_invitation_is_synced(self):
+        notify_many([(self.alice, 'game_invitation', {'id': 7})])
+        notify_many([(self.alice, 'invitation_cancelled', {'id': 7})])
+
+        self.assertEqual([n['type'] for n in self.sync(cursor=0).data['notifications']], ['invitation_cancelled'])
+
+    def test_malformed_cursor_is_a_bad_request(self):
+        self.assertEqual(self.sync(cursor='latest').status_code, 400)
+
+class NotificationEncodingTests(SimpleTestCase):
+    invitation = {
+        'id': 42, 'room_id': 'room', 'challenge_id': None, 'status': 'pending', 'updated_at': '2024-01-01T00:00:00Z',
+        'created_at': '2024-01-01T00:00:00Z',
+        'sender': {'id': 1, 'username': 'alice', 'email': 'alice@test.invalid', 'rating': 1500, 'profile_picture': None},
+        'receiver': {'id': 2, 'username': 'bob', 'email': 'bob@test.invalid', 'rating': 1450, 'profile_picture': 'b.png'},
+    }
+
+    def setUp(self):
+        patcher = mock.patch.object(encoding, '_payload_cache', LRUCache(100, ttl=60))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def decode(self, data, wire):
+        return msgpack.unpackb(data) if wire == encoding.MSGPACK else json.loads(data)
+
+    def test_messages_round_trip_in_every_encoding(self):
+        fields = {'type': 'game_invitation', 'id': 7}
+        compact = encoding.compact_payload('game_invitation', self.invitation)
+        for wire, payload in [(encoding.JSON, self.invitation), (encoding.COMPACT, compact), (encoding.MSGPACK, compact)]:
+            with self.subTest(encoding=wire):
+                data = encoding.encode_message(fields, 'payload', 'game_invitation', self.invitation, wire)
+                self.assertEqual(self.decode(data, wire), {**fields, 'payload': payload})
+                self.assertEqual(self.decode(encoding.encode_message({}, 'p', 'game_result', {'x': 1}, wire), wire),
+                                 {'p': {'x': 1}})
+                self.assertEqual(self.decode(encoding.encode_state({'cursor': 3}, wire), wire), {'cursor': 3})
+        self.assertNotIn('email', json.dumps(compact))
+
+    def test_recipients_share_the_encoded_payload(self):
+        first = encoding.encode_message({'id': 1}, 'payload', 'game_invitation', self.invitation, encoding.MSGPACK)
+        second = encoding.encode_message({'id': 2}, 'payload', 'game_invitation', self.invitation, encoding.MSGPACK)
+
+        self.assertEqual(encoding.payload_cache_stats()['hits'], 1)
+        self.assertEqual(msgpack.unpackb(first)['payload'], msgpack.unpackb(second)['payload'])
+        self.assertEqual(msgpack.unpackb(second)['id'], 2)
+
+class InvitationExpiryTests(TestCase):
+    def make_stale_invitations(self, count):
+        sender, *receivers = make_users(count + 1)
+        GameInvitation.objects.bulk_create([
+            GameInvitation(sender=sender, receiver=receiver, room_id=f"room-{receiver.id}") for receiver in receivers
+        ])
+        GameInvitation.objects.update(created_at=timezone.now() - timedelta(hours=2))
+        return list(GameInvitation.objects.order_by('id'))
+
+    def test_backlog_larger_than_a_batch(self):
+        self.make_stale_invitations(600)
+
+        self.assertEqual(invitations.expire_stale_invitations(ttl=60, batch_size=500), 600)
+        self.assertFalse(GameInvitation.objects.filter(status='pending').exists())
+        self.assertEqual(Notification.objects.filter(type='invitation_cancelled').count(), 1200)
+
+    def test_invitation_answered_after_the_select_is_left_alone(self):
+        answered, *rest = self.make_stale_invitations(3)
+        claim = invitations._claim
+
+        def claim_then_accept(*args):
+            rows = claim(*args)
+            GameInvitation.objects.filter(id=answered.id).update(status='accepted')
+            return rows
+
+        with mock.patch.object(invitations, '_claim', claim_then_accept):
+            self.assertEqual(invitations.expire_stale_invitations(ttl=60), 2)
+
+        self.assertEqual(GameInvitation.objects.get(id=answered.id).status, 'accepted')
+        self.assertEqual(GameInvitation.objects.filter(status='expired').count(), 2)
+        announced = {n.payload['id'] for n in Notification.objects.filter(type='invitation_cancelled')}
+        self.assertEqual(announced, {invitation.id for invitation in rest})
+
+
+class ChallengeAcceptTests(TestCase):
+    def setUp(self):
+        sender, *self.receivers = make_users(4)
+        challenge_id = uuid.uuid4()
+        self.invitations = [
+            GameInvitation.objects.create(sender=sender, receiver=receiver, room_id='room', challenge_id=challenge_id)
+            for receiver in self.receivers
+        ]
+
+    def statuses(self):
+        return [invitation.status for invitation in GameInvitation.objects.order_by('id')]
+
+    def test_accept_cancels_the_siblings(self):
+        won, invitation, _ = RespondToInvitationView.decide(self.invitations[0], 'accept')
+
+        self.assertTrue(won)
+        self.assertEqual(self.statuses(), ['accepted', 'cancelled', 'cancelled'])
+        cancelled = Notification.objects.filter(type='invitation_cancelled')
+        self.assertEqual({n.user_id for n in cancelled}, {r.id for r in self.receivers[1:]})
+
+    def test_late_accept_leaves_the_siblings_pending(self):
+        GameInvitation.objects.filter(id=self.invitations[0].id).update(status='expired')
+
+        won, invitation, _ = RespondToInvitationView.decide(self.invitations[0], 'accept')
+
+        self.assertFalse(won)
+        self.assertEqual(invitation.status, 'expired')
+        self.assertEqual(self.statuses(), ['expired', 'pending', 'pending'])
+        self.assertFalse(Notification.objects.exists())
+
+    def test_only_the_first_accept_wins(self):
+        self.assertTrue(RespondToInvitationView.decide(self.invitations[1], 'accept')[0])
+        self.assertFalse(RespondToInvitationView.decide(self.invitations[2], 'accept')[0])
+        self.assertEqual(self.statuses(), ['cancelled', 'accepted', 'cancelled'])
+
+
+class CancelInvitationTests(TestCase):
+    def setUp(self):
+        sender, receiver = make_users(2)
+        self.invitation = GameInvitation.objects.select_related('sender', 'receiver').get(
+            id=GameInvitation.objects.create(sender=sender, receiver=receiver, room_id='room').id
+        )
+
+    def cancel(self):
+        request = APIRequestFactory().post(f'/invitations/{self.invitation.id}/cancel/')
+        force_authenticate(request, user=self.invitation.sender)
+        return game_views.cancel_invitation(request, invitation_id=self.invitation.id)
+
+    def test_cancel_notifies_the_receiver(self):
+        self.assertEqual(self.cancel().status_code, 200)
+        self.assertEqual(GameInvitation.objects.get().status, 'cancelled')
+        self.assertTrue(Notification.objects.filter(user=self.invitation.receiver, type='invitation_cancelled').exists())
+
+    def test_cancel_after_an_accept_is_a_conflict(self):
+        # The sender's view has loaded the pending row; the receiver accepts before the cancel writes
+        loaded = self.invitation
+        RespondToInvitationView.decide(GameInvitation.objects.get(id=loaded.id), 'accept')
+        Notification.objects.all().delete()
+
+        self.assertFalse(game_views.cancel(loaded))
+        self.assertEqual(loaded.status, 'accepted')
+        self.assertEqual(GameInvitation.objects.get().status, 'accepted')
+        self.assertFalse(Notification.objects.exists())
+
+    def test_view_returns_conflict_when_no_longer_pending(self):
+        with mock.patch.object(game_views, 'cancel', return_value=False):
+            response = self.cancel()
+        self.assertEqual(response.status_code, 409)
+
+
+class OutboxDrainTests(TransactionTestCase):
+    def setUp(self):
+        self.user, = make_users(1)
+        Notification.objects.bulk_create([
+            Notification(user=self.user, type='call_invitation', payload={'room_id': f"r{n}"}) for n in range(5)
+        ])
+
+    def test_publishes_outside_any_transaction(self):
+        seen = {}
+
+        def publish(messages):
+            seen['in_transaction'] = connection.in_atomic_block
+            seen['claimed'] = Notification.objects.filter(claim__isnull=False).count()
+            return len(messages)
+
+        with mock.patch.object(notifications, 'publish_mqtt_messages', publish):
+            self.assertEqual(notifications.drain(), 5)
+
+        self.assertEqual(seen, {'in_transaction': False, 'claimed': 5})
+        self.assertFalse(Notification.objects.filter(published_at__isnull=True).exists())
+
+    def test_failed_publish_releases_the_batch(self):
+        with mock.patch.object(notifications, 'publish_mqtt_messages', return_value=0):
+            self.assertEqual(notifications.drain(), 0)
+
+        self.assertEqual(Notification.objects.filter(published_at__isnull=True, claim__isnull=True).count(), 5)
+
+    def test_leased_rows_are_skipped_until_the_lease_expires(self):
+        leased = Notification.objects.order_by('id')[:2].values_list('id', flat=True)
+        Notification.objects.filter(id__in=list(leased)).update(claim=uuid.uuid4(), claimed_at=timezone.now())
+
+        with mock.patch.object(notifications, 'publish_mqtt_messages', side_effect=len):
+            self.assertEqual(notifications.drain(), 3)
+            Notification.objects.filter(published_at__isnull=True).update(claimed_at=timezone.now() - timedelta(hours=1))
+            self.assertEqual(notifications.drain(), 2)
+
+    def test_commit_without_outbox_task_does_not_publish_inline(self):
+        with mock.patch.object(notifications, 'publish_mqtt_messages') as publish, \
+                mock.patch.object(notifications.bulkheads.network, 'submit') as submit:
+            notify_many([(self.user, 'call_invitation', {'room_id': 'x'})])
+            notify_many([(self.user, 'call_invitation', {'room_id': 'y'})])
+
+        publish.assert_not_called()
+        submit.assert_called_once_with(notifications._queued_drain)  # the second commit joins the queued drain
+        notifications._drain_queued = False
+
+
+class AsyncInvitationViewTests(TransactionTestCase):
+    """The ASGI invitation views, with their queries on the real ``db`` bulkhead."""
+
+    def setUp(self):
+        self.alice, self.bob = make_users(2)
+        patcher = mock.patch.object(notifications, '_kick_drain')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def call(self, view, user, method='post', data=None, headers=None, **kwargs):
+        request = getattr(APIRequestFactory(), method)('/', data, format='json', headers=headers)
+        force_authenticate(request, user=user)
+        return await view(request, **kwargs)
+
+    async def send(self):
+        response = await self.call(async_game_views.SendInvitationView.as_view(), self.alice,
+                                   data={'receiver_username': self.bob.username, 'room_id': 'room'})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data['invitation']['id']
+
+    async def test_send_list_and_accept(self):
+        my_invitations = async_game_views.MyInvitationsView.as_view()
+        respond = async_game_views.RespondToInvitationView.as_view()
+        invitation_id = await self.send()
+
+        listed = await self.call(my_invitations, self.bob, method='get')
+        self.assertEqual(listed.data['count'], 1)
+        unchanged = await self.call(my_invitations, self.bob, method='get', headers={'If-None-Match': listed['ETag']})
+        self.assertEqual(unchanged.status_code, 304)
+
+        bogus = await self.call(respond, self.bob, data={'action': 'bogus'}, invitation_id=invitation_id)
+        self.assertEqual(bogus.status_code, 400)
+        accepted = await self.call(respond, self.bob, data={'action': 'accept'}, invitation_id=invitation_id)
+        self.assertEqual((accepted.status_code, accepted.data['invitation']['status']), (200, 'accepted'))
+        again = await self.call(respond, self.bob, data={'action': 'accept'}, invitation_id=invitation_id)
+        self.assertEqual(again.status_code, 404)
+        self.assertEqual((await self.call(my_invitations, self.bob, method='get')).data['count'], 0)
+
+    async def test_cancel(self):
+        invitation_id = await self.send()
+
+        response = await self.call(async_game_views.cancel_invitation, self.alice, invitation_id=invitation_id)
+
+        self.assertEqual(response.status_code, 200)
+        invitation = await GameInvitation.objects.aget(id=invitation_id)
+        self.assertEqual(invitation.status, 'cancelled')
+        self.assertTrue(await Notification.objects.filter(user=self.bob, type='invitation_cancelled').aexists())
+        missing = await self.call(async_game_views.cancel_invitation, self.bob, invitation_id=invitation_id)
+        self.assertEqual(missing.status_code, 404)
+
+    async def test_cancel_racing_an_accept_is_a_conflict(self):
+        invitation_id = await self.send()
+        cancel = game_views.cancel
+
+        def accept_first(invitation):
+            RespondToInvitationView.decide(GameInvitation.objects.get(id=invitation.id), 'accept')
+            return cancel(invitation)
+
+        with mock.patch.object(game_views, 'cancel', accept_first):
+            response = await self.call(async_game_views.cancel_invitation, self.alice, invitation_id=invitation_id)
+
+        self.assertEqual((response.status_code, response.data['status']), (409, 'accepted'))
+
+    async def test_call_to_an_unknown_user(self):
+        response = await self.call(async_game_views.SendCallSignalView.as_view(), self.alice,
+                                   data={'receiver_username': 'nobody', 'room_id': 'call'})
+        self.assertEqual(response.status_code, 404)
+
+class InvitationQueryCountTests(TestCase):
+    """Query counts must not grow with the number of invitations (no N+1)."""
+
+    def setUp(self):
+        self.factory = APIRequestFactory()
+
+    def invite(self, receiver, senders, challenge_id=None):
+        return [
+            GameInvitation.objects.create(sender=sender, receiver=receiver, room_id='room', challenge_id=challenge_id)
+            for sender in senders
+        ]
+
+    def test_my_invitations(self):
+        for count in (1, 5, 25):
+            with self.subTest(count=count):
+                receiver, *senders = make_users(count + 1, prefix=f"my{count}_")
+                self.invite(receiver, senders)
+                request = self.factory.get('/invitations/my/')
+                force_authenticate(request, user=receiver)
+                with self.assertNumQueries(1):
+                    response = game_views.MyInvitationsView.as_view()(request)
+                self.assertEqual(response.data['count'], count)
+
+    def test_respond_accept_challenge(self):
+        for count in (2, 5, 25):
+            with self.subTest(count=count):
+                sender, *receivers = make_users(count + 1, prefix=f"ch{count}_")
+                challenge_id = uuid.uuid4()
+                invitation = [
+                    self.invite(receiver, [sender], challenge_id)[0] for receiver in receivers
+                ][0]
+                request = self.factory.post(f'/invitations/{invitation.id}/respond/', {'action': 'accept'}, format='json')
+                force_authenticate(request, user=invitation.receiver)
+                with self.assertNumQueries(11):
+                    response = game_views.RespondToInvitationView.as_view()(request, invitation_id=invitation.id)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(GameInvitation.objects.filter(challenge_id=challenge_id, status='cancelled').count(), count - 1)
+
+    def test_respond_decline(self):
+        for count in (1, 5, 25):
+            with self.subTest(count=count):
+                receiver, *senders = make_users(count + 1, prefix=f"dec{count}_")
+                invitation = self.invite(receiver, senders)[0]
+                request = self.factory.post(f'/invitations/{invitation.id}/respond/', {'action': 'decline'}, format='json')
+                force_authenticate(request, user=receiver)
+                with self.assertNumQueries(9):
+                    response = game_views.RespondToInvitationView.as_view()(request, invitation_id=invitation.id)
+                self.assertEqual(response.status_code, 200)
+
+
+class InvitationETagTests(TestCase):
+    def setUp(self):
+        self.receiver, self.sender = make_users(2, prefix='etag')
+        GameInvitation.objects.create(sender=self.sender, receiver=self.receiver, room_id='room')
+
+    def get(self, etag=None):
+        request = APIRequestFactory().get('/invitations/my/', HTTP_IF_NONE_MATCH=etag or '')
+        force_authenticate(request, user=self.receiver)
+        return game_views.MyInvitationsView.as_view()(request)
+
+    def test_unchanged_list_is_not_modified(self):
+        etag = self.get()['ETag']
+        self.assertEqual(self.get(etag).status_code, 304)
+
+    def test_sender_presence_change_invalidates_the_receivers_list(self):
+        etag = self.get()['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.sender.is_online = True
+            self.sender.save()
+
+        response = self.get(etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['invitations'][0]['sender']['is_online'])
+
+class UserListCountTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.users = make_users(4, prefix='count')
+        User.objects.filter(id__in=[u.id for u in self.users[:3]]).update(is_online=True)
+
+    def count(self, view, user):
+        request = APIRequestFactory().get('/users/')
+        force_authenticate(request, user=User.objects.get(id=user.id))
+        return view.as_view()(request).data['count']
+
+    def test_cached_count_leaves_out_each_requesting_user(self):
+        online, offline = self.users[0], self.users[3]
+        for user in (online, offline, online):
+            with self.subTest(user=user.username):
+                self.assertEqual(self.count(game_views.AllUsersView, user), 3)
+        self.assertEqual(self.count(game_views.OnlineUsersView, online), 2)
+        self.assertEqual(self.count(game_views.OnlineUsersView, offline), 3)
+        self.assertEqual(self.count(game_views.OnlineUsersView, online), 2)
+
+class UserSearchIndexTests(TestCase):
+    def setUp(self):
+        self.index = user_search.UserSearchIndex()
+
+    def names(self, query):
+        return [result['username'] for result in self.index.search(query)]
+
+    def test_prefix_run_includes_characters_above_the_bmp(self):
+        User.objects.create(username='astral', email='astral@test.invalid', first_name='x\U0001d518', last_name='')
+        User.objects.create(username='plain', email='plain@test.invalid', first_name='xy', last_name='')
+
+        self.assertEqual(sorted(self.names('x')), ['astral', 'plain'])
+        self.assertEqual(self.names('x\U0001d518'), ['astral'])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        user = User.objects.create(username='kept', email='kept@test.invalid')
+        self.index.rebuild()
+        with mock.patch.object(user_search, 'index', self.index), self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                user.username = 'phantom'
+                user.save()
+                raise RuntimeError
+
+        self.assertEqual(self.names('phantom'), [])
+        self.assertEqual(self.names('kept'), ['kept'])
+
+    def test_change_committed_during_a_rebuild_survives_the_swap(self):
+        User.objects.create(username='early', email='early@test.invalid')
+        self.index.rebuild()
+        late = User(id=10 ** 6, username='late', is_active=True)
+        values = User.objects.filter(is_active=True).values
+
+        def racing_values(*fields):
+            rows = list(values(*fields))
+            self.index.update(late)  # commits after the rebuild has read the table
+            return mock.Mock(iterator=lambda: iter(rows))
+
+        with mock.patch.object(user_search, 'get_user_model') as get_user_model:
+            get_user_model.return_value.objects.filter.return_value.values = racing_values
+            self.index.rebuild()
+
+        self.assertEqual(self.names('late'), ['late'])
+        self.assertEqual(self.names('early'), ['early'])
+
+    def test_presence_change_keeps_the_name_tokens(self):
+        user = User.objects.create(username='mover', email='mover@test.invalid', first_name='Ann', last_name='Lee')
+        self.index.rebuild()
+        entries = list(self.index._all)
+
+        user.is_online = True
+        with mock.patch.object(user_search, 'insort', wraps=user_search.insort) as insort:
+            self.index.update(user)
+        self.assertEqual(insort.call_count, 4)  # mover, ann, lee, "ann lee": online list only
+        self.assertEqual(self.index._all, entries)
+        self.assertEqual(self.index.search('ann')[0]['is_online'], True)
+
+        user.rating = 1700
+        user.is_online = False
+        with mock.patch.object(user_search, 'insort') as insort:
+            self.index.update(user)
+        insort.assert_not_called()
+        self.assertEqual((self.index._online, self.index.search('lee')[0]['rating']), ([], 1700))
+
+        user.first_name = 'Anna'
+        self.index.update(user)
+        self.assertEqual(self.names('anna'), ['mover'])
+        self.assertEqual(self.names('ann lee'), [])
+
+    def test_save_of_unindexed_fields_is_ignored(self):
+        user = User.objects.create(username='quiet', email='quiet@test.invalid')
+        with mock.patch.object(user_search.index, 'update') as update, self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=['notification_encoding'])
+            user.save(update_fields=['is_online'])
+        update.assert_called_once_with(user)
+
+
+def long_game(plies):
+    board, moves = Board(), []
+    for ply in range(plies):
+        legal = board.legal_moves()
+        move = legal[ply * 7 % len(legal)]
+        moves.append(move_to_uci(move))
+        board.push(move)
+    return ' '.join(moves)
+
+
+@override_settings(PGN_EXPORT_PAGE_SIZE=2)
+class PgnExportTests(TestCase):
+    def setUp(self):
+        self.user, = make_users(1, prefix='exporter')
+        Game.objects.bulk_create([Game(white=self.user, moves='e2e4 e7e5', result='1-0') for _ in range(5)])
+
+    async def export(self, **params):
+        request = APIRequestFactory().get('/games/export/', params)
+        force_authenticate(request, user=self.user)
+        return await sync_to_async(game_views.GameExportView.as_view())(request)
+
+    async def test_pages_are_fetched_as_the_response_is_read(self):
+        with mock.patch.object(pgn, 'render_page', wraps=pgn.render_page) as render_page:
+            response = await self.export()
+            self.assertTrue(response.is_async)
+            content = aiter(response)
+            first = await anext(content)
+            self.assertEqual(render_page.call_count, 1)
+            rest = [part async for part in content]
+
+        self.assertEqual(render_page.call_count, 4)  # three pages, then the empty one
+        self.assertEqual((first + b''.join(rest)).count(b'[Result "1-0"]'), 5)
+
+    async def test_gzip_export(self):
+        response = await self.export(compress='gzip')
+        data = gzip.decompress(b''.join([part async for part in response]))
+        self.assertEqual(data.count(b'[Result "1-0"]'), 5)
+
+def move_frame(uci):
+    return {
+        'type': 'move', 'fromCol': 'abcdefgh'.index(uci[0]), 'fromRow': 8 - int(uci[1]),
+        'toCol': 'abcdefgh'.index(uci[2]), 'toRow': 8 - int(uci[3]),
+    }
+
+
+class FakeSearchService:
+    """Stands in for BotService: returns the queued moves, each once ``release`` is set."""
+
+    def __init__(self, *moves):
+        self.moves = list(moves)
+        self.calls = []
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def search(self, fen, moves, move_time):
+        self.calls.append(moves)
+        self.started.set()
+        await self.release.wait()
+        return mock.Mock(move=self.moves.pop(0))
+
+
+def perft(board, depth):
+    if depth == 0:
+        return 1
+    nodes = 0
+    for move in board.legal_moves():
+        board.push(move)
+        nodes += perft(board, depth - 1)
+        board.pop()
+    return nodes
+
+
+class EnginePerftTests(SimpleTestCase):
+    """Leaf counts of the standard perft positions (chessprogramming.org); any move generator bug changes them."""
+
+    POSITIONS = [
+        (START_FEN, 3, 8902),
+        ('r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1', 2, 2039),  # castling, pins
+        ('8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1', 3, 2812),  # en passant, discovered checks
+        ('r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1', 3, 9467),  # promotions
+        ('rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8', 2, 1486),
+    ]
+
+    def test_perft(self):
+        for fen, depth, nodes in self.POSITIONS:
+            with self.subTest(fen=fen):
+                board = Board(fen)
+                key = board.hash
+                self.assertEqual(perft(board, depth), nodes)
+                self.assertEqual((board.fen(), board.hash), (fen, key))  # push/pop restore everything
+
+@tag('slow')
+class BitbaseTests(SimpleTestCase):
+    """Known endgame results; building the three tables takes about half a minute."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        directory = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(directory.cleanup)
+        path = os.path.join(directory.name, 'bitbases.bin')
+        bitbase.write(path, bitbase.generate())
+        cls.bitbase = bitbase.Bitbase(path)
+        cls.addClassCleanup(cls.bitbase.close)
+
+    def assertProbes(self, cases):
+        for fen, expected in cases:
+            with self.subTest(fen=fen):
+                self.assertEqual(self.bitbase.probe(Board(fen)), expected)
+
+    def test_krk(self):
+        self.assertProbes([
+            ('4k3/8/4K3/8/8/8/8/R7 w - - 0 1', bitbase.WIN),
+            ('4k3/8/4K3/8/8/8/8/R7 b - - 0 1', bitbase.LOSS),
+            ('4k3/4R3/8/8/8/8/8/K7 b - - 0 1', bitbase.DRAW),  # Kxe7
+            ('k7/8/K7/8/8/8/8/1R6 b - - 0 1', bitbase.DRAW),  # stalemate
+        ])
+
+    def test_kpk(self):
+        self.assertProbes([
+            ('4k3/8/4K3/4P3/8/8/8/8 w - - 0 1', bitbase.WIN),  # king on the sixth in front of the pawn
+            ('4k3/8/4K3/4P3/8/8/8/8 b - - 0 1', bitbase.LOSS),
+            ('k7/8/8/8/8/8/P7/4K3 w - - 0 1', bitbase.DRAW),  # rook pawn, defender in the corner
+            ('8/8/8/4k3/4P3/8/8/7K b - - 0 1', bitbase.DRAW),  # Kxe4
+            ('8/8/8/8/4p3/4k3/8/4K3 w - - 0 1', bitbase.LOSS),  # black pawn: mirrored lookup
+        ])
+
+    def test_kqk_and_uncovered_material(self):
+        self.assertProbes([
+            ('7k/8/8/8/8/8/8/K2Q4 w - - 0 1', bitbase.WIN),
+            ('4k3/8/8/8/8/8/8/4K3 w - - 0 1', bitbase.DRAW),
+            ('4k3/8/8/8/8/8/8/1N2K3 w - - 0 1', bitbase.DRAW),
+            ('4k3/8/8/8/8/8/8/RR2K3 w - - 0 1', None),
+        ])
+
+class BotPeerTests(SimpleTestCase):
+    async def test_frame_during_a_search_is_dropped(self):
+        service = FakeSearchService('e7e5')
+        service.release.clear()
+        peer = BotPeer(service, 'room', BLACK, 0.1)
+        self.assertTrue(peer._apply_frame(move_frame('e2e4')))
+
+        thinking = asyncio.ensure_future(peer._maybe_play())
+        await service.started.wait()
+        self.assertFalse(peer._apply_frame(move_frame('d7d5')))  # black's move, but black is the bot
+        service.release.set()
+        await thinking
+
+        self.assertEqual(peer.moves, ['e2e4', 'e7e5'])
+
+    async def test_stale_result_starts_a_new_search(self):
+        service = FakeSearchService('e2e4', 'c7c5')  # the first result is for the position before e2e4
+        peer = BotPeer(service, 'room', BLACK, 0.1)
+        peer._apply_frame(move_frame('e2e4'))
+
+        await peer._maybe_play()
+
+        self.assertEqual(len(service.calls), 2)
+        self.assertEqual(peer.moves, ['e2e4', 'c7c5'])
+
+class AnalysisQueueTests(TestCase):
+    def setUp(self):
+        self.alice, self.bob = make_users(2)
+        self.pipeline = analysis.AnalysisPipeline()
+
+    def job(self, **fields):
+        game = Game.objects.create(white=self.alice, black=self.bob, moves='e2e4 e7e5', result='1-0')
+        job = GameAnalysis.enqueue(game)
+        GameAnalysis.objects.filter(pk=job.pk).update(**fields)
+        return job
+
+    def test_claim_takes_queued_and_expired_jobs_only(self):
+        expired_at = timezone.now() - timedelta(seconds=settings.ANALYSIS_LEASE + 1)
+        queued = self.job()
+        owner = uuid.uuid4()
+        live = self.job(status='running', claim=owner, claimed_at=timezone.now())
+        expired = self.job(status='running', claim=uuid.uuid4(), claimed_at=expired_at)
+
+        token, jobs = self.pipeline.claim(10)
+
+        self.assertEqual({job.pk for job in jobs}, {queued.pk, expired.pk})
+        self.assertEqual(GameAnalysis.objects.filter(claim=token).count(), 2)
+        self.assertEqual(GameAnalysis.objects.get(pk=live.pk).claim, owner)
+        self.assertEqual(self.pipeline.claim(10)[1], [])  # nothing left until a lease expires
+
+    def test_result_is_dropped_once_the_lease_is_taken_over(self):
+        self.job()
+        token, jobs = self.pipeline.claim(10)
+        GameAnalysis.objects.update(claim=uuid.uuid4())  # another dispatcher took the job over
+        result = {'summary': {side: {'accuracy': 90.0, 'blunders': 0, 'mistakes': 0} for side in ('white', 'black')},
+                  'evaluations': [], 'best_moves': [], 'nodes': 1, 'positions': 2, 'tt_probes': 0, 'tt_hits': 0}
+        done = Future()
+        done.set_result(result)
+        self.pipeline._executor = mock.Mock(submit=mock.Mock(return_value=done))
+
+        with self.assertLogs('auth_app.analysis', 'WARNING'):
+            self.pipeline._run_batch(token, jobs)
+
+        self.assertEqual(GameAnalysis.objects.get().status, 'running')
+        self.assertEqual(self.pipeline.games_done, 0)
+
+    def report(self, user, color, result, opponent, room_id=None):
+        data = {'result': result, 'color': color, 'moves': ['e2e4', 'e7e5'], 'opponent_username': opponent.username}
+        if room_id:
+            data['room_id'] = room_id
+        request = APIRequestFactory().post('/game/result/', data, format='json')
+        force_authenticate(request, user=user)
+        return game_views.RecordGameResultView.as_view()(request)
+
+    def test_both_reports_of_a_room_are_one_game(self):
+        self.assertEqual(self.report(self.alice, 'white', 'win', self.bob, room_id='room').status_code, 200)
+        self.assertEqual(self.report(self.bob, 'black', 'loss', self.alice, room_id='room').status_code, 200)
+
+        self.assertEqual(Game.objects.count(), 1)
+        self.assertEqual(GameAnalysis.objects.count(), 1)
+
+    def test_moves_without_a_room_are_rejected(self):
+        self.assertEqual(self.report(self.alice, 'white', 'win', self.bob).status_code, 400)
+        self.assertFalse(Game.objects.exists())
+        self.assertEqual(User.objects.get(pk=self.alice.pk).wins, 0)
+
+
+class PositionIndexTests(TestCase):
+    def setUp(self):
+        patcher = mock.patch.object(explorer, 'cache', LRUCache(100, ttl=60))  # lookups cached by earlier tests
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def add_games(self, *moves, result='1-0'):
+        Game.objects.bulk_create([Game(moves=m, result=result) for m in moves])
+
+    def test_counts_are_summed_across_a_batch(self):
+        self.add_games('e2e4 e7e5', 'e2e4 c7c5')
+        self.add_games('d2d4', result='1/2-1/2')
+
+        self.assertEqual(explorer.index_pending_games(), 3)
+
+        moves = {m['uci']: m for m in explorer.lookup(START_FEN)['moves']}
+        self.assertEqual((moves['e2e4']['games'], moves['e2e4']['white_wins']), (2, 2))
+        self.assertEqual((moves['d2d4']['games'], moves['d2d4']['draws']), (1, 1))
+        self.assertEqual(explorer.index_pending_games(), 0)  # already claimed
+
+    def test_queries_do_not_grow_with_game_length(self):
+        queries = []
+        for plies in (4, 120):
+            Game.objects.all().delete()
+            self.add_games(*(long_game(plies) for _ in range(3)))
+            with CaptureQueriesContext(connection) as captured:
+                self.assertEqual(explorer.index_pending_games(), 3)
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_malformed_fen_is_a_bad_request(self):
+        user, = make_users(1, prefix='explorer')
+        board = 'rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR'
+        for fen in (f'{board} b KQkq e9 0 1', f'{board} b KQkq e 0 1', f'{board} b KQkq e0 0 1', 'junk'):
+            with self.subTest(fen=fen):
+                request = APIRequestFactory().get('/explorer/', {'fen': fen})
+                force_authenticate(request, user=user)
+                response = game_views.OpeningExplorerView.as_view()(request)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.data)
+
+    @override_settings(EXPLORER_INDEX_BATCH=2)
+    def test_command_continues_past_a_batch_with_nothing_to_index(self):
+        self.add_games('e2e5', 'e7e5')  # unreadable
+        self.add_games('e2e4', 'd2d4')
+
+        call_command('index_positions', stdout=StringIO())
+
+        self.assertFalse(Game.objects.filter(positions_indexed=False).exists())
+        self.assertEqual(explorer.lookup(START_FEN)['games'], 2)
+
+class MqttBrokerTests(SimpleTestCase):
+    async def start_broker(self):
+        self.broker = await mqtt_broker.Broker().start(port=0)
+        self.clients = []
+
+    async def stop_broker(self):
+        for _, writer in self.clients:
+            writer.close()
+        await self.broker.stop()
+
+    async def connect(self, client_id):
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.broker.port)
+        self.clients.append((reader, writer))
+        writer.write(mqtt_broker.connect_packet(client_id))
+        self.assertEqual((await self.read(reader))[0], mqtt_broker.CONNACK)
+        return reader, writer
+
+    async def subscribe(self, client, topic_filters):
+        reader, writer = client
+        writer.write(mqtt_broker.subscribe_packet(1, topic_filters))
+        packet_type, _, body = await self.read(reader)
+        self.assertEqual(packet_type, mqtt_broker.SUBACK)
+        return list(body[2:])
+
+    async def read(self, reader):
+        return await asyncio.wait_for(mqtt_broker.read_packet(reader), timeout=5)
+
+    async def received(self, reader):
+        packet_type, flags, body = await self.read(reader)
+        self.assertEqual(packet_type, mqtt_broker.PUBLISH)
+        return mqtt_broker.parse_publish(flags, body)
+
+    async def test_publish_reaches_exact_and_wildcard_subscribers(self):
+        await self.start_broker()
+        try:
+            device = await self.connect('device')
+            monitor = await self.connect('monitor')
+            server = await self.connect('server')
+            self.assertEqual(await self.subscribe(device, [('chess/user/alice', 0)]), [0])
+            self.assertEqual(await self.subscribe(monitor, [('chess/user/+', 1), ('chess/#', 2)]), [1, 1])
+
+            server[1].write(mqtt_broker.publish_packet('chess/user/alice', b'hello', qos=1, packet_id=9))
+            packet_type, _, body = await self.read(server[0])
+            self.assertEqual((packet_type, body), (mqtt_broker.PUBACK, (9).to_bytes(2, 'big')))
+
+            topic, payload, qos, retain, _ = await self.received(device[0])
+            self.assertEqual((topic, payload, qos, retain), ('chess/user/alice', b'hello', 0, False))
+            # One delivery despite two matching filters, at the lower of publish and granted QoS
+            topic, payload, qos, _, _ = await self.received(monitor[0])
+            self.assertEqual((topic, payload, qos), ('chess/user/alice', b'hello', 1))
+            server[1].write(mqtt_broker.publish_packet('chess/lobby', b'x'))
+            self.assertEqual((await self.received(monitor[0]))[0], 'chess/lobby')
+            self.assertEqual(self.broker.stats()['delivered'], 3)
+        finally:
+            await self.stop_broker()
+
+    async def test_retained_message_is_delivered_on_subscribe(self):
+        await self.start_broker()
+        try:
+            server = await self.connect('server')
+            server[1].write(mqtt_broker.publish_packet('chess/user/alice/state', b'v1', retain=True))
+            server[1].write(mqtt_broker.publish_packet('chess/user/alice/state', b'v2', retain=True))
+            server[1].write(mqtt_broker.publish_packet('chess/user/bob/state', b'b', retain=True))
+            server[1].write(mqtt_broker.publish_packet('chess/user/bob/state', b'', qos=1, retain=True, packet_id=1))
+            self.assertEqual((await self.read(server[0]))[0], mqtt_broker.PUBACK)  # all four handled; bob's cleared
+
+            device = await self.connect('device')
+            await self.subscribe(device, [('chess/user/+/state', 0)])
+            topic, payload, _, retain, _ = await self.received(device[0])
+            self.assertEqual((topic, payload, retain), ('chess/user/alice/state', b'v2', True))
+            self.assertEqual(self.broker.stats()['retained'], 1)
+
+            server[1].write(mqtt_broker.publish_packet('chess/user/alice/state', b'v3', retain=True))
+            topic, payload, _, retain, _ = await self.received(device[0])
+            self.assertEqual((payload, retain), (b'v3', False))  # live deliveries are not flagged retained
+        finally:
+            await self.stop_broker()
+
+
+class ReadinessTests(TestCase):
+    def setUp(self):
+        for name, value in [('_snapshot', None), ('_task', mock.Mock(is_running=False))]:
+            patcher = mock.patch.object(health, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_ready(self):
+        result = health.readiness()  # no snapshot and no refresh task: checked inline
+
+        self.assertEqual((result['status'], result['ready']), ('ready', True))
+        self.assertEqual(result['dependencies']['notifications']['outbox_backlog'], 0)
+
+    def test_old_outbox_backlog_is_degraded_but_ready(self):
+        user, = make_users(1)
+        Notification.objects.create(user=user, type='call_invitation', payload={})
+        Notification.objects.update(created_at=timezone.now() - timedelta(seconds=settings.HEALTH_OUTBOX_MAX_AGE + 60))
+
+        result = health.readiness()
+
+        self.assertEqual((result['status'], result['ready']), ('degraded', True))
+        self.assertEqual(result['dependencies']['notifications']['outbox_backlog'], 1)
+
+    def test_failed_database_check_is_unready(self):
+        def check_database():
+            raise OperationalError('connection refused')
+
+        with mock.patch.object(health, 'check_database', check_database), self.assertLogs('auth_app.health', 'ERROR'):
+            result = health.readiness()
+
+        self.assertEqual((result['status'], result['ready']), ('unready', False))
+        self.assertEqual(result['dependencies']['database']['status'], 'error')
+
+    def test_stale_snapshot_is_unready(self):
+        health._task.is_running = True  # the task owns refreshes, but stopped taking them
+        health.refresh()
+        health._snapshot['monotonic'] -= settings.HEALTH_CHECK_MAX_AGE + 1
+
+        result = health.readiness()
+
+        self.assertEqual((result['status'], result['ready']), ('unready', False))
+        self.assertIn('old', result['reason'])
+
+    def test_no_snapshot_yet_is_unready(self):
+        health._task.is_running = True
+
+        self.assertEqual(health.readiness(), {'status': 'unready', 'ready': False, 'reason': 'no health snapshot yet'})
+
+
+class BulkheadSaturationTests(SimpleTestCase):
+    """One worker and one queue slot: a running call, a queued one, and the next is refused."""
+
+    def setUp(self):
+        self.bulkhead = bulkheads.Bulkhead('test', workers=1, queue=1)
+        self.release = threading.Event()
+        self.addCleanup(self.bulkhead._executor.shutdown)
+        self.addCleanup(self.release.set)
+
+    def saturate(self):
+        running = threading.Event()
+
+        def block():
+            running.set()
+            self.release.wait(5)
+
+        held = [self.bulkhead.submit(block)]
+        self.assertTrue(running.wait(5))
+        held.append(self.bulkhead.submit(block))
+        return held
+
+    def view(self, base):
+        class View(base):
+            permission_classes = [permissions.AllowAny]
+            bulkhead = self.bulkhead
+
+            def get(self, request):
+                return Response({'ok': True})
+
+        return View.as_view()
+
+    def test_queue_is_bounded(self):
+        held = self.saturate()
+
+        with self.assertRaises(bulkheads.BulkheadFull):
+            self.bulkhead.submit(int)
+        stats = self.bulkhead.stats()
+        self.assertEqual((stats['active'], stats['queued'], stats['rejected']), (1, 1, 1))
+
+        self.release.set()
+        for future in held:
+            future.result(timeout=5)
+        self.assertEqual(self.bulkhead.submit(int, '7').result(timeout=5), 7)  # capacity is back
+
+    async def test_full_bulkhead_answers_503_with_retry_after(self):
+        await sync_to_async(self.saturate)()
+        for base in (BulkheadAPIView, AsyncAPIView):
+            with self.subTest(view=base.__name__):
+                response = await self.view(base)(APIRequestFactory().get('/'))
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], str(bulkheads.BulkheadFull.retry_after))
+        self.assertEqual(self.bulkhead.stats()['rejected'], 2)
+
+
+class HangingBroker:
+    """Accepts TCP connections and reads whatever arrives, but never answers (no CONNACK)."""
+
+    def __init__(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.bind(('127.0.0.1', 0))
+        self.server.listen(128)
+        self.port = self.server.getsockname()[1]
+        self.connections = []
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+    def _serve(self):
+        self.server.settimeout(0.05)
+        while not self._stop.is_set():
+            try:
+                conn, _ = self.server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                return
+            self.connections.append(conn)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        for conn in self.connections:
+            conn.close()
+        self.server.close()
+
+
+@override_settings(MQTT_CONNECT_TIMEOUT=0.2, MQTT_PUBLISH_TIMEOUT=0.2)
+class CircuitBreakerTests(SimpleTestCase):
+    def setUp(self):
+        self.broker = HangingBroker()
+        original = (mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT, mqtt_utils.breaker)
+        mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT = '127.0.0.1', self.broker.port
+        mqtt_utils.breaker = mqtt_utils.CircuitBreaker(failure_threshold=3, reset_timeout=0.5)
+
+        def restore():
+            mqtt_utils.MQTT_BROKER, mqtt_utils.MQTT_PORT, mqtt_utils.breaker = original
+            self.broker.close()
+        self.addCleanup(restore)
+
+    def publish(self):
+        started = time.monotonic()
+        published = mqtt_utils.publish_mqtt_notification('breaker_test', 'call_invitation', {'room_id': 'x'})
+        return published, time.monotonic() - started
+
+    def test_hanging_broker_trips_the_breaker(self):
+        for _ in range(3):
+            published, elapsed = self.publish()
+            self.assertFalse(published)
+            self.assertLess(elapsed, 1.0)  # bounded by MQTT_CONNECT_TIMEOUT, not the OS connect timeout
+        self.assertEqual(mqtt_utils.breaker.state, mqtt_utils.CircuitBreaker.OPEN)
+
+        connections = len(self.broker.connections)
+        published, elapsed = self.publish()
+        self.assertFalse(published)
+        self.assertLess(elapsed, 0.05)  # fails fast without touching the network
+        self.assertEqual(len(self.broker.connections), connections)
+
+        stats = mqtt_utils.breaker.stats()
+        self.assertEqual((stats['errors'], stats['rejected'], stats['deferred_messages']), (3, 1, 4))
+
+    def test_half_open_probe_after_reset_timeout(self):
+        for _ in range(3):
+            self.publish()
+        time.sleep(0.5)
+
+        published, elapsed = self.publish()  # the probe reaches the broker, times out and reopens the breaker
+        self.assertFalse(published)
+        self.assertGreaterEqual(elapsed, 0.2)
+        self.assertEqual(mqtt_utils.breaker.state, mqtt_utils.CircuitBreaker.OPEN)
+        self.assertLess(self.publish()[1], 0.05)
+
+
+class ConnectivityProbeTests(SimpleTestCase):
+    async def start(self, handler):
+        server = await asyncio.start_server(handler, '127.0.0.1', 0)
+        self.addCleanup(server.close)
+        return server.sockets[0].getsockname()[1]
+
+    async def test_probes_run_concurrently_under_one_deadline(self):
+        async def answer(reader, writer):
+            await reader.readuntil(b'\r\n\r\n')
+            writer.write(b"HTTP/1.1 204 No Content\r\nConnection: close\r\n\r\n")
+            await writer.drain()
+            writer.close()
+
+        async def hang(reader, writer):
+            await reader.read()
+
+        answering, hanging = await self.start(answer), await self.start(hang)
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        refused = closed.getsockname()[1]
+        closed.close()
+
+        started = time.monotonic()
+        results = await connectivity.check_all({
+            'http': ('http', f"http://127.0.0.1:{answering}/"),
+            'tcp': ('tcp', ('127.0.0.1', hanging)),  # connects and closes without a request
+            'refused': ('tcp', ('127.0.0.1', refused)),
+            'hanging': ('http', f"http://127.0.0.1:{hanging}/"),
+            'hanging_too': ('http', f"http://127.0.0.1:{hanging}/"),
+        }, deadline=0.3)
+        elapsed = time.monotonic() - started
+
+        self.assertEqual(results['http'], 'Reachable (204)')
+        self.assertEqual(results['tcp'], 'Reachable')
+        self.assertTrue(results['refused'].startswith('Unreachable: ConnectionRefusedError'))
+        self.assertIn('deadline', results['hanging'])
+        self.assertIn('deadline', results['hanging_too'])
+        self.assertLess(elapsed, 0.5)  # one deadline for all probes, not one per probe
+
+    @override_settings(CONNECTIVITY_CHECK_TTL=3600)
+    def test_snapshot_is_served_from_cache_and_refreshed_once(self):
+        self.addCleanup(setattr, connectivity, '_snapshot', connectivity._snapshot)
+        connectivity._snapshot = None
+        with mock.patch.object(connectivity.bulkheads.network, 'submit') as submit:
+            self.assertIsNone(connectivity.snapshot()['results'])
+            self.assertTrue(connectivity.snapshot()['refreshing'])
+            submit.assert_called_once_with(connectivity.refresh)
+
+            connectivity.refresh(probes={}, deadline=0.1)
+            submit.reset_mock()
+            for _ in range(100):
+                self.assertEqual(connectivity.snapshot()['results'], {})
+            submit.assert_not_called()
+
+    async def test_cold_cache_waits_for_the_first_round(self):
+        self.addCleanup(setattr, connectivity, '_snapshot', connectivity._snapshot)
+        connectivity._snapshot = None
+        closed = socket.socket()
+        closed.bind(('127.0.0.1', 0))
+        refused = closed.getsockname()[1]
+        closed.close()
+
+        request = APIRequestFactory().get('/debug/network/')
+        probes = {'smtp_587': ('tcp', ('127.0.0.1', refused))}
+        with mock.patch.object(connectivity, 'default_probes', return_value=probes):
+            data = (await views.ConnectivityCheckView.as_view()(request)).data
+
+        # The flat {check: result} shape, with the snapshot's metadata alongside
+        self.assertTrue(data['smtp_587'].startswith('Unreachable: ConnectionRefusedError'))
+        self.assertIn('firebase_config', data)
+        self.assertIsNotNone(data['checked_at'])
+        self.assertFalse(data['refreshing'])
+
+    def test_wait_for_the_first_round_is_bounded(self):
+        self.addCleanup(setattr, connectivity, '_snapshot', connectivity._snapshot)
+        connectivity._snapshot = None
+        with mock.patch.object(connectivity.bulkheads.network, 'submit'):  # a round that never finishes
+            self.addCleanup(setattr, connectivity, '_refreshing', False)
+            started = time.monotonic()
+            self.assertIsNone(connectivity.snapshot(wait=0.2)['results'])
+        self.assertLess(time.monotonic() - started, 1)
+
+
+PGN_UPLOAD = '''[White "alice"]
+[Black "stranger"]
+[Result "1-0"]
+
+1. e4 e5 2. Qh5 Nc6 3. Bc4 Nf6 4. Qxf7# 1-0
+
+[White "someone"]
+[Black "stranger"]
+[Result "0-1"]
+
+1. f3 e5 2. g4 Qh4# 0-1
+
+[White "stranger"]
+[Black "alice"]
+[Result "1/2-1/2"]
+
+1. d4 d5 1/2-1/2
+'''
+
+
+class PgnImportTests(TestCase):
+    def test_upload_keeps_only_the_owners_games(self):
+        alice, = make_users(1, prefix='alice')
+
+        stats = pgn.import_games(PGN_UPLOAD.splitlines(keepends=True), owner=alice, owner_name='alice')
+
+        self.assertEqual((stats['imported'], stats['not_played'], stats['skipped']), (2, 1, 0))
+        self.assertEqual(Game.objects.count(), 2)
+        self.assertFalse(Game.objects.filter(white__isnull=True, black__isnull=True).exists())
+
+    def test_import_without_owner_keeps_every_game(self):
+        stats = pgn.import_games(PGN_UPLOAD.splitlines(keepends=True))
+
+        self.assertEqual((stats['imported'], stats['not_played']), (3, 0))
+
+    def test_view_runs_on_the_cpu_bulkhead(self):
+        self.assertIs(game_views.GameImportView.bulkhead, bulkheads.cpu)
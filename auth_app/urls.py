@@ -1,24 +1,30 @@
 from django.urls import path
 from django.http import JsonResponse
+from django.conf import settings
 import time
 from .swagger_views import (
     RegisterView, LoginView, LogoutView,
     SendOTPView, VerifyOTPView, ResetPasswordView,VerifyEmailTokenView,
     SendVerificationEmailView,
     TokenVerifyView,
-    GuestRegisterView, HealthCheckView
+    GuestRegisterView, HealthCheckView, LivenessView, ReadinessView
 )
 from .web_session_views import WebSessionView
-from .views import ConnectivityCheckView, TestEmailView
+from .views import ConnectivityCheckView, TestEmailView, BulkheadStatsView
 from .google_auth_views import GoogleLoginView
+from . import game_views, async_game_views
 from .game_views import (
-    OnlineUsersView, AllUsersView, UpdateOnlineStatusView,
-    SendInvitationView, MyInvitationsView, RespondToInvitationView,
-   cancel_invitation, SendCallSignalView, DeclineCallView, CancelCallView,
-    RecordGameResultView
+    OnlineUsersView, AllUsersView, UserSearchView, UpdateOnlineStatusView,
+    RecordGameResultView, LeaderboardView, MyLeaderboardRankView,
+    PlayBotView, BotStatsView, GameAnalysisView, AnalysisStatsView,
+    OpeningExplorerView, GameExportView, GameImportView, EndgameProbeView,
+    NotificationSyncView, NotificationEncodingView, MQTTPublisherStatsView
 )
 from .realtime_docs import MQTTDocumentationView, WebSocketDocumentationView
 
+# Invitation and call endpoints: async implementations on ASGI, sync ones otherwise
+invitation_views = async_game_views if settings.ASYNC_GAME_VIEWS else game_views
+
 
 def direct_health(request):
     return JsonResponse({"status": "v3_direct_ok", "phase": "csrf_final_decisive"})
@@ -42,6 +48,7 @@ urlpatterns = [
     # Debug/Networking
     path('debug/network/', ConnectivityCheckView.as_view(), name='network_check'),
     path('debug/email-test/', TestEmailView.as_view(), name='email_test'),
+    path('debug/bulkheads/', BulkheadStatsView.as_view(), name='bulkhead_stats'),
     
     # Password Management
     path('send-otp/', SendOTPView.as_view(), name='send_otp'),
@@ -66,19 +73,36 @@ urlpatterns = [
     
     # Health Check
     path('health-new/', HealthCheckView.as_view(), name='health_check'),
+    path('health/live/', LivenessView.as_view(), name='health_live'),
+    path('health/ready/', ReadinessView.as_view(), name='health_ready'),
     
     # Game & User Management
     path('users/online/', OnlineUsersView.as_view(), name='online_users'),
     path('users/all/', AllUsersView.as_view(), name='all_users'),
+    path('users/search/', UserSearchView.as_view(), name='search_users'),
     path('users/status/', UpdateOnlineStatusView.as_view(), name='update_status'),
-    path('invitations/send/', SendInvitationView.as_view(), name='send_invitation'),
-    path('invitations/my/', MyInvitationsView.as_view(), name='my_invitations'),
-    path('invitations/<int:invitation_id>/respond/', RespondToInvitationView.as_view(), name='respond_invitation'),
-    path('invitations/<int:invitation_id>/cancel/', cancel_invitation, name='cancel_invitation'),
-    path('call/send/', SendCallSignalView.as_view(), name='send_call_signal'),
-    path('call/decline/', DeclineCallView.as_view(), name='decline_call'),
-    path('call/cancel/', CancelCallView.as_view(), name='cancel_call'),
+    path('invitations/send/', invitation_views.SendInvitationView.as_view(), name='send_invitation'),
+    path('invitations/challenge/', invitation_views.SendChallengeView.as_view(), name='send_challenge'),
+    path('invitations/my/', invitation_views.MyInvitationsView.as_view(), name='my_invitations'),
+    path('invitations/<int:invitation_id>/respond/', invitation_views.RespondToInvitationView.as_view(), name='respond_invitation'),
+    path('invitations/<int:invitation_id>/cancel/', invitation_views.cancel_invitation, name='cancel_invitation'),
+    path('call/send/', invitation_views.SendCallSignalView.as_view(), name='send_call_signal'),
+    path('call/decline/', invitation_views.DeclineCallView.as_view(), name='decline_call'),
+    path('call/cancel/', invitation_views.CancelCallView.as_view(), name='cancel_call'),
     path('game/result/', RecordGameResultView.as_view(), name='record_result'),
+    path('leaderboard/', LeaderboardView.as_view(), name='leaderboard'),
+    path('leaderboard/me/', MyLeaderboardRankView.as_view(), name='leaderboard_me'),
+    path('bot/play/', PlayBotView.as_view(), name='play_bot'),
+    path('bot/stats/', BotStatsView.as_view(), name='bot_stats'),
+    path('games/<int:game_id>/analysis/', GameAnalysisView.as_view(), name='game_analysis'),
+    path('analysis/stats/', AnalysisStatsView.as_view(), name='analysis_stats'),
+    path('explorer/', OpeningExplorerView.as_view(), name='opening_explorer'),
+    path('games/export/', GameExportView.as_view(), name='export_games'),
+    path('games/import/', GameImportView.as_view(), name='import_games'),
+    path('endgame/probe/', EndgameProbeView.as_view(), name='endgame_probe'),
+    path('notifications/sync/', NotificationSyncView.as_view(), name='notification_sync'),
+    path('notifications/encoding/', NotificationEncodingView.as_view(), name='notification_encoding'),
+    path('notifications/mqtt/stats/', MQTTPublisherStatsView.as_view(), name='mqtt_publisher_stats'),
     
     # Real-time Service Documentation (Swagger Only)
     path('docs/mqtt/', MQTTDocumentationView.as_view(), name='docs_mqtt'),
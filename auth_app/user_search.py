@@ -0,0 +1,201 @@
+"""
+In-memory username / display-name search for invite autocomplete.
+
+Every searchable token (username, first name, last name, full name; all
+lower-cased) is kept in a sorted list of ``(token, user_id)`` pairs, which
+works as a compact prefix trie: all tokens starting with a prefix form one
+contiguous run found with one bisect. A second sorted list holds only the
+tokens of online users, so "online users first" is answered by reading the
+head of that run before falling back to everyone; a query touches O(log n + k)
+entries however many users share the prefix.
+
+The index is built from one query on first use and kept current by the User
+post_save/post_delete signals, applied once the saving transaction commits
+(a rolled-back save never shows up). Changes committed while a rebuild is
+reading the table are queued and replayed onto the new lists before they are
+swapped in. Saves made in other server processes only arrive with the
+periodic full refresh (USER_SEARCH_REFRESH_INTERVAL).
+"""
+import functools
+import threading
+from bisect import bisect_left, insort
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from . import background
+
+
+def _tokens(username, first_name, last_name):
+    tokens = {username.lower()}
+    names = [n.strip().lower() for n in (first_name, last_name) if n and n.strip()]
+    tokens.update(names)
+    if len(names) == 2:
+        tokens.add(f"{names[0]} {names[1]}")
+    return tokens
+
+
+def _remove(entries, entry):
+    i = bisect_left(entries, entry)
+    if i < len(entries) and entries[i] == entry:
+        del entries[i]
+
+
+class UserSearchIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._all = []  # sorted (token, user_id)
+        self._online = []  # same, online users only
+        self._users = {}  # user_id -> (username, display_name, is_online, rating, tokens)
+        self._by_username = {}
+        self._pending = None  # user_id -> row (None: removed) while a rebuild runs
+        self._rebuild_lock = threading.Lock()
+        self.loaded = False
+
+    def _fields(self, user):
+        display = f"{user['first_name']} {user['last_name']}".strip()
+        tokens = _tokens(user['username'], user['first_name'], user['last_name'])
+        return (user['username'], display, user['is_online'], user['rating'], tokens)
+
+    def rebuild(self):
+        with self._rebuild_lock:
+            with self._lock:
+                self._pending = {}
+            try:
+                rows = get_user_model().objects.filter(is_active=True).values(
+                    'id', 'username', 'first_name', 'last_name', 'is_online', 'rating'
+                )
+                users = {row['id']: self._fields(row) for row in rows.iterator()}
+                all_entries = sorted((token, uid) for uid, fields in users.items() for token in fields[4])
+                online_entries = sorted((token, uid) for uid, fields in users.items() if fields[2] for token in fields[4])
+                with self._lock:
+                    self._users = users
+                    self._by_username = {fields[0].lower(): uid for uid, fields in users.items()}
+                    self._all = all_entries
+                    self._online = online_entries
+                    for user_id, row in self._pending.items():  # committed while the query ran
+                        self._apply(user_id, row)
+                    self.loaded = True
+            finally:
+                with self._lock:
+                    self._pending = None
+
+    def _ensure_loaded(self):
+        if not self.loaded:
+            self.rebuild()
+
+    def update(self, user):
+        row = None
+        if user.is_active:
+            row = {
+                'username': user.username, 'first_name': user.first_name, 'last_name': user.last_name,
+                'is_online': user.is_online, 'rating': getattr(user, 'rating', 0),
+            }
+        self._change(user.id, row)
+
+    def remove(self, user_id):
+        self._change(user_id, None)
+
+    def _change(self, user_id, row):
+        with self._lock:
+            if self._pending is not None:
+                self._pending[user_id] = row
+            if self.loaded:  # otherwise the first search builds everything from the database
+                self._apply(user_id, row)
+
+    def _apply(self, user_id, row):
+        old = self._users.get(user_id)
+        fields = None if row is None else self._fields(row)
+        if old is not None and fields is not None and old[4] == fields[4]:
+            # Same names (a presence or rating change): the tokens stay, only the online list may move
+            self._users[user_id] = fields
+            if old[2] != fields[2]:
+                for token in fields[4]:
+                    if fields[2]:
+                        insort(self._online, (token, user_id))
+                    else:
+                        _remove(self._online, (token, user_id))
+            return
+        self._discard(user_id)
+        if fields is None:
+            return
+        self._users[user_id] = fields
+        self._by_username[fields[0].lower()] = user_id
+        for token in fields[4]:
+            insort(self._all, (token, user_id))
+            if fields[2]:
+                insort(self._online, (token, user_id))
+
+    def _discard(self, user_id):
+        old = self._users.pop(user_id, None)
+        if old is None:
+            return
+        self._by_username.pop(old[0].lower(), None)
+        for token in old[4]:
+            _remove(self._all, (token, user_id))
+            if old[2]:
+                _remove(self._online, (token, user_id))
+
+    @staticmethod
+    def _scan(entries, prefix, limit, found, exclude):
+        i = bisect_left(entries, (prefix,))
+        while i < len(entries) and entries[i][0].startswith(prefix) and len(found) < limit:
+            uid = entries[i][1]
+            if uid not in found and uid != exclude:
+                found[uid] = None
+            i += 1
+
+    def search(self, query, limit=10, exclude=None):
+        """Top ``limit`` users whose username or name starts with ``query``: exact username, then online, then others."""
+        self._ensure_loaded()
+        prefix = query.strip().lower()
+        if not prefix:
+            return []
+        found = {}  # insertion-ordered set of user ids
+        with self._lock:
+            exact = self._by_username.get(prefix)
+            if exact is not None and exact != exclude:
+                found[exact] = None
+            self._scan(self._online, prefix, limit, found, exclude)
+            self._scan(self._all, prefix, limit, found, exclude)
+            results = []
+            for uid in found:
+                username, display, is_online, rating, _ = self._users[uid]
+                results.append({
+                    'id': uid, 'username': username, 'display_name': display,
+                    'is_online': is_online, 'rating': rating,
+                })
+        return results
+
+    def __len__(self):
+        return len(self._users)
+
+
+index = UserSearchIndex()
+
+
+INDEXED_FIELDS = frozenset(('username', 'first_name', 'last_name', 'is_online', 'rating', 'is_active'))
+
+
+def _on_user_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not INDEXED_FIELDS.intersection(update_fields):
+        return  # e.g. a notification_encoding change; nothing search shows
+    transaction.on_commit(functools.partial(index.update, instance))
+
+
+def _on_user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(functools.partial(index.remove, instance.id))
+
+
+post_save.connect(_on_user_saved, sender=settings.AUTH_USER_MODEL, dispatch_uid='user_search_saved')
+post_delete.connect(_on_user_deleted, sender=settings.AUTH_USER_MODEL, dispatch_uid='user_search_deleted')
+
+
+def _refresh():
+    if index.loaded:
+        index.rebuild()
+
+
+background.register('user_search_refresh', settings.USER_SEARCH_REFRESH_INTERVAL, _refresh)
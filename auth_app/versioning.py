@@ -0,0 +1,138 @@
+"""
+Per-resource version counters and conditional GET.
+
+Each cacheable resource has a counter in the default cache, bumped (after
+the transaction commits) whenever something that appears in it changes:
+
+    users                     any User save/delete (presence, profile, rating)
+    invitations:{user_id}     invitations the user sent or received, and
+                              any save of a player in the user's pending
+                              invitations (they embed both players' presence)
+
+``conditional_get`` hashes the counters, the requesting user and the query
+string into a strong ETag. If it matches ``If-None-Match`` the view returns
+304 straight away: only cache reads happen, no query and no serialization.
+
+Counters start from the current time rather than 1, so a restart or cache
+eviction can never hand out an ETag a client already holds for older data.
+The counters must live in a cache shared by every process serving requests
+(see CACHES in settings).
+"""
+import functools
+import hashlib
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from rest_framework import status
+from rest_framework.response import Response
+
+_PREFIX = 'version:'
+
+
+def get_version(name):
+    key = _PREFIX + name
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_now(names):
+    for name in names:
+        key = _PREFIX + name
+        try:
+            cache.incr(key)
+        except ValueError:
+            # Not cached (never read or evicted): any fresh start value differs from what clients hold
+            cache.add(key, time.time_ns() // 1000, timeout=None)
+
+
+def bump(*names):
+    """Invalidate ETags for the named resources once the current transaction commits."""
+    transaction.on_commit(functools.partial(_bump_now, names))
+
+
+def bump_invitations(*user_ids):
+    """For bulk writes that bypass the GameInvitation signals."""
+    bump(*(f'invitations:{user_id}' for user_id in set(user_ids)))
+
+
+def make_etag(names, request):
+    parts = [f"{name}={get_version(name)}" for name in names]
+    parts.append(f"user={request.user.id}")
+    parts.append(request.GET.urlencode())
+    return '"' + hashlib.sha1('|'.join(parts).encode()).hexdigest() + '"'
+
+
+def _matches(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == '*':
+        return True
+    return etag in (tag.strip() for tag in if_none_match.split(','))
+
+
+def conditional_get(*resources):
+    """
+    Decorate an APIView ``get`` (sync or async). Resource names may use ``{user_id}``
+    for the requesting user, e.g. ``conditional_get('invitations:{user_id}')``.
+    """
+    def decorator(method):
+        def tag(response, etag):
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            return response
+
+        if iscoroutinefunction(method):
+            @functools.wraps(method)
+            async def async_wrapper(view, request, *args, **kwargs):
+                names = [resource.format(user_id=request.user.id) for resource in resources]
+                etag = await sync_to_async(make_etag)(names, request)
+                if _matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+                    return tag(Response(status=status.HTTP_304_NOT_MODIFIED), etag)
+                response = await method(view, request, *args, **kwargs)
+                return tag(response, etag) if response.status_code == status.HTTP_200_OK else response
+            return async_wrapper
+
+        @functools.wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            names = [resource.format(user_id=request.user.id) for resource in resources]
+            etag = make_etag(names, request)
+            if _matches(request.META.get('HTTP_IF_NONE_MATCH'), etag):
+                response = Response(status=status.HTTP_304_NOT_MODIFIED)
+            else:
+                response = method(view, request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+            return tag(response, etag)
+        return wrapper
+    return decorator
+
+
+def _bump_invitation_counterparts(user_id):
+    from .models import GameInvitation
+
+    receivers = GameInvitation.objects.filter(sender_id=user_id, status='pending').values_list('receiver_id', flat=True)
+    _bump_now([f'invitations:{user_id}', *(f'invitations:{receiver_id}' for receiver_id in set(receivers))])
+
+
+def _on_user_changed(sender, instance, **kwargs):
+    bump('users')
+    # Pending invitations carry the sender's presence and profile; a list received
+    # from them must not be revalidated with a 304 after the sender changes.
+    transaction.on_commit(functools.partial(_bump_invitation_counterparts, instance.id))
+
+
+def _on_invitation_changed(sender, instance, **kwargs):
+    bump_invitations(instance.receiver_id, instance.sender_id)
+
+
+post_save.connect(_on_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='version_users_saved')
+post_delete.connect(_on_user_changed, sender=settings.AUTH_USER_MODEL, dispatch_uid='version_users_deleted')
+post_save.connect(_on_invitation_changed, sender='auth_app.GameInvitation', dispatch_uid='version_invitations_saved')
+post_delete.connect(_on_invitation_changed, sender='auth_app.GameInvitation', dispatch_uid='version_invitations_deleted')
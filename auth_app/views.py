@@ -8,70 +8,52 @@ from django.core.mail import send_mail
 from django.conf import settings
 from django.utils import timezone
 import json
-import requests
+
+from asgiref.sync import sync_to_async
 
 from .models import OTP
+from . import bulkheads, connectivity
+from .async_views import AsyncAPIView, BulkheadAPIView
 from .serializers import (
     EmailSerializer, 
     OTPSerializer, 
     PasswordResetSerializer
 )
 
-class ConnectivityCheckView(APIView):
+FIRST_ROUND_SLACK = 1.0  # seconds past the probe deadline to wait for a cold cache's first round
+
+class ConnectivityCheckView(AsyncAPIView):
     permission_classes = [permissions.AllowAny]
     
     @swagger_auto_schema(auto_schema=None)
-    def get(self, request):
-        results = {}
-        # Test Google HTTP
-        try:
-            r = requests.get("https://google.com", timeout=5)
-            results['google_http'] = f"Success ({r.status_code})"
-        except Exception as e:
-            results['google_http'] = f"Failed: {str(e)}"
-            
-        # Test SMTP Port 587
-        import socket
-        try:
-            s = socket.create_connection(("smtp.gmail.com", 587), timeout=5)
-            results['smtp_587'] = "Reachable"
-            s.close()
-        except Exception as e:
-            results['smtp_587'] = f"Unreachable: {str(e)}"
-
-        # Test SMTP Port 465
-        try:
-            s = socket.create_connection(("smtp.gmail.com", 465), timeout=5)
-            results['smtp_465'] = "Reachable"
-            s.close()
-        except Exception as e:
-            results['smtp_465'] = f"Unreachable: {str(e)}"
-            
-        # Test SMTP Port 2525
-        try:
-            s = socket.create_connection(("smtp.gmail.com", 2525), timeout=5)
-            results['smtp_2525'] = "Reachable"
-            s.close()
-        except Exception as e:
-            results['smtp_2525'] = f"Unreachable: {str(e)}"
-            
-        # Test Firebase API
-        api_key = settings.FIREBASE_API_KEY
+    async def get(self, request):
+        # Cached probe results; stale ones are refreshed in the background (see connectivity.py).
+        # A cold process waits for the first round, in its own thread rather than a request thread.
+        data = await sync_to_async(connectivity.snapshot, thread_sensitive=False)(
+            wait=settings.CONNECTIVITY_CHECK_DEADLINE + FIRST_ROUND_SLACK
+        )
+        results = dict(data.pop('results') or {})
+        api_key = getattr(settings, 'FIREBASE_API_KEY', '')
         if not api_key:
             results['firebase_config'] = "MISSING (FIREBASE_API_KEY is empty)"
         else:
             results['firebase_config'] = f"Present (starts with {api_key[:4]}...)"
-            try:
-                # Just a simple check to see if the domain is reachable
-                r = requests.get("https://identitytoolkit.googleapis.com/generateMobileSdkConfig", timeout=5)
-                results['firebase_api_domain'] = f"Reachable ({r.status_code})"
-            except Exception as e:
-                results['firebase_api_domain'] = f"Unreachable: {str(e)}"
-            
-        return Response(results)
+        # Same flat {check: result} shape as always, with the snapshot's metadata alongside
+        return Response({**results, **data})
+
+class BulkheadStatsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    @swagger_auto_schema(
+        operation_description="Per-bulkhead worker limits, active and queued work, wait times and rejected requests.",
+        responses={200: 'Bulkhead statistics'}
+    )
+    def get(self, request):
+        return Response(bulkheads.stats())
 
-class TestEmailView(APIView):
+class TestEmailView(BulkheadAPIView):
     permission_classes = [permissions.AllowAny]
+    bulkhead = bulkheads.network
     
     @swagger_auto_schema(auto_schema=None)
     def post(self, request):
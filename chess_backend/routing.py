@@ -4,4 +4,6 @@ from auth_app import consumers
 websocket_urlpatterns = [
     re_path(r'ws/call/(?P<room_id>\w+)/$', consumers.SignalingConsumer.as_asgi()),
     re_path(r'ws/notifications/$', consumers.UserNotificationConsumer.as_asgi()),
+    re_path(r'ws/matchmaking/$', consumers.MatchmakingConsumer.as_asgi()),
+    re_path(r'ws/lobby/$', consumers.LobbyConsumer.as_asgi()),
 ]
@@ -156,6 +156,18 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Default cache holds ETag version counters and cached counts. It must be shared by all
+# processes serving requests; point CACHE_BACKEND/CACHE_LOCATION at Redis or memcached when scaling out.
+CACHE_BACKEND = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': config('CACHE_LOCATION', default='chess-backend'),
+    }
+}
+if CACHE_BACKEND.endswith('LocMemCache'):
+    CACHES['default']['OPTIONS'] = {'MAX_ENTRIES': 10000}  # default of 300 would evict per-user counters
+
 DATABASES = {
     'default': dj_database_url.config(
         default=f"sqlite:///{BASE_DIR / 'db.sqlite3'}",  
@@ -267,6 +279,106 @@ else:
     SWAGGER_UI_OAUTH2_REDIRECT_URL = 'https://chessgameauth.share.zrok.io/swagger/oauth2-redirect.html'
 
 
+# Background maintenance tasks (run on daemon threads inside the server process)
+BACKGROUND_TASKS_ENABLED = config('BACKGROUND_TASKS_ENABLED', default=True, cast=bool)
+
+# Leaderboard
+LEADERBOARD_SNAPSHOT_INTERVAL = config('LEADERBOARD_SNAPSHOT_INTERVAL', default=300, cast=int)  # seconds
+LEADERBOARD_SNAPSHOT_SIZE = config('LEADERBOARD_SNAPSHOT_SIZE', default=100, cast=int)  # all-time rows kept
+
+# Matchmaking (rating band in Elo points; grows with time spent in the queue)
+MATCHMAKING_BASE_BAND = config('MATCHMAKING_BASE_BAND', default=100, cast=int)
+MATCHMAKING_BAND_GROWTH = config('MATCHMAKING_BAND_GROWTH', default=10, cast=float)  # points per second waited
+MATCHMAKING_MAX_BAND = config('MATCHMAKING_MAX_BAND', default=600, cast=int)
+MATCHMAKING_SWEEP_INTERVAL = config('MATCHMAKING_SWEEP_INTERVAL', default=1.0, cast=float)  # seconds
+
+# Computer opponent (searches run in a process pool; 0 workers = one per CPU)
+BOT_WORKERS = config('BOT_WORKERS', default=0, cast=int)
+BOT_MOVE_TIME = config('BOT_MOVE_TIME', default=1.0, cast=float)  # seconds per move
+BOT_MIN_MOVE_TIME = config('BOT_MIN_MOVE_TIME', default=0.1, cast=float)  # floor under load
+BOT_MAX_DEPTH = config('BOT_MAX_DEPTH', default=64, cast=int)
+BOT_IDLE_TIMEOUT = config('BOT_IDLE_TIMEOUT', default=600, cast=int)  # seconds without frames before the bot leaves
+
+# Post-game analysis
+ANALYSIS_WORKERS = config('ANALYSIS_WORKERS', default=0, cast=int)  # 0 = one per CPU core
+ANALYSIS_DEPTH = config('ANALYSIS_DEPTH', default=4, cast=int)
+ANALYSIS_MOVE_TIME = config('ANALYSIS_MOVE_TIME', default=2.0, cast=float)  # per-position cap in seconds
+ANALYSIS_TT_ENTRIES = config('ANALYSIS_TT_ENTRIES', default=1 << 21, cast=int)  # 16 bytes each, shared by all workers
+ANALYSIS_POLL_INTERVAL = config('ANALYSIS_POLL_INTERVAL', default=10, cast=int)
+ANALYSIS_LEASE = config('ANALYSIS_LEASE', default=900, cast=int)  # seconds without progress before another dispatcher takes over a running job
+
+# Opening explorer
+EXPLORER_INDEX_INTERVAL = config('EXPLORER_INDEX_INTERVAL', default=30, cast=int)  # seconds between incremental index runs
+EXPLORER_INDEX_BATCH = config('EXPLORER_INDEX_BATCH', default=200, cast=int)  # games per run
+EXPLORER_CACHE_SIZE = config('EXPLORER_CACHE_SIZE', default=10000, cast=int)  # positions kept in the LRU
+EXPLORER_CACHE_TTL = config('EXPLORER_CACHE_TTL', default=60, cast=int)  # seconds
+
+# PGN export (games fetched per keyset page while streaming) and import
+PGN_EXPORT_PAGE_SIZE = config('PGN_EXPORT_PAGE_SIZE', default=200, cast=int)
+PGN_IMPORT_BATCH_SIZE = config('PGN_IMPORT_BATCH_SIZE', default=1000, cast=int)  # games per parse batch / transaction
+PGN_IMPORT_MAX_UPLOAD_MB = config('PGN_IMPORT_MAX_UPLOAD_MB', default=20, cast=int)
+
+# Endgame bitbase file (build with `manage.py build_bitbases`); probing is disabled while it is missing
+BITBASE_PATH = config('BITBASE_PATH', default=str(BASE_DIR / 'data' / 'bitbases.bin'))
+
+# Keyset-paginated list endpoints
+PAGINATION_DEFAULT_PAGE_SIZE = config('PAGINATION_DEFAULT_PAGE_SIZE', default=50, cast=int)
+PAGINATION_MAX_PAGE_SIZE = config('PAGINATION_MAX_PAGE_SIZE', default=200, cast=int)
+PAGINATION_COUNT_CACHE_TTL = config('PAGINATION_COUNT_CACHE_TTL', default=30, cast=int)  # seconds an exact count is reused
+
+# In-memory user search (invite autocomplete)
+USER_SEARCH_MAX_RESULTS = config('USER_SEARCH_MAX_RESULTS', default=20, cast=int)
+USER_SEARCH_REFRESH_INTERVAL = config('USER_SEARCH_REFRESH_INTERVAL', default=300, cast=int)  # full rebuild picks up other processes' saves
+
+# Pending game invitations expire after INVITATION_TTL seconds (0 disables the sweeper)
+INVITATION_TTL = config('INVITATION_TTL', default=1800, cast=int)
+INVITATION_SWEEP_INTERVAL = config('INVITATION_SWEEP_INTERVAL', default=60, cast=int)
+INVITATION_SWEEP_BATCH = config('INVITATION_SWEEP_BATCH', default=500, cast=int)  # rows expired per transaction
+CHALLENGE_MAX_RECEIVERS = config('CHALLENGE_MAX_RECEIVERS', default=20, cast=int)  # users one open challenge can target
+
+# MQTT broker notifications are published to (`manage.py run_mqtt_broker` starts a local stand-in)
+MQTT_BROKER_HOST = config('MQTT_BROKER_HOST', default='broker.emqx.io')
+MQTT_BROKER_PORT = config('MQTT_BROKER_PORT', default=1883, cast=int)
+
+# MQTT publishing deadlines and circuit breaker (an unreachable broker must not stall requests)
+MQTT_CONNECT_TIMEOUT = config('MQTT_CONNECT_TIMEOUT', default=2.0, cast=float)  # TCP connect + CONNACK, seconds
+MQTT_PUBLISH_TIMEOUT = config('MQTT_PUBLISH_TIMEOUT', default=2.0, cast=float)  # flushing one batch, seconds
+MQTT_BREAKER_FAILURE_THRESHOLD = config('MQTT_BREAKER_FAILURE_THRESHOLD', default=3, cast=int)  # consecutive failures that open it
+MQTT_BREAKER_RESET_TIMEOUT = config('MQTT_BREAKER_RESET_TIMEOUT', default=30, cast=int)  # seconds before a half-open probe
+
+# Notification inbox (every MQTT push is also stored for notifications/sync/)
+NOTIFICATION_RETENTION_DAYS = config('NOTIFICATION_RETENTION_DAYS', default=14, cast=int)
+NOTIFICATION_PRUNE_INTERVAL = config('NOTIFICATION_PRUNE_INTERVAL', default=3600, cast=int)
+NOTIFICATION_OUTBOX_INTERVAL = config('NOTIFICATION_OUTBOX_INTERVAL', default=5, cast=int)  # retry interval; commits wake the drain at once
+NOTIFICATION_OUTBOX_BATCH = config('NOTIFICATION_OUTBOX_BATCH', default=200, cast=int)  # notifications per broker connection
+NOTIFICATION_OUTBOX_LEASE = config('NOTIFICATION_OUTBOX_LEASE', default=60, cast=int)  # seconds before another drain takes over a claimed batch
+NOTIFICATION_STATE_MAX_ITEMS = config('NOTIFICATION_STATE_MAX_ITEMS', default=20, cast=int)  # per list in the retained state snapshot
+NOTIFICATION_CALL_RING_SECONDS = config('NOTIFICATION_CALL_RING_SECONDS', default=60, cast=int)  # unanswered calls shown in the snapshot
+NOTIFICATION_ENCODING_CACHE_SIZE = config('NOTIFICATION_ENCODING_CACHE_SIZE', default=5000, cast=int)  # encoded invitation payloads kept
+
+# Serve the invitation and call endpoints with async views (daphne/ASGI). Turn off under
+# WSGI (the Vercel handler), where every async request would need its own event loop.
+ASYNC_GAME_VIEWS = config('ASYNC_GAME_VIEWS', default=True, cast=bool)
+
+# Bulkheads: bounded thread pools per kind of blocking work (workers, and requests allowed to wait)
+BULKHEAD_NETWORK_WORKERS = config('BULKHEAD_NETWORK_WORKERS', default=8, cast=int)  # third-party calls: Google, SMTP, probes
+BULKHEAD_NETWORK_QUEUE = config('BULKHEAD_NETWORK_QUEUE', default=32, cast=int)
+BULKHEAD_CPU_WORKERS = config('BULKHEAD_CPU_WORKERS', default=0, cast=int)  # password/OTP hashing; 0 = one per core
+BULKHEAD_CPU_QUEUE = config('BULKHEAD_CPU_QUEUE', default=64, cast=int)
+BULKHEAD_DB_WORKERS = config('BULKHEAD_DB_WORKERS', default=16, cast=int)  # gameplay queries; also their DB connection count
+BULKHEAD_DB_QUEUE = config('BULKHEAD_DB_QUEUE', default=2000, cast=int)
+
+# debug/network/ connectivity probes: answered from a cache refreshed at most once per TTL
+CONNECTIVITY_CHECK_TTL = config('CONNECTIVITY_CHECK_TTL', default=30, cast=int)  # seconds
+CONNECTIVITY_CHECK_DEADLINE = config('CONNECTIVITY_CHECK_DEADLINE', default=5.0, cast=float)  # seconds for all probes together
+
+# Liveness/readiness probes: readiness reads a dependency snapshot refreshed in the background
+HEALTH_CHECK_INTERVAL = config('HEALTH_CHECK_INTERVAL', default=10, cast=int)  # seconds between dependency checks
+HEALTH_CHECK_MAX_AGE = config('HEALTH_CHECK_MAX_AGE', default=60, cast=int)  # an older snapshot means unready
+HEALTH_OUTBOX_MAX_AGE = config('HEALTH_OUTBOX_MAX_AGE', default=60, cast=int)  # older unpublished notifications mean degraded
+HEALTH_ROW_ESTIMATES = config('HEALTH_ROW_ESTIMATES', default=True, cast=bool)  # planner table sizes (PostgreSQL)
+
+
 # GHOSTBUSTER CONFIG
 CSRF_FAILURE_VIEW = 'auth_app.views.csrf_failure'
 APPEND_SLASH = False